@@ -0,0 +1,177 @@
+#! /usr/bin/env python3
+
+""" builds the catalogue of the openlexicon datasets
+
+    python3 catalogue.py json ../Lexique383/Lexique383.*  > Lexique383.json
+    python3 catalogue.py md _json/*.json -o list-of-datasets.md
+
+'json' prints the embryo of the json description of a list of tables (.tsv, .csv,
+.rds, ...), with their url, size and md5sum. The md5sums are computed by a pool of
+processes, reading the files by large blocks, and are kept in a cache indexed by
+(path, size, mtime), so that unchanged files are not read again (default:
+$XDG_CACHE_HOME/openlexicon/md5cache.json).
+
+'md' writes the Markdown table of the datasets (name, link to the readme,
+description) from their json descriptions. The rows are kept in a cache next to
+the output file, and only the descriptions that changed are read again.
+"""
+
+import os
+import os.path as op
+import sys
+import json
+import hashlib
+import argparse
+import multiprocessing
+
+BLOCKSIZE = 1 << 23
+
+
+def md5(fname, blocksize=BLOCKSIZE):
+    hash_md5 = hashlib.md5()
+    buf = bytearray(blocksize)
+    view = memoryview(buf)
+    with open(fname, 'rb', buffering=0) as f:
+        for n in iter(lambda: f.readinto(buf), 0):
+            hash_md5.update(view[:n])
+    return hash_md5.hexdigest()
+
+
+def default_cache():
+    return op.join(os.getenv('XDG_CACHE_HOME') or op.join(op.expanduser('~'), '.cache'),
+                   'openlexicon', 'md5cache.json')
+
+
+def load_json(filename, default):
+    try:
+        with open(filename, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(filename, data):
+    os.makedirs(op.dirname(op.abspath(filename)), exist_ok=True)
+    tmp = f'{filename}.tmp{os.getpid()}'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, filename)
+
+
+def md5sums(fnames, cachefile=None, processes=None):
+    """ {fname: md5sum}, computed only for the files that are not in the cache with
+    the same size and modification time """
+    cachefile = cachefile or default_cache()
+    cache = load_json(cachefile, {})
+    res = {}
+    todo = []
+    for fname in fnames:
+        st = os.stat(fname)
+        entry = cache.get(op.abspath(fname))
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            res[fname] = entry['md5']
+        else:
+            todo.append((fname, st))
+    if todo:
+        if len(todo) == 1 or processes == 1:
+            sums = [md5(fname) for fname, _ in todo]
+        else:
+            with multiprocessing.Pool(processes) as pool:
+                sums = pool.map(md5, [fname for fname, _ in todo], chunksize=1)
+        for (fname, st), md5sum in zip(todo, sums):
+            res[fname] = md5sum
+            cache[op.abspath(fname)] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'md5': md5sum}
+        save_json(cachefile, cache)
+    return res
+
+
+def description(fnames, url_prefix='http://www.lexique.org', root='/var/www', tags=(), mandatory_columns=None,
+                cachefile=None, processes=None):
+    """ the embryo of the json description of the tables 'fnames' """
+    sums = md5sums(fnames, cachefile, processes)
+    desc = {
+        "_comment": "generated by catalogue.py",
+        "name": "XXXX",
+        "description": "XXXXXX",
+        "website": "XXXXXX",
+        "readme": "XXXXXX",
+        "urls": [{"url": url_prefix + op.abspath(fname).replace(root, ''),
+                  "bytes": op.getsize(fname),
+                  "md5sum": sums[fname]} for fname in fnames],
+        "type": "tsv",
+    }
+    if mandatory_columns is not None:
+        desc["mandatory_columns"] = list(mandatory_columns)
+    desc["tags"] = list(tags)
+    return desc
+
+
+def markdown_row(fname):
+    try:
+        with open(fname, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        return f'|[{data["name"]}]({data["readme"]}) | {data["description"]} |'
+    except (OSError, ValueError, KeyError, TypeError):
+        return f"\n **** Problem with file {fname} \n"
+
+
+def markdown_table(fnames, output=None):
+    """ the Markdown table of the json descriptions 'fnames'. With 'output', the table
+    is written there, and its rows are cached in output + '.cache.json' """
+    cachefile = output + '.cache.json' if output else None
+    cache = load_json(cachefile, {}) if cachefile else {}
+    rows = []
+    changed = False
+    for fname in fnames:
+        st = os.stat(fname)
+        key = op.abspath(fname)
+        entry = cache.get(key)
+        if not entry or entry['size'] != st.st_size or entry['mtime_ns'] != st.st_mtime_ns:
+            entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'row': markdown_row(fname)}
+            cache[key] = entry
+            changed = True
+        rows.append(entry['row'])
+    table = '\n'.join(['|base|description|', '|----|-----------|'] + rows + ['', ''])
+    if output:
+        if changed or len(cache) != len(fnames):
+            cache = {op.abspath(f): cache[op.abspath(f)] for f in fnames}
+            save_json(cachefile, cache)
+        if load_text(output) != table:
+            with open(output, 'w', encoding='utf-8') as f:
+                f.write(table)
+    return table
+
+
+def load_text(filename):
+    try:
+        with open(filename, encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="builds the json descriptions and the list of the datasets")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('json', help="print the embryo of the json description of tables")
+    p.add_argument('tables', nargs='+')
+    p.add_argument('--url-prefix', default='http://www.lexique.org')
+    p.add_argument('--root', default='/var/www', help="removed from the paths of the tables in the urls")
+    p.add_argument('--tags', nargs='*', default=[])
+    p.add_argument('--mandatory-columns', nargs='*')
+    p.add_argument('--processes', type=int, help="default: one per cpu")
+    p.add_argument('--cache', help="md5 cache (default: %s)" % default_cache())
+    p = sub.add_parser('md', help="make the Markdown table of json descriptions")
+    p.add_argument('jsonfiles', nargs='+')
+    p.add_argument('-o', '--output', help="write (and cache) the table there, rather than on stdout")
+    args = parser.parse_args()
+
+    if args.command == 'json':
+        desc = description(args.tables, args.url_prefix, args.root, args.tags, args.mandatory_columns,
+                           args.cache, args.processes)
+        json.dump(desc, sys.stdout, ensure_ascii=False, indent=4)
+        print()
+    else:
+        table = markdown_table(args.jsonfiles, args.output)
+        if not args.output:
+            sys.stdout.write(table)
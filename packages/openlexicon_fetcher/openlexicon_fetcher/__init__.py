@@ -0,0 +1,6 @@
+""" fetches lexical databases from the openlexicon project (see fetcher.py) """
+
+from .fetcher import (FetchError, data_home, read_locations, read_description, files_of, select,
+                      manifest, download, fetch_file, fetch_datasets)
+
+__version__ = '1.0.0'
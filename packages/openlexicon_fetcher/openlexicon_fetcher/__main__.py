@@ -0,0 +1,36 @@
+""" python -m openlexicon_fetcher [datasets] """
+
+import sys
+import argparse
+from .fetcher import FetchError, read_locations, fetch_datasets
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m openlexicon_fetcher',
+                                     description="downloads (only if needed) openlexicon datasets")
+    parser.add_argument('datasets', nargs='*', help="names in locations.toml (default: all)")
+    parser.add_argument('--list', action='store_true', help="list the available datasets")
+    parser.add_argument('--formats', default='tsv,rds', help="preferred extensions (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=8, help="parallel downloads (default: %(default)s)")
+    parser.add_argument('--dest', help="local folder (default: $OPENLEXICON_DATASETS, see data_home())")
+    parser.add_argument('--locations', help="locations.toml file or url")
+    args = parser.parse_args(argv)
+
+    locations = read_locations(args.locations)
+    if args.list:
+        for name in locations:
+            print(name)
+        return 0
+    try:
+        res = fetch_datasets(args.datasets or None, args.formats.split(','), args.workers, args.dest, locations)
+    except FetchError as e:
+        print(e, file=sys.stderr)
+        return 1
+    for name, paths in res.items():
+        for path in paths:
+            print(f'{name}\t{path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
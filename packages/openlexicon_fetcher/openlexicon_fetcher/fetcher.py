@@ -0,0 +1,239 @@
+""" downloads openlexicon datasets, concurrently and only when needed
+
+The datasets are listed in datasets-info/locations.toml (name -> url of a json
+description). A description gives the url, size and md5sum of the files of a
+dataset, either as a list 'urls' (datasets-info/_json/) or as 'url_rds' with
+'md5sum' and 'bytes' (datasets-info/links/).
+
+Files are downloaded by a pool of threads into <name>.part, with the md5 computed
+while the bytes arrive. An interrupted download is resumed with an HTTP Range
+request. Verified files are recorded in manifest.json (md5, size, mtime) in the
+data folder, so that they are not hashed again as long as they are unchanged.
+"""
+
+import os
+import os.path as op
+import io
+import json
+import hashlib
+import threading
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import tomllib
+except ImportError:  # python < 3.11
+    import tomli as tomllib
+
+REMOTE = 'https://raw.githubusercontent.com/chrplr/openlexicon/master/datasets-info/'
+LOCAL = op.join(op.dirname(op.abspath(__file__)), '..', '..', '..', 'datasets-info')
+CHUNKSIZE = 1 << 20
+MANIFEST = 'manifest.json'
+
+
+class FetchError(Exception):
+    pass
+
+
+def data_home():
+    """ local folder for openlexicon datasets (same rules as get_data.home() in fetch_datasets.R) """
+    home = os.getenv('OPENLEXICON_DATASETS')
+    if not home:
+        home = op.join(os.getenv('XDG_DATA_HOME') or op.expanduser('~'), 'openlexicon_datasets')
+    os.makedirs(home, exist_ok=True)
+    return home
+
+
+def _is_url(path):
+    return urllib.parse.urlparse(path).scheme in ('http', 'https', 'file')
+
+
+def read_bytes(source, timeout=60):
+    if _is_url(source):
+        with urllib.request.urlopen(source, timeout=timeout) as r:
+            return r.read()
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def read_locations(source=None):
+    """ {dataset name: url of its json description}, from locations.toml (default: the
+    one of this repository, or else the one on github) """
+    if source is None:
+        source = op.join(LOCAL, 'locations.toml')
+        if not op.isfile(source):
+            source = REMOTE + 'locations.toml'
+    locations = tomllib.load(io.BytesIO(read_bytes(source)))
+    return {name: entry['url'] for name, entry in locations.items()}
+
+
+def read_description(url, json_dirs=None):
+    """ the json description at 'url', read from a local copy when there is one: a file
+    with the same name in 'json_dirs' (default: datasets-info/_json and links) """
+    if json_dirs is None:
+        json_dirs = [op.join(LOCAL, '_json'), op.join(LOCAL, 'links')]
+    name = op.basename(urllib.parse.urlparse(url).path) if _is_url(url) else op.basename(url)
+    for d in json_dirs:
+        if op.isfile(op.join(d, name)):
+            url = op.join(d, name)
+            break
+    return json.loads(read_bytes(url).decode('utf-8'))
+
+
+def files_of(description):
+    """ the files of a dataset: list of {'url', 'md5sum', 'bytes'} (md5sum and bytes may be None) """
+    if 'urls' in description:
+        return [{'url': u['url'], 'md5sum': u.get('md5sum'), 'bytes': u.get('bytes')}
+                for u in description['urls']]
+    files = []
+    if 'url_rds' in description:
+        files.append({'url': description['url_rds'], 'md5sum': description.get('md5sum'),
+                      'bytes': description.get('bytes')})
+    if 'url_tsv' in description:
+        files.append({'url': description['url_tsv'], 'md5sum': None, 'bytes': None})
+    return files
+
+
+def select(files, formats=('tsv', 'rds')):
+    """ the files of the first format (extension) in 'formats' that the dataset has """
+    for fmt in formats:
+        chosen = [f for f in files if f['url'].endswith('.' + fmt)]
+        if chosen:
+            return chosen
+    return []
+
+
+class manifest:
+    """ the verified files of a folder: {filename: {md5sum, bytes, mtime_ns, url}} """
+    def __init__(self, dirname):
+        self.filename = op.join(dirname, MANIFEST)
+        self.lock = threading.Lock()
+        try:
+            with open(self.filename) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def verified(self, path, md5):
+        """ True if 'path' was verified with md5sum 'md5' and has not changed since """
+        entry = self.entries.get(op.basename(path))
+        if entry is None or (md5 is not None and entry['md5sum'] != md5):
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return st.st_size == entry['bytes'] and st.st_mtime_ns == entry['mtime_ns']
+
+    def record(self, path, md5, url=None):
+        st = os.stat(path)
+        with self.lock:
+            self.entries[op.basename(path)] = {'md5sum': md5, 'bytes': st.st_size,
+                                               'mtime_ns': st.st_mtime_ns, 'url': url}
+            tmp = f'{self.filename}.tmp{os.getpid()}.{threading.get_ident()}'
+            with open(tmp, 'w') as f:
+                json.dump(self.entries, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.filename)
+
+
+def md5sum(filename, h=None):
+    h = h or hashlib.md5()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNKSIZE), b''):
+            h.update(chunk)
+    return h
+
+
+def download(url, dest, md5=None, size=None, retries=3, timeout=60, progress=None):
+    """ downloads 'url' into 'dest', resuming 'dest'.part if it exists; returns the md5sum.
+    Raises FetchError if the md5sum is not 'md5'. """
+    part = dest + '.part'
+    for attempt in range(retries + 1):
+        h = hashlib.md5()
+        done = 0
+        if op.exists(part):
+            done = op.getsize(part)
+            if size is not None and done > size:
+                os.remove(part)
+                done = 0
+            else:
+                md5sum(part, h)  # the bytes already there, once
+        request = urllib.request.Request(url)
+        if done:
+            request.add_header('Range', f'bytes={done}-')
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as r:
+                if done and r.status != 206:  # the server sends the whole file
+                    h = hashlib.md5()
+                    done = 0
+                with open(part, 'ab' if done else 'wb') as f:
+                    for chunk in iter(lambda: r.read(CHUNKSIZE), b''):
+                        f.write(chunk)
+                        h.update(chunk)
+                        done += len(chunk)
+                        if progress:
+                            progress(url, done, size)
+        except urllib.error.HTTPError as e:
+            if e.code == 416 and done:  # nothing left to download
+                pass
+            elif attempt == retries or e.code < 500:
+                raise FetchError(f"{url}: {e}") from e
+            else:
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            if attempt == retries:
+                raise FetchError(f"{url}: {e}") from e
+            continue
+        if size is not None and done < size:  # connection closed early: resume
+            if attempt == retries:
+                raise FetchError(f"{url}: {done} bytes received out of {size}")
+            continue
+        digest = h.hexdigest()
+        if md5 is not None and digest != md5:
+            os.remove(part)
+            raise FetchError(f"{url}: the md5sums don't match ({digest} instead of {md5}). Either the upstream "
+                             "files are inconsistent or someone is messing with your internet connection.")
+        os.replace(part, dest)
+        return digest
+
+
+def fetch_file(file, destdir, mfst, retries=3, progress=None):
+    """ returns the local path of 'file' (see files_of), downloaded if needed """
+    dest = op.join(destdir, op.basename(urllib.parse.urlparse(file['url']).path))
+    md5 = file['md5sum']
+    if mfst.verified(dest, md5):
+        return dest
+    if op.isfile(dest) and md5 is not None and md5sum(dest).hexdigest() == md5:
+        mfst.record(dest, md5, file['url'])  # e.g. downloaded by the R fetcher
+        return dest
+    digest = download(file['url'], dest, md5, file['bytes'], retries, progress=progress)
+    mfst.record(dest, digest, file['url'])
+    return dest
+
+
+def fetch_datasets(datasets=None, formats=('tsv', 'rds'), workers=8, destdir=None, locations=None,
+                   json_dirs=None, retries=3, progress=None):
+    """ downloads (only if needed) the files of 'datasets' (default: all of them) and
+    returns {dataset: [local paths]}.
+
+    formats: preferred extensions, the first one available is fetched for each dataset
+    locations: {name: url of the json description} (default: read_locations()) """
+    if locations is None:
+        locations = read_locations()
+    if datasets is None:
+        datasets = list(locations)
+    unknown = [d for d in datasets if d not in locations]
+    if unknown:
+        raise FetchError(f"Some datasets are unknown: {', '.join(unknown)}")
+    destdir = destdir or data_home()
+    os.makedirs(destdir, exist_ok=True)
+    mfst = manifest(destdir)
+    with ThreadPoolExecutor(workers) as pool:
+        descriptions = dict(zip(datasets, pool.map(lambda d: read_description(locations[d], json_dirs), datasets)))
+        jobs = {d: [pool.submit(fetch_file, f, destdir, mfst, retries, progress)
+                    for f in select(files_of(descriptions[d]), formats)]
+                for d in datasets}
+        return {d: [job.result() for job in js] for d, js in jobs.items()}
@@ -0,0 +1,107 @@
+""" tests of the fetcher against a local HTTP server
+
+    python -m unittest discover -s packages/openlexicon_fetcher/tests
+"""
+
+import os
+import os.path as op
+import json
+import hashlib
+import tempfile
+import threading
+import unittest
+import http.server
+
+from openlexicon_fetcher import fetcher
+
+DATA = bytes(range(256)) * 4096  # 1 MiB
+MD5 = hashlib.md5(DATA).hexdigest()
+
+
+class handler(http.server.BaseHTTPRequestHandler):
+    """ serves the files of 'self.server.files' ({path: bytes}), with Range requests """
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('Range')))
+        body = self.server.files.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        status, start = 200, 0
+        rng = self.headers.get('Range')
+        if rng:
+            start = int(rng[len('bytes='):].split('-')[0])
+            if start >= len(body):
+                self.send_error(416)
+                return
+            status = 206
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body) - start))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+        self.end_headers()
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+class test_fetcher(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.files = {}
+        self.server.requests = []
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = op.join(self.tmp.name, 'new', 'datasets')  # does not exist yet
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def serve_dataset(self, md5=MD5):
+        self.server.files['/Test.tsv'] = DATA
+        self.server.files['/Test.json'] = json.dumps(
+            {'urls': [{'url': self.url + '/Test.tsv', 'md5sum': md5, 'bytes': len(DATA)}]}).encode()
+        self.server.files['/locations.toml'] = f'[Test]\nurl = "{self.url}/Test.json"\n'.encode()
+
+    def fetch(self):
+        locations = fetcher.read_locations(self.url + '/locations.toml')
+        return fetcher.fetch_datasets(['Test'], destdir=self.dest, locations=locations, json_dirs=[])
+
+    def test_fetch_datasets(self):
+        self.serve_dataset()
+        paths = self.fetch()
+        self.assertEqual(paths, {'Test': [op.join(self.dest, 'Test.tsv')]})
+        with open(paths['Test'][0], 'rb') as f:
+            self.assertEqual(f.read(), DATA)
+        with open(op.join(self.dest, fetcher.MANIFEST)) as f:
+            self.assertEqual(json.load(f)['Test.tsv']['md5sum'], MD5)
+        # verified in the manifest: not downloaded again
+        n = len(self.server.requests)
+        self.fetch()
+        self.assertNotIn(('/Test.tsv', None), self.server.requests[n:])
+
+    def test_resume(self):
+        self.serve_dataset()
+        os.makedirs(self.dest)
+        dest = op.join(self.dest, 'Test.tsv')
+        with open(dest + '.part', 'wb') as f:
+            f.write(DATA[:300000])
+        self.assertEqual(fetcher.download(self.url + '/Test.tsv', dest, MD5, len(DATA)), MD5)
+        self.assertIn(('/Test.tsv', 'bytes=300000-'), self.server.requests)
+        with open(dest, 'rb') as f:
+            self.assertEqual(f.read(), DATA)
+        self.assertFalse(op.exists(dest + '.part'))
+
+    def test_md5_mismatch(self):
+        self.serve_dataset(md5='0' * 32)
+        with self.assertRaises(fetcher.FetchError):
+            self.fetch()
+        self.assertFalse(op.exists(op.join(self.dest, 'Test.tsv')))
+        self.assertFalse(op.exists(op.join(self.dest, 'Test.tsv.part')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,45 +3,212 @@
 # License: GPL-2
 
 """
-Input: a list with *one* word per line on the standard input
+Input: a list with *one* word per line on the standard input (or in files)
 
-Output: all anagrams on the standard output 
+Output: all anagrams on the standard output, one group per line, the words of a
+group and the groups in sorted order
+
+    python anagrams.py < liste.de.mots.francais.frgut.txt > anagrammes.txt
+    python anagrams.py --processes 4 --save-index anagrams.idx worldlex.txt > anagrammes.txt
+    python anagrams.py --index anagrams.idx --of chien --sub-anagrams-of chienne
+
+The words are read line by line and grouped by their signature (their sorted
+letters). With --processes, chunks of lines are grouped by a pool of processes
+and the groups are merged.
+
+The index saved by --save-index holds all the signatures with their words and
+their letter counts (.npy arrays), to find the anagrams of any string, and the
+words that can be written with some of its letters (sub-anagrams): a signature
+is only compared letter by letter if it is not longer than the string and all its
+letters occur in the string (64-bit masks of letters).
 """
 
+import os
+import os.path as op
 import sys
+import json
+import shutil
+import argparse
+import itertools
+import multiprocessing
+import numpy as np
+
+INDEX_VERSION = 1
+
+
+def signature(w):
+    """ the key of the anagrams of 'w': its sorted letters """
+    return "".join(sorted(w))
+
+
+def index_words(words, ana=None):
+    """ adds 'words' to the dict 'ana': {signature: set of words} """
+    if ana is None:
+        ana = {}
+    join = "".join
+    for word in words:
+        w = word.rstrip()
+        if w:
+            key = join(sorted(w))  # signature(w)
+            group = ana.get(key)
+            if group is None:
+                ana[key] = {w}
+            else:
+                group.add(w)
+    return ana
+
+
+def merge(ana, other):
+    for key, words in other.items():
+        if key in ana:
+            ana[key].update(words)
+        else:
+            ana[key] = words
+    return ana
+
+
+def read_lines(files):
+    """ the lines of 'files' (stdin if empty), one after the other """
+    if not files:
+        yield from sys.stdin
+    for filename in files:
+        with open(filename, encoding='utf-8') as f:
+            yield from f
+
+
+def index_lines(lines, processes=1, chunksize=200000):
+    """ {signature: set of words} of the words of 'lines' (an iterable) """
+    if processes <= 1:
+        return index_words(lines)
+    lines = iter(lines)
+    chunks = iter(lambda: list(itertools.islice(lines, chunksize)), [])
+    ana = {}
+    with multiprocessing.Pool(processes) as pool:
+        for part in pool.imap(index_words, chunks):
+            merge(ana, part)
+    return ana
+
+
+def groups(ana, minsize=2):
+    """ the sorted lists of anagrams (at least 'minsize' words), in sorted order """
+    return sorted(sorted(words) for words in ana.values() if len(words) >= minsize)
+
+
+class anagramindex:
+    """ signatures of a lexicon, with their words and letter counts, stored in arrays """
+    fields = ('counts', 'masks', 'lengths', 'starts')
+
+    def __init__(self, chars, counts, masks, lengths, starts, words):
+        self.chars = chars  # the letters
+        self.code = {c: i for i, c in enumerate(chars)}
+        self.counts = counts  # uint8 (or wider): counts[i, c] is the number of letters c in signature i
+        self.masks = masks  # uint64: bit (c % 64) is set when signature i has letter c
+        self.lengths = lengths  # int64: number of letters of signature i
+        self.starts = starts  # int64: the words of signature i are words[starts[i]:starts[i+1]]
+        self.words = words
 
-dictionary = sys.stdin.readlines()
+    @classmethod
+    def build(cls, ana):
+        keys = sorted(ana)
+        chars = sorted(set(itertools.chain.from_iterable(keys)))
+        code = {c: i for i, c in enumerate(chars)}
+        lengths = np.fromiter(map(len, keys), dtype=np.int64, count=len(keys))
+        letters = np.fromiter((code[c] for key in keys for c in key), dtype=np.int64, count=int(lengths.sum()))
+        rows = np.repeat(np.arange(len(keys)), lengths)
+        counts = np.bincount(rows * len(chars) + letters, minlength=len(keys) * len(chars))
+        counts = counts.reshape(len(keys), len(chars))
+        counts = counts.astype(np.min_scalar_type(counts.max(initial=0)))  # uint8, unless a letter occurs 256 times
+        words = [w for key in keys for w in sorted(ana[key])]
+        starts = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(ana[key]) for key in keys], out=starts[1:])
+        return cls(chars, counts, cls._masks(counts), lengths, starts, words)
 
-# 'ana' will contain lists of anagrams, indexed by their letters
-ana = {}
+    @staticmethod
+    def _masks(counts):
+        bits = np.uint64(1) << (np.arange(counts.shape[1]) % 64).astype(np.uint64)
+        masks = np.zeros(len(counts), dtype=np.uint64)
+        for c in range(counts.shape[1]):
+            masks[counts[:, c] > 0] |= bits[c]
+        return masks
 
-for word in dictionary:
-    w = word.rstrip()
-    # the key is the sorted letters from 'w'
-    l = list(w)  # make a list from the characters in 'w'
-    l.sort()     # and sort them
-    key = "".join(l)  # to create 'key'
+    def save(self, dirname):
+        tmpdir = f'{dirname}.tmp{os.getpid()}'
+        os.makedirs(tmpdir)
+        for field in self.fields:
+            np.save(op.join(tmpdir, f'{field}.npy'), getattr(self, field))
+        with open(op.join(tmpdir, 'words.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.words))
+        with open(op.join(tmpdir, 'meta.json'), 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'chars': ''.join(self.chars)}, f)
+        if op.isdir(dirname):
+            shutil.rmtree(dirname)
+        os.rename(tmpdir, dirname)
 
-    # insert w in the list indexed by 'key'
-    if key in ana.keys():
-        if w not in ana[key]:
-            ana[key].append( w )
-    else:
-        ana[key] = [ w ]
+    @classmethod
+    def load(cls, dirname, mmap=True):
+        with open(op.join(dirname, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != INDEX_VERSION:
+            raise ValueError(f"{dirname}: index version {meta['version']}, expected {INDEX_VERSION}")
+        arrays = {field: np.load(op.join(dirname, f'{field}.npy'), mmap_mode='r' if mmap else None)
+                  for field in cls.fields}
+        with open(op.join(dirname, 'words.txt'), encoding='utf-8') as f:
+            text = f.read()
+        return cls(list(meta['chars']), words=text.split('\n') if text else [], **arrays)
 
-# prints the anagrams
-liste = []
+    def _query(self, s):
+        """ (counts, mask) of string 's', or None if it has letters absent from the index """
+        counts = np.zeros(len(self.chars), dtype=np.int64)
+        for c in s:
+            if c not in self.code:
+                return None
+            counts[self.code[c]] += 1
+        return counts, self._masks(counts[None, :])[0]
 
-for k in ana.keys():
-    if len(ana[k]) > 1:
-        ana[k].sort()
-        liste.append(" ".join(ana[k]))
+    def _members(self, rows):
+        return [self.words[j] for i in rows for j in range(self.starts[i], self.starts[i + 1])]
 
-liste.sort()
+    def anagrams(self, s):
+        """ the words of the index that are anagrams of 's' (including 's') """
+        q = self._query(s)
+        if q is None:
+            return []
+        counts, mask = q
+        rows = np.nonzero((self.lengths == len(s)) & (self.masks == mask))[0]
+        rows = rows[np.all(self.counts[rows] == counts, axis=1)]
+        return self._members(rows)
 
-for w in set(liste):
-     print(w)
+    def sub_anagrams(self, s, minlength=1):
+        """ the words of the index that can be written with some of the letters of 's' """
+        counts, mask = self._query(''.join(c for c in s if c in self.code))
+        keep = (self.lengths <= len(s)) & (self.lengths >= minlength) & (self.masks & ~mask == 0)
+        rows = np.nonzero(keep)[0]
+        rows = rows[np.all(self.counts[rows] <= counts, axis=1)]
+        return self._members(rows)
 
 
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="lists the anagrams of a list of words")
+    parser.add_argument('files', nargs='*', help="lists of words, one per line (default: stdin)")
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--save-index', metavar='DIR', help="save the index of all the words in DIR")
+    parser.add_argument('--index', metavar='DIR', help="query the index saved in DIR (see --of, --sub-anagrams-of)")
+    parser.add_argument('--of', nargs='+', default=[], metavar='WORD', help="print the anagrams of WORD")
+    parser.add_argument('--sub-anagrams-of', nargs='+', default=[], metavar='WORD',
+                        help="print the words made of letters of WORD")
+    parser.add_argument('--min-length', type=int, default=1, help="of the sub-anagrams")
+    args = parser.parse_args()
 
+    if args.index:
+        idx = anagramindex.load(args.index)
+        for w in args.of:
+            print(w + '\t' + " ".join(idx.anagrams(w)))
+        for w in args.sub_anagrams_of:
+            print(w + '\t' + " ".join(idx.sub_anagrams(w, args.min_length)))
+        sys.exit(0)
 
+    ana = index_lines(read_lines(args.files), args.processes)
+    if args.save_index:
+        anagramindex.build(ana).save(args.save_index)
+    # prints the anagrams
+    sys.stdout.writelines(" ".join(group) + "\n" for group in groups(ana))
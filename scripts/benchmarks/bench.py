@@ -0,0 +1,342 @@
+#! /usr/bin/env python3
+
+""" benchmarks of the hot paths of the Python scripts, and comparison of two runs
+
+    python bench.py run -o before.json
+    ... update the scripts ...
+    python bench.py run -o after.json
+    python bench.py compare before.json after.json
+
+Each benchmark runs in a fresh process (so that its peak RSS is its own) on seeded
+synthetic French-like words, on ortho-freql.txt, on brulex.txt.gz, or on
+Lexique383.tsv (in $OPENLEXICON_DATASETS; skipped if it is absent). It reports the
+time of each of its phases (the best of --repeat runs), the number of words
+processed per second, and the peak RSS, as JSON.
+
+'compare' prints the ratios of the times of two runs, and exits with status 1 when
+a phase is slower than in the first run by more than --threshold (default: 10%).
+"""
+
+import os
+import os.path as op
+import sys
+import json
+import time
+import random
+import platform
+import resource
+import argparse
+import subprocess
+import contextlib
+import multiprocessing
+
+HERE = op.dirname(op.abspath(__file__))
+SCRIPTS = op.join(HERE, '..')
+for d in ('sublexical-frequencies-python', 'french-syllabation', 'anagrams', 'lexique-python'):
+    sys.path.insert(0, op.join(SCRIPTS, d))
+
+FREQFILE = op.join(SCRIPTS, 'sublexical-frequencies-python', 'ortho-freql.txt')
+BRULEX = op.join(SCRIPTS, 'french-syllabation', 'brulex.txt.gz')
+
+ONSETS = ['', 'b', 'c', 'd', 'f', 'g', 'j', 'l', 'm', 'n', 'p', 'r', 's', 't', 'v', 'ch', 'qu', 'gn',
+          'br', 'cr', 'dr', 'fr', 'gr', 'pr', 'tr', 'vr', 'bl', 'cl', 'fl', 'gl', 'pl']
+NUCLEI = ['a', 'e', 'i', 'o', 'u', 'é', 'è', 'ou', 'ai', 'au', 'eau', 'oi', 'an', 'en', 'on', 'in', 'eu']
+CODAS = ['', '', '', '', 'r', 'l', 's', 'n', 'x', 'c', 't']
+ENDINGS = ['', '', '', 'e', 'es', 's', 'er', 'ent', 'tion', 'ment', 'eur', 'ette', 'age']
+
+
+def synthetic_words(n, seed=0):
+    """ 'n' French-like strings: 1 to 4 syllables (onset, nucleus, rare coda) and an
+    ending, always the same for a given seed """
+    rng = random.Random(seed)
+    words = []
+    for _ in range(n):
+        nsyll = rng.choice((1, 2, 2, 3, 3, 3, 4))
+        w = ''.join(rng.choice(ONSETS) + rng.choice(NUCLEI) + rng.choice(CODAS) for _ in range(nsyll))
+        words.append(w + rng.choice(ENDINGS))
+    return words
+
+
+def read_freqfile(filename=FREQFILE):
+    import pandas as pd
+    a = pd.read_csv(filename, sep='\t').dropna()
+    return a.iloc[:, 0].tolist(), a.iloc[:, 1].to_numpy()
+
+
+def read_brulex(filename=BRULEX):
+    """ the phonological forms of Brulex """
+    import gzip
+    with gzip.open(filename, 'rt', encoding='latin-1') as f:
+        return [line.rstrip('\n').split('\t')[1] for line in f]
+
+
+class phases:
+    """ times the phases of a benchmark: with ph('name'): ... """
+    def __init__(self):
+        self.times = {}
+
+    @contextlib.contextmanager
+    def __call__(self, name):
+        t0 = time.perf_counter()
+        yield
+        self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - t0
+
+
+# The benchmarks: f(ph, size, seed) times its phases with ph, and returns the number
+# of words it processed.
+
+def bench_dico_add(ph, size, seed):
+    import dico
+    with ph('read'):
+        words, weights = read_freqfile()
+    with ph('add_many'):
+        d = dico.dico()
+        d.add_many(words, weights)
+    with ph('add'):
+        d = dico.dico()
+        for w, f in zip(words, weights):
+            d.add(w, f)
+        d.flush()
+    with ph('normalize'):
+        d.normalize_weights()
+    return len(words)
+
+
+def bench_dico_add_dict(ph, size, seed):
+    import dico
+    with ph('read'):
+        words, weights = read_freqfile()
+    with ph('add'):
+        d = dico.dico('dict')
+        for w, f in zip(words, weights):
+            d.add(w, f)
+    with ph('normalize'):
+        d.normalize_weights()
+    return len(words)
+
+
+def bench_compute_stats(ph, size, seed):
+    import dico
+    with ph('build'):
+        d = dico.dico()
+        d.add_many(*read_freqfile())
+        d.normalize_weights()
+    strings = synthetic_words(size, seed)
+    with ph('compute_stats'):
+        for s in strings:
+            dico.compute_stats(s, d)
+    with ph('score_batch'):
+        for _ in d.score_batch(strings):
+            pass
+    return 2 * len(strings)
+
+
+def bench_neighbours(ph, size, seed):
+    import dico
+    with ph('build'):
+        d = dico.dico()
+        d.add_many(read_freqfile()[0])
+        nb = d.neighbourhood()
+    for kind in ('substitution', 'deletion', 'addition', 'transposition'):
+        with ph(kind):
+            nb.counts(kind)
+    queries = synthetic_words(min(size, 2000), seed)
+    with ph('queries'):
+        for q in queries:
+            d.neighboors_substitution(q)
+            d.neighboors_deletion(q)
+            d.neighboors_addition(q)
+            d.neighboors_transposition(q)
+    return 4 * len(nb) + 4 * len(queries)
+
+
+def bench_old20(ph, size, seed):
+    import neighbours
+    words = list(dict.fromkeys(synthetic_words(min(size, 5000), seed)))
+    with ph('build'):
+        nb = neighbours.neighbourhood(words)
+    with ph('old20'):
+        nb.old(20)
+    return len(words)
+
+
+def bench_syllabify(ph, size, seed):
+    import syllabation
+    with ph('read'):
+        phons = read_brulex()
+    with ph('compile'):
+        syl = syllabation.syllabifier(**syllabation.ALPHABETS['brulex'])
+    with ph('syllabify'):
+        syl.analyse_many(phons)
+    return len(phons)
+
+
+def bench_anagrams(ph, size, seed):
+    import anagrams
+    words = synthetic_words(size, seed)
+    with ph('group'):
+        ana = anagrams.index_lines(words)
+        anagrams.groups(ana)
+    with ph('index'):
+        idx = anagrams.anagramindex.build(ana)
+    queries = words[:1000]
+    with ph('queries'):
+        for w in queries:
+            idx.anagrams(w)
+    return len(words) + len(queries)
+
+
+def _lexique_tsv():
+    import lexique
+    tsvfile = op.join(lexique.data_home(), 'Lexique383.tsv')
+    if not op.isfile(tsvfile):
+        raise FileNotFoundError(tsvfile)
+    return tsvfile
+
+
+def bench_read_csv(ph, size, seed):
+    import pandas as pd
+    tsvfile = _lexique_tsv()
+    with ph('read_csv'):
+        a = pd.read_csv(tsvfile, sep='\t')
+    with ph('read_csv_usecols'):
+        pd.read_csv(tsvfile, sep='\t', usecols=['ortho', 'freqfilms2', 'freqlivres'])
+    return len(a)
+
+
+def bench_lexique_load(ph, size, seed):
+    import lexique
+    tsvfile = _lexique_tsv()
+    md5 = lexique.md5sum(tsvfile)  # not timed: load() reads it from Lexique383.json
+    cachedir = op.join(lexique.data_home(), 'lexique-cache')
+    with ph('first_load'):  # builds the cache if needed
+        a = lexique.load_table(tsvfile, md5=md5, cachedir=cachedir)
+    with ph('load'):
+        lexique.load_table(tsvfile, md5=md5, cachedir=cachedir)
+    with ph('load_columns'):
+        lexique.load_table(tsvfile, ['ortho', 'freqfilms2'], md5=md5, cachedir=cachedir)
+    return len(a)
+
+
+BENCHMARKS = {name[len('bench_'):]: f for name, f in list(globals().items()) if name.startswith('bench_')}
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kB on Linux
+
+
+def run_one(name, size, seed):
+    """ runs a benchmark in this process; returns its results, or {'skipped': reason} """
+    ph = phases()
+    t0 = time.perf_counter()
+    try:
+        items = BENCHMARKS[name](ph, size, seed)
+    except (FileNotFoundError, ImportError) as e:
+        return {'skipped': f'{type(e).__name__}: {e}'}
+    seconds = time.perf_counter() - t0
+    return {'items': items, 'seconds': seconds, 'words_per_s': items / seconds,
+            'peak_rss_mb': peak_rss_mb(), 'phases': ph.times}
+
+
+def run(names, size, seed, repeat=3):
+    """ {name: results}, each benchmark running 'repeat' times in a fresh process:
+    the best time of each phase, and the largest peak RSS """
+    ctx = multiprocessing.get_context('spawn')
+    results = {}
+    for name in names:
+        best = None
+        for _ in range(repeat):
+            with ctx.Pool(1) as pool:
+                res = pool.apply(run_one, (name, size, seed))
+            if 'skipped' in res:
+                best = res
+                break
+            if best is None:
+                best = res
+            else:
+                for phase, t in res['phases'].items():
+                    best['phases'][phase] = min(best['phases'][phase], t)
+                best['seconds'] = min(best['seconds'], res['seconds'])
+                best['peak_rss_mb'] = max(best['peak_rss_mb'], res['peak_rss_mb'])
+        if 'seconds' in best:
+            best['words_per_s'] = best['items'] / best['seconds']
+        results[name] = best
+        print(f"{name:>16}: " + (f"skipped ({best['skipped']})" if 'skipped' in best else
+                                 f"{best['seconds']:8.3f} s {best['words_per_s']:12.0f} words/s "
+                                 f"{best['peak_rss_mb']:8.1f} MB"), file=sys.stderr)
+    return results
+
+
+def environment():
+    import numpy as np
+    import pandas as pd
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=HERE, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit, 'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.machine(),
+            'system': platform.system(), 'cpus': os.cpu_count()}
+
+
+def compare(base, new, threshold=0.10):
+    """ prints the ratios new / base of the times of the phases of two runs; returns
+    the list of (benchmark, phase, ratio) slower by more than 'threshold' """
+    regressions = []
+    print(f"{'benchmark':>16} {'phase':>18} {'before':>9} {'after':>9} {'ratio':>7}")
+    for name, b in base['benchmarks'].items():
+        n = new['benchmarks'].get(name)
+        if n is None or 'skipped' in b or 'skipped' in n:
+            continue
+        rows = [(phase, t, n['phases'][phase]) for phase, t in b['phases'].items() if phase in n['phases']]
+        rows.append(('total', b['seconds'], n['seconds']))
+        for phase, t0, t1 in rows:
+            ratio = t1 / t0 if t0 > 0 else float('inf')
+            flag = ''
+            if ratio > 1 + threshold:
+                flag = '  SLOWER'
+                regressions.append((name, phase, ratio))
+            elif ratio < 1 - threshold:
+                flag = '  faster'
+            print(f"{name:>16} {phase:>18} {t0:9.4f} {t1:9.4f} {ratio:7.2f}{flag}")
+        print(f"{name:>16} {'peak RSS (MB)':>18} {b['peak_rss_mb']:9.1f} {n['peak_rss_mb']:9.1f} "
+              f"{n['peak_rss_mb'] / b['peak_rss_mb']:7.2f}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="benchmarks of the Python scripts")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('run', help="run the benchmarks")
+    p.add_argument('-o', '--output', help="json file of the results (default: stdout)")
+    p.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="default: all the benchmarks")
+    p.add_argument('--size', type=int, default=100000, help="number of synthetic words (default: %(default)s)")
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--repeat', type=int, default=3)
+    p = sub.add_parser('compare', help="compare two runs")
+    p.add_argument('base')
+    p.add_argument('new')
+    p.add_argument('--threshold', type=float, default=0.10, help="relative slowdown reported as a regression")
+    p = sub.add_parser('list', help="list the benchmarks")
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        print('\n'.join(BENCHMARKS))
+    elif args.command == 'run':
+        res = {'environment': environment(), 'size': args.size, 'seed': args.seed, 'repeat': args.repeat,
+               'benchmarks': run(args.only or list(BENCHMARKS), args.size, args.seed, args.repeat)}
+        text = json.dumps(res, indent=1)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text + '\n')
+        else:
+            print(text)
+    else:
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        if (base['size'], base['seed']) != (new['size'], new['seed']):
+            print("warning: the runs have different --size or --seed", file=sys.stderr)
+        sys.exit(1 if compare(base, new, args.threshold) else 0)
@@ -0,0 +1,319 @@
+#! /usr/bin/env python3
+
+""" concordancer: positional inverted index of a corpus, for KWIC, phrase and collocation queries
+
+    python concordancer.py build Subtlex-US-corpus.txt.gz us-index --processes 4
+    python concordancer.py kwic us-index dog --width 6 --limit 20
+    python concordancer.py lines us-index "hot dog"
+    python concordancer.py collocates us-index dog --window 4 --limit 30
+
+The corpus is a text file (gzip-compressed or not) with one sentence per line. It
+is read once, by chunks of lines that a pool of processes cuts into tokens (split
+on blanks, punctuation removed, as in context_search.Rmd; lowercased with
+--lower). The index directory holds:
+
+  - terms.txt: the vocabulary, one term per line (term i is on line i)
+  - tokens.bin: the corpus as a stream of term numbers (uint32)
+  - lines.txt and lines.npy: the lines of the corpus, with their byte offsets
+  - starts.npy: the position of the first token of each line in tokens.bin
+  - postings.bin: for each term, the sorted positions of its occurrences, as
+    deltas encoded in varints (7 bits per byte, high bit set on all the bytes of a
+    number but the last), postings.npy: where the postings of each term start, and
+    counts.npy: the number of occurrences of each term
+
+All the files are memory-mapped: a query decodes the postings of its terms (with
+numpy, without a loop over the positions), and reads only the tokens and lines
+around them.
+"""
+
+import os
+import os.path as op
+import re
+import sys
+import gzip
+import json
+import shutil
+import argparse
+import itertools
+import collections
+import multiprocessing
+import numpy as np
+
+INDEX_VERSION = 1
+PUNCT = re.compile(r'[^\w\s]+')
+
+
+def open_text(filename, encoding='utf-8'):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rt', encoding=encoding, errors='replace')
+    return open(filename, 'r', encoding=encoding, errors='replace')
+
+
+def tokenize(line, lower=False):
+    if lower:
+        line = line.lower()
+    return PUNCT.sub('', line).split()
+
+
+def _tokenize_chunk(job):
+    """ tokens of a list of lines: (vocabulary of the chunk, term numbers in this
+    vocabulary, number of tokens of each line) """
+    lines, lower = job
+    vocab = {}
+    ids = []
+    counts = []
+    for line in lines:
+        tokens = tokenize(line, lower)
+        counts.append(len(tokens))
+        ids.extend(vocab.setdefault(t, len(vocab)) for t in tokens)
+    return list(vocab), np.array(ids, dtype=np.uint32), np.array(counts, dtype=np.int64)
+
+
+def varint_encode(values, lengths=False):
+    """ the varint bytes (uint8 array) of an array of non-negative integers (and the
+    number of bytes of each integer, if lengths) """
+    values = np.asarray(values, dtype=np.uint64)
+    nbytes = np.ones(len(values), dtype=np.int64)
+    v = values >> np.uint64(7)
+    while v.any():
+        nbytes += v > 0
+        v >>= np.uint64(7)
+    offsets = np.cumsum(nbytes) - nbytes
+    out = np.zeros(int(nbytes.sum()), dtype=np.uint8)
+    for j in range(int(nbytes.max(initial=0))):
+        sel = nbytes > j
+        byte = (values[sel] >> np.uint64(7 * j)) & np.uint64(0x7F)
+        more = (nbytes[sel] - 1 > j).astype(np.uint64) << np.uint64(7)
+        out[offsets[sel] + j] = byte | more
+    return (out, nbytes) if lengths else out
+
+
+def varint_decode(buf):
+    """ the integers (int64 array) encoded in an array of varint bytes """
+    buf = np.asarray(buf, dtype=np.uint8)
+    if len(buf) == 0:
+        return np.zeros(0, dtype=np.int64)
+    last = buf < 0x80
+    starts = np.concatenate(([0], np.nonzero(last)[0][:-1] + 1))
+    group = np.cumsum(np.concatenate(([0], last[:-1]))).astype(np.int64)
+    shift = (np.arange(len(buf)) - starts[group]) * 7
+    return np.add.reduceat((buf & 0x7F).astype(np.int64) << shift, starts)
+
+
+def build(corpus, dirname, processes=1, lower=False, chunksize=50000, encoding='utf-8'):
+    """ indexes 'corpus' in the directory 'dirname' """
+    tmpdir = f'{dirname}.tmp{os.getpid()}'
+    os.makedirs(tmpdir)
+    vocab = {}
+    starts = [np.zeros(1, dtype=np.int64)]
+    lineoffsets = [np.zeros(1, dtype=np.int64)]
+    ntokens = 0
+    nbytes = 0
+    with open_text(corpus, encoding) as f, \
+            open(op.join(tmpdir, 'tokens.bin'), 'wb') as ftokens, \
+            open(op.join(tmpdir, 'lines.txt'), 'wb') as flines:
+        lines = (line.rstrip('\n') for line in f)
+        chunks = iter(lambda: list(itertools.islice(lines, chunksize)), [])
+        pending = collections.deque()  # the chunks sent to the pool, to write their lines in order
+
+        def jobs():
+            for chunk in chunks:
+                pending.append(chunk)
+                yield chunk, lower
+
+        pool = multiprocessing.Pool(processes) if processes > 1 else None
+        try:
+            for local, ids, counts in (pool.imap(_tokenize_chunk, jobs()) if pool else map(_tokenize_chunk, jobs())):
+                chunk = pending.popleft()
+                lut = np.array([vocab.setdefault(t, len(vocab)) for t in local] or [0], dtype=np.uint32)
+                lut[ids].tofile(ftokens)
+                starts.append(ntokens + np.cumsum(counts))
+                ntokens += int(counts.sum())
+                encoded = [(line + '\n').encode('utf-8') for line in chunk]
+                flines.writelines(encoded)
+                lineoffsets.append(nbytes + np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64,
+                                                                  count=len(encoded))))
+                nbytes = int(lineoffsets[-1][-1])
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+    np.save(op.join(tmpdir, 'starts.npy'), np.concatenate(starts))
+    np.save(op.join(tmpdir, 'lines.npy'), np.concatenate(lineoffsets))
+    with open(op.join(tmpdir, 'terms.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(vocab))
+    _write_postings(tmpdir, len(vocab))
+    with open(op.join(tmpdir, 'meta.json'), 'w') as f:
+        json.dump({'version': INDEX_VERSION, 'corpus': op.abspath(corpus), 'lower': lower,
+                   'tokens': ntokens, 'terms': len(vocab)}, f)
+    if op.isdir(dirname):
+        shutil.rmtree(dirname)
+    os.rename(tmpdir, dirname)
+
+
+def _write_postings(dirname, nterms, blocksize=1 << 24):
+    """ sorts the positions of the tokens by term and writes their deltas as varints """
+    tokens = _memmap(op.join(dirname, 'tokens.bin'), np.uint32)
+    order = np.argsort(tokens, kind='stable')  # the positions of each term, in increasing order
+    counts = np.bincount(tokens, minlength=nterms)
+    firsts = np.cumsum(counts) - counts
+    offsets = np.zeros(nterms + 1, dtype=np.int64)
+    with open(op.join(dirname, 'postings.bin'), 'wb') as f:
+        t0 = 0
+        while t0 < nterms:  # by blocks of terms with about 'blocksize' positions
+            t1 = max(int(np.searchsorted(firsts, firsts[t0] + blocksize, 'right')), t0 + 1)
+            lo, hi = int(firsts[t0]), int(firsts[t1 - 1] + counts[t1 - 1])
+            pos = order[lo:hi].astype(np.int64)
+            deltas = np.diff(pos, prepend=0)
+            deltas[firsts[t0:t1] - lo] = pos[firsts[t0:t1] - lo]  # the first position of a term is absolute
+            encoded, nbytes = varint_encode(deltas, lengths=True)
+            offsets[t0 + 1:t1 + 1] = offsets[t0] + np.cumsum(np.add.reduceat(nbytes, firsts[t0:t1] - lo))
+            encoded.tofile(f)
+            t0 = t1
+    np.save(op.join(dirname, 'postings.npy'), offsets)
+    np.save(op.join(dirname, 'counts.npy'), counts)
+
+
+def _memmap(filename, dtype):
+    if op.getsize(filename) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode='r')
+
+
+class concordancer:
+    """ queries on an index made by build() """
+    def __init__(self, dirname):
+        with open(op.join(dirname, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != INDEX_VERSION:
+            raise ValueError(f"{dirname}: index version {meta['version']}, expected {INDEX_VERSION}")
+        self.lower = meta['lower']
+        with open(op.join(dirname, 'terms.txt'), encoding='utf-8') as f:
+            text = f.read()
+        self.terms = text.split('\n') if text else []
+        self.index = {t: i for i, t in enumerate(self.terms)}
+        self.tokens = _memmap(op.join(dirname, 'tokens.bin'), np.uint32)
+        self.postings = _memmap(op.join(dirname, 'postings.bin'), np.uint8)
+        self.offsets = np.load(op.join(dirname, 'postings.npy'), mmap_mode='r')
+        self.counts = np.load(op.join(dirname, 'counts.npy'), mmap_mode='r')
+        self.starts = np.load(op.join(dirname, 'starts.npy'), mmap_mode='r')
+        self.text = _memmap(op.join(dirname, 'lines.txt'), np.uint8)
+        self.lineoffsets = np.load(op.join(dirname, 'lines.npy'), mmap_mode='r')
+
+    def __len__(self):
+        """ number of tokens """
+        return len(self.tokens)
+
+    def frequency(self, term):
+        i = self._term(term)
+        return 0 if i is None else int(self.counts[i])
+
+    def _term(self, term):
+        return self.index.get(term.lower() if self.lower else term)
+
+    def positions(self, term):
+        """ the sorted positions of 'term' in the token stream """
+        i = self._term(term)
+        if i is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.cumsum(varint_decode(self.postings[self.offsets[i]:self.offsets[i + 1]]))
+
+    def line_of(self, positions):
+        return np.searchsorted(self.starts, positions, 'right') - 1
+
+    def phrase(self, words):
+        """ the positions of the first word of the occurrences of the sequence 'words'
+        (a list, or a string of words separated by blanks) within a line """
+        if isinstance(words, str):
+            words = tokenize(words)
+        if not words:
+            return np.zeros(0, dtype=np.int64)
+        pos = self.positions(words[0])
+        for k, w in enumerate(words[1:], 1):
+            pos = np.intersect1d(pos, self.positions(w) - k, assume_unique=True)
+        if len(words) > 1 and len(pos):
+            lines = self.line_of(pos)
+            pos = pos[pos + len(words) <= self.starts[lines + 1]]
+        return pos
+
+    def line(self, i):
+        return self.text[self.lineoffsets[i]:self.lineoffsets[i + 1]].tobytes().decode('utf-8').rstrip('\n')
+
+    def lines(self, words, limit=None):
+        """ the line numbers and lines where 'words' occur """
+        nums = np.unique(self.line_of(self.phrase(words)))[:limit]
+        return [(int(i), self.line(i)) for i in nums]
+
+    def kwic(self, words, width=5, limit=None):
+        """ keywords in context: list of (line number, left context, words, right context),
+        the contexts being at most 'width' tokens of the same line """
+        if isinstance(words, str):
+            words = tokenize(words)
+        pos = self.phrase(words)[:limit]
+        lines = self.line_of(pos)
+        res = []
+        for p, i in zip(pos.tolist(), lines.tolist()):
+            lo = max(int(self.starts[i]), p - width)
+            hi = min(int(self.starts[i + 1]), p + len(words) + width)
+            left = ' '.join(self.terms[t] for t in self.tokens[lo:p])
+            match = ' '.join(self.terms[t] for t in self.tokens[p:p + len(words)])
+            right = ' '.join(self.terms[t] for t in self.tokens[p + len(words):hi])
+            res.append((i, left, match, right))
+        return res
+
+    def collocates(self, words, window=5, min_count=1):
+        """ the words found at most 'window' tokens before or after the occurrences of
+        'words' in the same line: list of (collocate, count, frequency, pmi) by decreasing
+        count, where pmi = log2(count * N / (frequency of words * frequency * 2 window)) """
+        if isinstance(words, str):
+            words = tokenize(words)
+        pos = self.phrase(words)
+        if len(pos) == 0:
+            return []
+        lines = self.line_of(pos)
+        d = np.concatenate((np.arange(-window, 0), np.arange(len(words), len(words) + window)))
+        around = pos[:, None] + d[None, :]
+        inside = (around >= self.starts[lines][:, None]) & (around < self.starts[lines + 1][:, None])
+        counts = np.bincount(self.tokens[around[inside]], minlength=len(self.terms))
+        ids = np.nonzero(counts >= min_count)[0]
+        ids = ids[np.argsort(-counts[ids], kind='stable')]
+        freqs = self.counts[ids]
+        with np.errstate(divide='ignore'):
+            pmi = np.log2(counts[ids] * len(self.tokens) / (len(pos) * freqs * 2 * window))
+        return [(self.terms[i], int(c), int(f), float(m)) for i, c, f, m in zip(ids, counts[ids], freqs, pmi)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="concordancer of a corpus (one sentence per line)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('build', help="index a corpus")
+    p.add_argument('corpus', help="text file, possibly gzip-compressed")
+    p.add_argument('index', help="directory of the index")
+    p.add_argument('--processes', type=int, default=1)
+    p.add_argument('--lower', action='store_true', help="lowercase the tokens")
+    p.add_argument('--encoding', default='utf-8')
+    for name, help in (('kwic', "keywords in context"), ('lines', "lines where words occur"),
+                       ('collocates', "words that occur near words")):
+        p = sub.add_parser(name, help=help)
+        p.add_argument('index')
+        p.add_argument('words', help="a word, or a sequence of words (between quotes)")
+        p.add_argument('--limit', type=int, help="maximal number of results")
+    for p in sub.choices['kwic'], sub.choices['collocates']:
+        p.add_argument('--width', '--window', type=int, default=5, dest='width', help="tokens before and after")
+    sub.choices['collocates'].add_argument('--min-count', type=int, default=2)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build(args.corpus, args.index, args.processes, args.lower, encoding=args.encoding)
+        sys.exit(0)
+    c = concordancer(args.index)
+    if args.command == 'kwic':
+        for i, left, match, right in c.kwic(args.words, args.width, args.limit):
+            print(f"{i + 1}\t{left[-60:]:>60}  {match}  {right[:60]}")
+    elif args.command == 'lines':
+        for i, line in c.lines(args.words, args.limit):
+            print(f"{i + 1}\t{line}")
+    else:
+        print('collocate\tcount\tfrequency\tpmi')
+        for w, n, f, m in c.collocates(args.words, args.width, args.min_count)[:args.limit]:
+            print(f"{w}\t{n}\t{f}\t{m:.3f}")
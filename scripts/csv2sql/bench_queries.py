@@ -0,0 +1,70 @@
+#! /usr/bin/env python3
+
+""" latency of the lookups of the apps in the database made by csv2sql.py
+
+Usage: python bench_queries.py [lexique383.db] [-r REPEAT]
+
+Each query is timed with the indexes (and the FTS5 table for substrings) and
+without them (full scan), and the median and 95th percentile are printed in ms.
+The trigram tokenizer of the FTS5 table cannot match patterns shorter than 3
+characters: those are searched with GLOB on the table (see csv2sql.substring_query).
+"""
+
+import time
+import random
+import sqlite3
+import argparse
+import numpy as np
+
+
+def queries(c, seed=0):
+    """ (name, indexed query, parameters, full-scan query, parameters), after the apps/ (lexique,
+    openlexicon): word lists, column filters and substring searches """
+    words = [w for (w,) in c.execute('SELECT DISTINCT ortho FROM Lexique')]
+    random.seed(seed)
+    word = random.choice(words)
+    wordlist = random.sample(words, 100)
+    marks = ', '.join('?' * len(wordlist))
+    prefix = word[:3]
+    return [
+        ('ortho = word', 'SELECT * FROM Lexique WHERE ortho = ?', [word],
+         'SELECT * FROM Lexique NOT INDEXED WHERE ortho = ?', [word]),
+        ('ortho IN 100 words', f'SELECT * FROM Lexique WHERE ortho IN ({marks})', wordlist,
+         f'SELECT * FROM Lexique NOT INDEXED WHERE ortho IN ({marks})', wordlist),
+        ('lemme = word', 'SELECT ortho FROM Lexique WHERE lemme = ?', [word],
+         'SELECT ortho FROM Lexique NOT INDEXED WHERE lemme = ?', [word]),
+        ('cgram, nblettres 5-7', 'SELECT ortho FROM Lexique WHERE cgram = ? AND nblettres BETWEEN 5 AND 7', ['ADV'],
+         'SELECT ortho FROM Lexique NOT INDEXED WHERE cgram = ? AND nblettres BETWEEN 5 AND 7', ['ADV']),
+        ('ortho prefix', 'SELECT ortho FROM Lexique WHERE ortho >= ? AND ortho < ?', [prefix, prefix + '\U0010ffff'],
+         "SELECT ortho FROM Lexique NOT INDEXED WHERE substr(ortho, 1, ?) = ?", [len(prefix), prefix]),
+        ('ortho substring', 'SELECT ortho FROM Lexique_fts WHERE ortho MATCH ?', ['"tion"'],
+         "SELECT ortho FROM Lexique WHERE instr(ortho, ?)", ['tion']),
+        ('phon substring', 'SELECT phon FROM Lexique_fts WHERE phon MATCH ?', ['"sj§"'],
+         "SELECT phon FROM Lexique WHERE instr(phon, ?)", ['sj§']),
+        ('ortho substring < 3', 'SELECT ortho FROM Lexique WHERE ortho GLOB ?', ['*ph*'],
+         "SELECT ortho FROM Lexique WHERE instr(ortho, ?)", ['ph']),
+    ]
+
+
+def timeit(c, sql, params, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        n = len(c.execute(sql, params).fetchall())
+        times.append(time.perf_counter() - t0)
+    return n, np.median(times) * 1000, np.percentile(times, 95) * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('dbfile', nargs='?', default='lexique383.db')
+    parser.add_argument('-r', '--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    c = sqlite3.connect(f'file:{args.dbfile}?mode=ro', uri=True)
+    print(f"{'query':24}{'rows':>7}{'indexed ms':>12}{'p95':>8}{'scan ms':>10}{'p95':>8}")
+    for name, sql, params, scan, scan_params in queries(c):
+        n, med, p95 = timeit(c, sql, params, args.repeat)
+        m, smed, sp95 = timeit(c, scan, scan_params, args.repeat)
+        assert n == m, name
+        print(f"{name:24}{n:7d}{med:12.3f}{p95:8.3f}{smed:10.3f}{sp95:8.3f}")
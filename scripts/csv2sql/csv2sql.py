@@ -1,38 +1,146 @@
 #!/usr/bin/env python3
 # Time-stamp: <2020-02-07 10:43:59 christophe@pallier.org>
 
-""" Convert lexique383.tsv into a msqlite dabase """
+""" Convert lexique383.tsv into a sqlite database
+
+Usage: python csv2sql.py [--tsv Lexique383.tsv] [lexique383.db]
+
+All the columns of the table are exported in table 'Lexique', with types derived
+from the data (INTEGER, REAL or TEXT). Indexes are created on ortho, lemme,
+(cgram, nblettres) and nblettres, and the FTS5 table 'Lexique_fts' (case-sensitive trigram tokenizer) indexes ortho
+and phon for substring searches, e.g.:
+
+    SELECT Lexique.* FROM Lexique_fts JOIN Lexique ON Lexique.rowid = Lexique_fts.rowid
+    WHERE Lexique_fts.ortho MATCH 'tion'
+
+The trigram tokenizer cannot match patterns shorter than 3 characters (MATCH 'ph'
+returns no rows): these are searched in the table itself, with GLOB, the
+case-sensitive LIKE of sqlite (see substring_query):
+
+    SELECT * FROM Lexique WHERE ortho GLOB '*ph*'
+"""
 
 import sys
+import os
 import os.path as op
-from pandas import read_csv
+import argparse
 import sqlite3
-#from tqdm import tqdm
+import urllib.request
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, op.join(op.dirname(op.abspath(__file__)), '..', 'lexique-python'))
+import lexique
+
+URL = 'http://www.lexique.org/databases/Lexique383/Lexique383.tsv'
+TABLE = 'Lexique'
+INDEXED = (('ortho',), ('lemme',), ('cgram', 'nblettres'), ('nblettres',))
+FTS_COLUMNS = ('ortho', 'phon')
+CHUNKSIZE = 50000
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def substring_query(pattern, column='ortho', table=TABLE):
+    """ (sql, parameters) selecting the rowids of 'table' whose 'column' contains 'pattern':
+    through the FTS5 table, or by a scan of 'table' for patterns of less than 3 characters """
+    if len(pattern) >= 3:
+        return (f'SELECT rowid FROM {quote(table + "_fts")} WHERE {quote(column)} MATCH ?',
+                ['"' + pattern.replace('"', '""') + '"'])
+    glob = ''.join(f'[{ch}]' if ch in '*?[' else ch for ch in pattern)
+    return f'SELECT rowid FROM {quote(table)} WHERE {quote(column)} GLOB ?', ['*' + glob + '*']
+
+
+def sql_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def column_types(a):
+    """ SQL type of each column; float columns that only hold integers are INTEGER """
+    types = {}
+    for name in a.columns:
+        t = sql_type(a[name].dtype)
+        if t == 'REAL':
+            v = a[name].dropna().to_numpy()
+            if len(v) and np.all(v == np.round(v)) and np.all(np.abs(v) < 2 ** 53):
+                t = 'INTEGER'
+        types[name] = t
+    return types
+
 
+def rows(a, types):
+    """ the rows of 'a' as tuples of Python values (None for missing values) """
+    cols = []
+    for name in a.columns:
+        col = a[name]
+        missing = col.isna().to_numpy()
+        if types[name] == 'INTEGER':
+            values = col.fillna(0).to_numpy().astype(np.int64).tolist()
+        elif types[name] == 'REAL':
+            values = col.to_numpy(dtype=np.float64).tolist()
+        else:
+            values = col.astype(object).tolist()
+        for i in np.nonzero(missing)[0]:
+            values[i] = None
+        cols.append(values)
+    return zip(*cols)
 
-if not op.isfile('Lexique383.csv'):
-    try:
-        a = read_csv('http://www.lexique.org/databases/Lexique383/Lexique383.tsv', delimiter='\t')
-    except:
-        sys.exit(1)
-    a.to_csv('Lexique383.tsv', sep='\t')
 
-a = read_csv('Lexique383.tsv', delimiter='\t')
+def export(a, dbfile, table=TABLE, indexed=INDEXED, fts_columns=FTS_COLUMNS, chunksize=CHUNKSIZE):
+    """ writes DataFrame 'a' in a new sqlite database 'dbfile' """
+    types = column_types(a)
+    tmpfile = f'{dbfile}.tmp{os.getpid()}'
+    if op.exists(tmpfile):
+        os.remove(tmpfile)
+    conn = sqlite3.connect(tmpfile)
+    c = conn.cursor()
+    # bulk load: no journal sync, large cache
+    c.execute('PRAGMA journal_mode = WAL')
+    c.execute('PRAGMA synchronous = OFF')
+    c.execute('PRAGMA temp_store = MEMORY')
+    c.execute('PRAGMA cache_size = -200000')
 
-conn = sqlite3.connect('lexique383.db')
-c = conn.cursor()
+    columns = ', '.join(f'{quote(name)} {types[name]}' for name in a.columns)
+    c.execute(f'CREATE TABLE {quote(table)} ({columns})')
+    insert = f'INSERT INTO {quote(table)} VALUES ({", ".join("?" * len(a.columns))})'
+    for start in range(0, len(a), chunksize):
+        c.executemany(insert, rows(a.iloc[start:start + chunksize], types))
+        conn.commit()
 
-# create table
-#c.execute('''CREATE TABLE Lexique (ortho text, cgram text, freq real)''')
-# or
-#c.execute('''OPEN Lexique''')
+    for names in indexed:
+        if all(name in a.columns for name in names):
+            c.execute(f'CREATE INDEX {quote("_".join((table,) + names))} ON {quote(table)} '
+                      f'({", ".join(map(quote, names))})')
+    fts = [name for name in fts_columns if name in a.columns]
+    if fts:
+        c.execute(f'CREATE VIRTUAL TABLE {quote(table + "_fts")} USING fts5('
+                  f'{", ".join(quote(n) for n in fts)}, content={quote(table)}, content_rowid=rowid, '
+                  f"tokenize='trigram case_sensitive 1')")
+        c.execute(f"INSERT INTO {quote(table + '_fts')}({quote(table + '_fts')}) VALUES ('rebuild')")
+    conn.commit()
+    c.execute('ANALYZE')
+    c.execute('PRAGMA journal_mode = DELETE')  # a single file, without -wal
+    conn.close()
+    os.replace(tmpfile, dbfile)
 
-for r in a.iterrows():
-    cmd = f'INSERT INTO Lexique VALUES ("{r[1].ortho}", "{r[1].cgram}", {r[1].freqlivres})'
-    print(cmd)
-    c.execute(cmd)
 
-# save the changes and close the connection
-conn.commit()
-conn.close()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('dbfile', nargs='?', default='lexique383.db')
+    parser.add_argument('--tsv', default='Lexique383.tsv', help="downloaded from lexique.org if missing")
+    args = parser.parse_args()
 
+    if not op.isfile(args.tsv):
+        try:
+            urllib.request.urlretrieve(URL, args.tsv)
+        except OSError as e:
+            sys.exit(f"cannot download {URL}: {e}")
+    a = lexique.load(tsvfile=args.tsv)
+    export(a, args.dbfile)
+    print(f"{len(a)} rows, {len(a.columns)} columns written in {args.dbfile}", file=sys.stderr)
@@ -0,0 +1,317 @@
+#! /usr/bin/env python3
+
+"""
+This script hyphenates French words with the TeX patterns of hyph2.pallier.tex,
+without TeX (Liang's algorithm, as TeX's \\showhyphens in cesure.tex)
+
+Usage: python hyphenate.py [--patterns hyph2.pallier.tex] [--column N] [--processes P] [files]
+       python hyphenate.py --lexique > coupes.lexique383.txt
+       python hyphenate.py --check coupes.txt --encoding latin-1
+
+It reads tab-separated lines and appends the hyphenated form of the column N (1 by
+default) to each line, e.g. abaissa -> abaissa<TAB>a-bais-sa. With --lexique, it
+hyphenates all the words of Lexique383 (see ../lexique-python). With --check, it
+hyphenates the words of a file of hyphenated words (coupes.txt) and prints the
+words hyphenated differently.
+"""
+
+#  The \patterns of the TeX file are read once into a trie, packed like TeX's
+#  (a double array: the transitions of a state s are in the slots base[s] + letter,
+#  whose check is s), and every state where a pattern ends has its values. A word
+#  is hyphenated by walking the trie from each of its letters (with '.' at both
+#  ends) and keeping the maximum value between two letters: an odd value is a
+#  break. hyphenate_many() walks the trie for all the letters of a chunk of words
+#  at once, with numpy.
+#
+#  As TeX, a word containing a hyphen is not hyphenated (TeX then inserts a
+#  discretionary, which stops the hyphenation), and each word of an expression
+#  is hyphenated alone (a ca-pel-la).
+
+import re
+import sys
+import argparse
+import fileinput
+import itertools
+import unicodedata
+import multiprocessing
+import os.path as op
+import numpy as np
+
+PATTERNS = op.join(op.dirname(op.abspath(__file__)), 'hyph2.pallier.tex')
+ACCENTS = {"'": '\u0301', '`': '\u0300', '^': '\u0302', '"': '\u0308', 'c': '\u0327'}
+
+
+def _group(text, start):
+    """ the text of the group {...} that opens at text[start], and the position after it """
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == '{':
+            depth += 1
+        elif text[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start + 1:i], i + 1
+    raise ValueError("unbalanced braces")
+
+
+def _letters(tex):
+    """ TeX accents and \\oe replaced by the letters (\\'e -> é, \\c{c} -> ç) """
+    # \n{...} holds the patterns for the OT1 glyph of \oe, which are the T1 patterns
+    # written with another code: there is a single œ here
+    tex = re.sub(r'\\n\{[^}]*\}', ' ', tex)
+    tex = re.sub(r'\\oe(?![a-zA-Z])', 'œ', tex)
+    tex = re.sub(r'\\i(?![a-zA-Z])', 'i', tex)
+    tex = re.sub(r'''\\(['`^"]|c(?![a-zA-Z]))\s*\{?([a-zA-Z])\}?''',
+                 lambda m: unicodedata.normalize('NFC', m.group(2) + ACCENTS[m.group(1)]), tex)
+    if '\\' in tex:
+        raise ValueError(f"unknown TeX command in the patterns: {tex[tex.index(chr(92)):][:20]}")
+    return tex
+
+
+def read_patterns(filename, encoding='latin-1'):
+    """ (patterns, exceptions): the words of the \\patterns{} and \\hyphenation{} of a TeX file """
+    with open(filename, encoding=encoding) as f:
+        text = ''.join(re.sub(r'(?<!\\)%.*', '', line) for line in f)
+    res = {'patterns': [], 'hyphenation': []}
+    for m in re.finditer(r'\\(patterns|hyphenation)\s*(?=\{)', text):
+        group, _ = _group(text, m.end())
+        res[m.group(1)].extend(_letters(group).split())
+    if not res['patterns']:
+        raise ValueError(f"no \\patterns in {filename}")
+    return res['patterns'], res['hyphenation']
+
+
+class hyphenator:
+    """ the patterns (e.g. '1ba', '.ab3r\u00e9a') compiled into a packed trie """
+    def __init__(self, patterns, exceptions=(), lefthyphenmin=1, righthyphenmin=1):
+        self.left, self.right = lefthyphenmin, righthyphenmin
+        self.exceptions = {e.replace('-', ''): e for e in exceptions}
+        parsed = []
+        for p in patterns:
+            letters = re.sub(r'\d', '', p)
+            values = [0] * (len(letters) + 1)
+            i = 0
+            for ch in p:
+                if ch.isdigit():
+                    values[i] = int(ch)
+                else:
+                    i += 1
+            parsed.append((letters, values))
+        self.alphabet = sorted({ch for letters, _ in parsed for ch in letters})
+        self.codes = {ch: i + 1 for i, ch in enumerate(self.alphabet)}  # 0: a letter of no pattern
+        self.maxlen = max(len(letters) for letters, _ in parsed)
+        self._pack(parsed)
+
+    def _pack(self, parsed):
+        # trie of dicts, then the states in breadth-first order, each one at the first
+        # base where the slots of its transitions are free
+        trie = {}
+        for letters, values in parsed:
+            node = trie
+            for ch in letters:
+                node = node.setdefault(self.codes[ch], {})
+            node[None] = values
+        size = 1024
+        check = np.full(size, -1, dtype=np.int64)
+        base = np.zeros(size, dtype=np.int64)
+        ops = np.zeros(size, dtype=np.int64)
+        values = [[0] * (self.maxlen + 1)]
+        check[0] = 0  # the root
+        queue, first = [(0, trie)], 1
+        while queue:
+            state, node = queue.pop(0)
+            if None in node:
+                ops[state] = len(values)
+                values.append(node[None] + [0] * (self.maxlen + 1 - len(node[None])))
+            letters = sorted(c for c in node if c is not None)
+            if not letters:
+                continue
+            b = max(first - letters[0], 0)
+            while True:
+                if b + letters[-1] >= size:
+                    check = np.concatenate([check, np.full(size, -1, dtype=np.int64)])
+                    base, ops = (np.concatenate([a, np.zeros(size, dtype=np.int64)]) for a in (base, ops))
+                    size *= 2
+                if all(check[b + c] == -1 for c in letters):
+                    break
+                b += 1
+            base[state] = b
+            for c in letters:
+                check[b + c] = state
+                queue.append((b + c, node[c]))
+            while first < size and check[first] != -1:
+                first += 1
+        n = int(np.flatnonzero(check != -1).max()) + len(self.codes) + 2  # slots reachable from any base
+        self.base, self.check, self.ops = base[:n], np.concatenate([check, np.full(max(n - size, 0), -1)])[:n], ops[:n]
+        self.values = np.array(values, dtype=np.int64)
+        # the same, as lists, for hyphenate()
+        self._base, self._check, self._ops = self.base.tolist(), self.check.tolist(), self.ops.tolist()
+        self._values = [[(k, v) for k, v in enumerate(row) if v] for row in values]
+
+    def points(self, word):
+        """ the values between the letters of '.word.' (the break before word[i] is points[i + 1]) """
+        codes = [self.codes.get(ch, 0) for ch in '.' + word.lower() + '.']
+        points = [0] * (len(codes) + 1)
+        base, check, ops, values, n = self._base, self._check, self._ops, self._values, len(self._check)
+        for s in range(len(codes)):
+            state = 0
+            for c in codes[s:]:
+                t = base[state] + c
+                if t >= n or check[t] != state or c == 0:
+                    break
+                state = t
+                if ops[t]:
+                    for k, v in values[ops[t]]:
+                        if v > points[s + k]:
+                            points[s + k] = v
+        return points
+
+    def _breaks(self, word, points):
+        return [i for i in range(self.left, len(word) - self.right + 1) if points[i + 1] % 2]
+
+    def hyphenate_word(self, word):
+        """ word with '-' at the breaks """
+        if word in self.exceptions:
+            return self.exceptions[word]
+        if not word or '-' in word:
+            return word
+        cuts = [0] + self._breaks(word, self.points(word)) + [len(word)]
+        return '-'.join(word[a:b] for a, b in zip(cuts, cuts[1:]))
+
+    def hyphenate(self, text):
+        """ each word of 'text' hyphenated """
+        return ' '.join(self.hyphenate_word(w) for w in text.split(' '))
+
+    def points_many(self, words):
+        """ points() of all the 'words' at once: an array (words, max length + 3) """
+        lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words)) + 2
+        width = int(lengths.max(initial=0))
+        lut = np.zeros(0x10000, dtype=np.int64)
+        for ch, c in self.codes.items():
+            lut[ord(ch)] = c
+        text = ''.join('.' + w.lower() + '.' for w in words)
+        chars = np.frombuffer(text.encode('utf-32-le'), dtype='<u4')
+        letters = np.zeros((len(words), width + self.maxlen), dtype=np.int64)
+        rows = np.repeat(np.arange(len(words)), lengths)
+        cols = np.arange(len(chars)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        letters[rows, cols] = np.where(chars < len(lut), lut[np.minimum(chars, len(lut) - 1)], 0)
+        points = np.zeros((len(words), width + self.maxlen + 1), dtype=np.int64)
+        # a walk from each letter of each word, all the walks one letter further at each step
+        rows, starts = np.nonzero(np.arange(width)[None, :] < lengths[:, None])
+        states = np.zeros(len(rows), dtype=np.int64)
+        for depth in range(self.maxlen):
+            c = letters[rows, starts + depth]
+            t = self.base[states] + c
+            ok = (c > 0) & (t < len(self.check))
+            ok[ok] = self.check[t[ok]] == states[ok]
+            rows, starts, states = rows[ok], starts[ok], t[ok]
+            if not len(states):
+                break
+            o = self.ops[states]
+            hit = o > 0
+            r, s, vals = rows[hit], starts[hit], self.values[o[hit]]
+            # a pattern of depth + 1 letters has depth + 2 values; a walk ends once at
+            # each depth, so the (row, position) are distinct
+            for k in range(depth + 2):
+                points[r, s + k] = np.maximum(points[r, s + k], vals[:, k])
+        return points
+
+    def hyphenate_many(self, words, processes=1, chunksize=10000):
+        """ hyphenate() of all the 'words', by chunks, by 'processes' processes """
+        if processes <= 1:
+            res = []
+            for i in range(0, len(words), chunksize):
+                res.extend(self._hyphenate_chunk(words[i:i + chunksize]))
+            return res
+        words = iter(words)
+        chunks = iter(lambda: list(itertools.islice(words, chunksize)), [])
+        res = []
+        with multiprocessing.Pool(processes, _init_worker, (self,)) as pool:
+            for part in pool.imap(_hyphenate_chunk, chunks):
+                res.extend(part)
+        return res
+
+    def _hyphenate_chunk(self, texts):
+        # the words of the texts that are hyphenated, at once
+        parts = [t.split(' ') for t in texts]
+        words = sorted({w for p in parts for w in p if w and '-' not in w and w not in self.exceptions})
+        points = self.points_many(words)
+        res = dict(self.exceptions)
+        for w, pts in zip(words, points.tolist()):
+            cuts = [0] + self._breaks(w, pts) + [len(w)]
+            res[w] = '-'.join(w[a:b] for a, b in zip(cuts, cuts[1:]))
+        return [' '.join(res.get(w, w) for w in p) for p in parts]
+
+
+_worker = None
+
+
+def _init_worker(hyph):
+    global _worker
+    _worker = hyph
+
+
+def _hyphenate_chunk(texts):
+    return _worker._hyphenate_chunk(texts)
+
+
+_compiled = {}
+
+
+def get_hyphenator(patterns=PATTERNS, lefthyphenmin=1, righthyphenmin=1):
+    """ the hyphenator of the TeX file 'patterns', compiled once """
+    key = (op.abspath(patterns), lefthyphenmin, righthyphenmin)
+    if key not in _compiled:
+        _compiled[key] = hyphenator(*read_patterns(patterns), lefthyphenmin, righthyphenmin)
+    return _compiled[key]
+
+
+def hyphenate(word, patterns=PATTERNS):
+    return get_hyphenator(patterns).hyphenate(word)
+
+
+def hyphenate_many(words, patterns=PATTERNS, processes=1, chunksize=10000):
+    return get_hyphenator(patterns).hyphenate_many(list(words), processes, chunksize)
+
+
+def check(hyph, filename, encoding='utf-8', processes=1):
+    """ the (expected, obtained) hyphenations that differ, for the hyphenated words of 'filename' """
+    with open(filename, encoding=encoding) as f:
+        expected = [line.strip() for line in f if line.strip()]
+    obtained = hyph.hyphenate_many([e.replace('-', '') for e in expected], processes)
+    return len(expected), [(e, o) for e, o in zip(expected, obtained) if e != o]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="hyphenates words with TeX patterns")
+    parser.add_argument('files', nargs='*', help="default: stdin")
+    parser.add_argument('--patterns', default=PATTERNS, help="TeX file of \\patterns (default: %(default)s)")
+    parser.add_argument('--column', type=int, default=1, help="column of the words (from 1)")
+    parser.add_argument('--lexique', action='store_true', help="hyphenate the words of Lexique383")
+    parser.add_argument('--check', metavar='HYPHENATED', help="compare with a file of hyphenated words (coupes.txt)")
+    parser.add_argument('--lefthyphenmin', type=int, default=1)
+    parser.add_argument('--righthyphenmin', type=int, default=1)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--encoding', default='utf-8')
+    args = parser.parse_args()
+
+    hyph = get_hyphenator(args.patterns, args.lefthyphenmin, args.righthyphenmin)
+    sys.stdout.reconfigure(encoding=args.encoding)
+    if args.check:
+        n, diffs = check(hyph, args.check, args.encoding, args.processes)
+        for e, o in diffs:
+            print(f'{e}\t{o}')
+        print(f"{n} words, {len(diffs)} hyphenated differently", file=sys.stderr)
+        sys.exit(1 if diffs else 0)
+    if args.lexique:
+        sys.path.insert(0, op.join(op.dirname(op.abspath(__file__)), '..', 'lexique-python'))
+        import lexique
+        rows = [[w] for w in dict.fromkeys(lexique.load(['ortho'])['ortho'].dropna())]
+        col = 0
+    else:
+        sys.stdin.reconfigure(encoding=args.encoding)
+        rows = [line.rstrip('\n').split('\t') for line in fileinput.input(args.files, encoding=args.encoding)]
+        col = args.column - 1
+    results = hyph.hyphenate_many([r[col] if col < len(r) else '' for r in rows], args.processes)
+    for r, h in zip(rows, results):
+        print('\t'.join(r + [h]))
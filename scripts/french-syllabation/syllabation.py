@@ -3,69 +3,203 @@
 
 """
 This script syllabifies words
+
+Usage: python syllabation.py [--alphabet brulex|laiptts|lexique] [--phons N] [--processes P] [files]
+
+Like syllabation.awk, it reads tab-separated lines, syllabifies the column 'phons'
+(1 by default) and appends the syllabified form, the number of syllables and the
+CVY skeleton to each line, e.g. (brulex_syll.txt):
+
+    gunzip -c brulex.txt.gz | python syllabation.py --alphabet brulex --phons 2 --encoding latin-1
 """
 
 #  Note: This script is the translation to python of an awk script that I wrote for my Phd disseration in 1993.
+#
+#  The rules of the awk script are applied one after the other, each one until it
+#  no longer matches. Every rule looks like V (consonants) V and puts a syllable
+#  boundary inside the consonants between two vowels, so that the rules only
+#  depend on each cluster of consonants between two vowels: the first rule whose
+#  consonants match the whole cluster decides the boundary. The rules are compiled
+#  once per alphabet into this decision, memorized for every cluster met, and a
+#  word is syllabified in a single pass over its vowels and clusters.
 
 
 import re
+import sys
+import argparse
 import fileinput
+import itertools
+import multiprocessing
+
+
+ALPHABETS = {
+    'brulex': dict(V="[aiouyîâêôû^eEéAO_]",  # vowels
+                   C="[ptkbdgfs/vzjmnN£]",  # consonants except liquids & semivowels
+                   C1="[pkbgfs/vzj]",
+                   L="[lR]",  # liquids
+                   Y="[ïüÿ]",  # semi-vowels
+                   X="[ptkbdgfs/vzjmnN£xlRïüÿ]",  # all consonants
+                   schwas="^*"),
+    'laiptts': dict(V="[iYeE2591a@oO§uy*]",  # Vowels
+                    C="[pbmfvtdnNkgszxSZGh]",  # Consonants except liquids & semivowels
+                    C1="[pkbgfsSvzZ]",
+                    L="[lR]",  # liquids
+                    Y="[j8w]",  # semi-vowels
+                    X="[pbmfvtdnNkgszSZGlRrhxGj8w]",  # all consonants, including semivowels
+                    schwas="^*"),
+    'lexique': dict(V="[aeiouyEO29@§51°]",  # Vowels (phon column of Lexique 3)
+                    C="[ptkbdgfsSvzZmnNGx]",  # Consonants except liquids & semivowels
+                    C1="[pkbgfsSvzZ]",
+                    L="[lR]",  # liquids
+                    Y="[j8w]",  # semi-vowels
+                    X="[ptkbdgfsSvzZmnNGxlRj8w]",  # all consonants, including semivowels
+                    schwas="°"),
+}
+
+phonetic_alphabet = "brulex"
+
+
+class syllabifier:
+    """ the syllabification rules, compiled for one phonetic alphabet """
+    def __init__(self, V, C, C1, L, Y, X, schwas=''):
+        self.V, self.C, self.L, self.Y = V, C, L, Y
+        # consonants between two vowels -> position of the syllable boundary in them
+        # (the rules of syllabation.awk, in the same order)
+        self.rules = [(re.compile(pattern), cut) for pattern, cut in [
+            ('', 0),
+            (X, 0),
+            (f'{Y}{Y}', 1),
+            (f'{C}{Y}', 0),
+            (f'{L}{Y}', 0),
+            ('[td]R', 0),
+            (f'[td]R{Y}', 0),
+            (f'{C1}{L}', 0),
+            (f'{X}{X}', 1),
+            (f'{X}{X}{X}', 1),
+            (f'{X}{X}{X}{X}', 1),
+            (f'{X}{X}{X}{X}{X}', 1)]]
+        self.vowels = re.compile(f'({V})')
+        self.schwas = [re.compile(f'-([^-]+){re.escape(s)}$') for s in schwas]
+        self.cuts = {}
+        self.classes = {}
+
+    def cut(self, cluster):
+        """ position of the syllable boundary in the consonants 'cluster' between two
+        vowels (None: no boundary) """
+        try:
+            return self.cuts[cluster]
+        except KeyError:
+            res = None
+            for pattern, cut in self.rules:
+                if pattern.fullmatch(cluster):
+                    res = cut
+                    break
+            self.cuts[cluster] = res
+            return res
+
+    def split(self, phon):
+        """ returns the phonological form with '-' between syllables, and the number of boundaries """
+        parts = self.vowels.split(phon)  # consonants, vowel, consonants, ..., vowel, consonants
+        n = 0
+        for i in range(2, len(parts) - 2, 2):
+            cut = self.cut(parts[i])
+            if cut is not None:
+                parts[i] = parts[i][:cut] + '-' + parts[i][cut:]
+                n += 1
+        return ''.join(parts), n
+
+    def skeleton(self, syll):
+        """ the CVY skeleton: V for vowels, C for consonants and liquids, Y for semi-vowels """
+        sk = []
+        for ph in syll:
+            if ph not in self.classes:
+                if re.fullmatch(self.V, ph):
+                    self.classes[ph] = 'V'
+                elif re.fullmatch(self.C, ph) or re.fullmatch(self.L, ph):
+                    self.classes[ph] = 'C'
+                elif re.fullmatch(self.Y, ph):
+                    self.classes[ph] = 'Y'
+                else:
+                    self.classes[ph] = ph
+            sk.append(self.classes[ph])
+        return ''.join(sk)
+
+    def analyse(self, phon):
+        """ returns (phon, syll, nbsyll, skeleton). A final schwa after a boundary
+        is deleted, in 'phon' as well (notR^ -> notR, aR-bR^ -> aRbR) """
+        syll, n = self.split(phon)
+        n += 1
+        for schwa in self.schwas:
+            b = schwa.sub(r'\1', syll, count=1)
+            if b != syll:  # there is a schwa to delete
+                syll = b
+                phon = phon[:-1]
+                n -= 1
+        return phon, syll, n, self.skeleton(syll)
+
+    def syllabify(self, phon):
+        return self.analyse(phon)[1]
+
+    def analyse_many(self, phons, processes=1, chunksize=10000):
+        """ analyse() of all the 'phons', by 'processes' processes """
+        if processes <= 1:
+            return [self.analyse(p) for p in phons]
+        phons = iter(phons)
+        chunks = iter(lambda: list(itertools.islice(phons, chunksize)), [])
+        res = []
+        with multiprocessing.Pool(processes, _init_worker, (self,)) as pool:
+            for part in pool.imap(_analyse_chunk, chunks):
+                res.extend(part)
+        return res
 
 
-phonetic_alphabet = "Brulex"
-
-if phonetic_alphabet == "Brulex":
-    V = "[aiouyîâêôû^eEéAO_]"; # vowels
-    C = "[ptkbdgfs/vzjmnN£]"; # consonants except liquids & semivowels
-    C1 = "[pkbgfs/vzj]";
-    L = "[lR]"; # liquids 
-    Y = "[ïüÿ]"; # semi-vowels 
-    X = "[ptkbdgfs/vzjmnN£xlRïüÿ]"; # all consonants 
-
-if phonetic_alphabet == "LAIPTTS":
-    V = "[iYeE2591a@oO§uy*]";   # Vowels
-    C = "[pbmfvtdnNkgszxSZGh]";  # Consonants except liquids & semivowels
-    C1 = "[pkbgfsSvzZ]";
-    L = "[lR]"; # liquids
-    Y = "[j8w]"; # semi-vowels
-    X = "[pbmfvtdnNkgszSZGlRrhxGj8w]";   # all consonants, including semivowels
-
-
-
-def syllabify(word):
-    w = word
-    w = re.sub(f'({V})({V})', r'\1-\2', w)
-    w = re.sub(f'({V})({X}{V})', r'\1-\2', w)
-    w = re.sub(f'({V}{Y})({Y}{V})', r'\1-\2', w)
-    w = re.sub(f'({V})({C}{V}{Y})', r'\1-\2', w)
-    w = re.sub(f'({V})({L}{Y}{V})', r'\1-\2', w)
-    w = re.sub(f'({V})([td]R{V})', r'\1-\2', w)
-    w = re.sub(f'({V})({C1}{L}{V})', r'\1-\2', w)
-    w = re.sub(f'({V})({X}{X}{V})', r'\1-\2', w)
-    w = re.sub(f'({V})({X}{X}{X}{V})', r'\1-\2', w)
-    w = re.sub(f'({V})({X}{X}{X}{X}{V})', r'\1-\2', w)
-    w = re.sub(f'({V})({X}{X}{X}{X}{X}{V})', r'\1-\2', w)
-    return w
-
-# TODO:
-# suppress the final schwa (^) in some multisyllabic words
-# notr^ -> notR
-# ar-bR^   =>  aRbR
-# b=gensub(/-([^-]+)\^$/,"\\1",1,a) ;
-#   if (b!=a) { # there is a schwa to delete
-#     a=b; 
-#     $phons=substr($phons,1,length($phons)-1);
-#     n--;
-#       }
-# # meme chose quand schwa='*'
-#   b=gensub(/-([^-]+)\*$/,"\\1",1,a) ;  
-#   if (b!=a) { # there is a schwa to delete
-#     a=b; 
-#     $phons=substr($phons,1,length($phons)-1);
-#     n--;
-#       }
+_worker = None
+
+
+def _init_worker(syl):
+    global _worker
+    _worker = syl
+
+
+def _analyse_chunk(phons):
+    return [_worker.analyse(p) for p in phons]
+
+
+_compiled = {}
+
+
+def get_syllabifier(alphabet=phonetic_alphabet):
+    """ the syllabifier of 'alphabet' ('brulex', 'laiptts' or 'lexique'), compiled once """
+    alphabet = alphabet.lower()
+    if alphabet not in _compiled:
+        _compiled[alphabet] = syllabifier(**ALPHABETS[alphabet])
+    return _compiled[alphabet]
+
+
+def syllabify(word, alphabet=phonetic_alphabet):
+    return get_syllabifier(alphabet).syllabify(word)
+
+
+def syllabify_many(words, alphabet=phonetic_alphabet, processes=1, chunksize=10000):
+    """ list of (phon, syll, nbsyll, skeleton) for the phonological forms 'words' """
+    return get_syllabifier(alphabet).analyse_many(words, processes, chunksize)
 
 
 if __name__ == '__main__':
-    for line in fileinput.input():
-        print(line + '\t' + syllabify(line))
+    parser = argparse.ArgumentParser(description="syllabifies the phonological forms of a tab-separated file")
+    parser.add_argument('files', nargs='*', help="default: stdin")
+    parser.add_argument('--alphabet', default=phonetic_alphabet, choices=sorted(ALPHABETS))
+    parser.add_argument('--phons', type=int, default=1, help="column of the phonological forms (from 1)")
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--encoding', default='utf-8')
+    args = parser.parse_args()
+
+    sys.stdin.reconfigure(encoding=args.encoding)
+    sys.stdout.reconfigure(encoding=args.encoding)
+    rows = [line.rstrip('\n').split('\t') for line in fileinput.input(args.files, encoding=args.encoding)]
+    col = args.phons - 1
+    results = syllabify_many([r[col] if col < len(r) else '' for r in rows], args.alphabet, args.processes)
+    for r, (phon, syll, n, sk) in zip(rows, results):
+        if col < len(r):
+            r[col] = phon
+        print('\t'.join(r + [syll, str(n), ' ' + sk]))
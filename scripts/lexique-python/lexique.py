@@ -0,0 +1,170 @@
+#! /usr/bin/env python3
+
+""" loads Lexique383 (or another .tsv table) from a columnar cache
+
+The first time, the .tsv file is parsed once and each column is saved in its own
+.npy file: numbers with their dtype, the categorical columns (cgram, genre,
+nombre) as small integer codes, and the other strings as one utf-8 buffer of
+lines. Later loads only read (memory-map) the columns that are asked for:
+
+    import lexique
+    lex = lexique.load(['ortho', 'freqlivres'])   # a pandas DataFrame
+
+The cache of Lexique383 lives in $OPENLEXICON_DATASETS/lexique-cache/ and is named
+after the md5 recorded in datasets-info/_json/Lexique383.json, so that it is
+rebuilt when a new version of the dataset is released. A local Lexique383.tsv
+that differs from the released one is hashed once: its md5 is kept, with its size
+and modification time, in lexique-cache/Lexique383.md5.json.
+"""
+
+import os
+import os.path as op
+import sys
+import json
+import shutil
+import warnings
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, op.join(op.dirname(op.abspath(__file__)), '..', 'sublexical-frequencies-python'))
+from dico import md5sum, data_home
+
+CACHE_VERSION = 1
+JSON_DIR = op.join(op.dirname(op.abspath(__file__)), '..', '..', 'datasets-info', '_json')
+CATEGORICAL = ('cgram', 'genre', 'nombre')
+
+
+def recorded_md5(dataset='Lexique383', ext='.tsv'):
+    """ md5 of the 'ext' file of a dataset, as recorded in its json description """
+    with open(op.join(JSON_DIR, dataset + '.json')) as f:
+        desc = json.load(f)
+    for url in desc['urls']:
+        if url['url'].endswith(ext):
+            return url['md5sum']
+    raise ValueError(f"no {ext} file in the description of {dataset}")
+
+
+def local_md5(tsvfile, recordfile):
+    """ (md5 of 'tsvfile', whether it was computed): the md5 is read from 'recordfile' as
+    long as the size and modification time of the file are unchanged, else computed
+    and recorded there """
+    st = os.stat(tsvfile)
+    key = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    try:
+        with open(recordfile) as f:
+            record = json.load(f)
+        if {k: record.get(k) for k in key} == key:
+            return record['md5'], False
+    except (OSError, ValueError, KeyError):
+        pass
+    md5 = md5sum(tsvfile)
+    os.makedirs(op.dirname(recordfile), exist_ok=True)
+    tmp = f'{recordfile}.tmp{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump(dict(key, md5=md5), f)
+    os.replace(tmp, recordfile)
+    return md5, True
+
+
+def build_cache(tsvfile, cachedir, md5=None, categorical=CATEGORICAL):
+    """ parses 'tsvfile' and saves its columns in 'cachedir' """
+    a = pd.read_csv(tsvfile, sep='\t', keep_default_na=False, na_values=[''], low_memory=False)
+    tmpdir = f'{cachedir}.tmp{os.getpid()}'
+    os.makedirs(tmpdir)
+    columns = []
+    for i, name in enumerate(a.columns):
+        col = a[name]
+        if name in categorical:
+            cat = col.astype('category')
+            codes = cat.cat.codes.to_numpy()  # -1 for missing values
+            np.save(op.join(tmpdir, f'{i}.codes.npy'), codes)
+            columns.append({'name': name, 'kind': 'categorical',
+                            'categories': [str(c) for c in cat.cat.categories]})
+        elif col.dtype.kind in 'biuf':
+            np.save(op.join(tmpdir, f'{i}.npy'), col.to_numpy())
+            columns.append({'name': name, 'kind': 'numeric'})
+        else:
+            missing = col.isna().to_numpy()
+            text = '\n'.join('' if m else str(s) for s, m in zip(col, missing))
+            if text.count('\n') != len(col) - 1:
+                raise ValueError(f"{tsvfile}: column '{name}' contains line breaks")
+            np.save(op.join(tmpdir, f'{i}.text.npy'), np.frombuffer(text.encode('utf-8'), dtype=np.uint8))
+            np.save(op.join(tmpdir, f'{i}.missing.npy'), missing)
+            columns.append({'name': name, 'kind': 'string'})
+    with open(op.join(tmpdir, 'meta.json'), 'w') as f:
+        json.dump({'version': CACHE_VERSION, 'md5': md5, 'nrows': len(a), 'columns': columns}, f)
+    if op.isdir(cachedir):
+        shutil.rmtree(cachedir)
+    os.rename(tmpdir, cachedir)
+
+
+def read_cache(cachedir, columns=None, mmap=True):
+    """ returns the 'columns' (default: all) saved in 'cachedir' as a DataFrame """
+    with open(op.join(cachedir, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta['version'] != CACHE_VERSION:
+        raise ValueError(f"{cachedir}: cache version {meta['version']}, expected {CACHE_VERSION}")
+    index = {c['name']: (i, c) for i, c in enumerate(meta['columns'])}
+    names = [c['name'] for c in meta['columns']] if columns is None else list(columns)
+    mode = 'r' if mmap else None
+    data = {}
+    for name in names:
+        if name not in index:
+            raise KeyError(f"no column '{name}' in {cachedir}")
+        i, col = index[name]
+        path = op.join(cachedir, str(i))
+        if col['kind'] == 'numeric':
+            data[name] = np.load(path + '.npy', mmap_mode=mode)
+        elif col['kind'] == 'categorical':
+            data[name] = pd.Categorical.from_codes(np.load(path + '.codes.npy'), col['categories'])
+        else:
+            text = np.load(path + '.text.npy', mmap_mode=mode).tobytes().decode('utf-8')
+            strings = np.array(text.split('\n') if meta['nrows'] else [], dtype=object)
+            strings[np.load(path + '.missing.npy')] = None
+            data[name] = strings
+    return pd.DataFrame(data, columns=names)
+
+
+def load_table(tsvfile, columns=None, md5=None, cachedir=None, categorical=CATEGORICAL):
+    """ returns the 'columns' of any .tsv file, through a cache named after its md5
+    (computed if not given) """
+    if md5 is None:
+        md5 = md5sum(tsvfile)
+    if cachedir is None:
+        cachedir = op.join(data_home(), 'lexique-cache')
+    prefix = op.splitext(op.basename(tsvfile))[0] + '-'
+    tabledir = op.join(cachedir, prefix + md5)
+    try:
+        return read_cache(tabledir, columns)
+    except (OSError, ValueError):
+        pass
+    os.makedirs(cachedir, exist_ok=True)
+    for old in os.listdir(cachedir):  # caches of former versions of the file
+        if old.startswith(prefix) and old != prefix + md5 and len(old) == len(prefix) + 32:
+            shutil.rmtree(op.join(cachedir, old), ignore_errors=True)
+    build_cache(tsvfile, tabledir, md5, categorical)
+    return read_cache(tabledir, columns)
+
+
+def load(columns=None, tsvfile=None, cachedir=None):
+    """ returns the 'columns' (default: all) of Lexique383 as a DataFrame.
+
+    'tsvfile' defaults to Lexique383.tsv in data_home() (see fetch_datasets.R). The
+    cache of this file is checked against the md5 recorded in Lexique383.json, without
+    reading the .tsv file, and is rebuilt when this md5 changes (the md5 of a local
+    file that differs is computed once, see local_md5). The cache of a
+    'tsvfile' given explicitly is named after the md5 of this file (see load_table). """
+    if tsvfile is not None:
+        return load_table(tsvfile, columns, cachedir=cachedir)
+    tsvfile = op.join(data_home(), 'Lexique383.tsv')
+    md5 = recorded_md5('Lexique383')
+    if cachedir is None:
+        cachedir = op.join(data_home(), 'lexique-cache')
+    try:
+        return read_cache(op.join(cachedir, 'Lexique383-' + md5), columns)
+    except (OSError, ValueError):
+        pass
+    actual, computed = local_md5(tsvfile, op.join(cachedir, 'Lexique383.md5.json'))
+    if actual != md5 and computed:
+        warnings.warn(f"the md5 of {tsvfile} is not the one of Lexique383.json: the file is cached as is")
+    return load_table(tsvfile, columns, actual, cachedir)
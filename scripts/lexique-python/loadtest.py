@@ -0,0 +1,126 @@
+#! /usr/bin/env python3
+
+""" load test of server.py: latency percentiles and requests per second
+
+    python server.py --workers 4 &
+    python loadtest.py --concurrency 32 --duration 10
+    python loadtest.py --endpoint score --batch 100 --json results.json
+
+Each of --concurrency clients sends requests one after the other on its own
+keep-alive connection, for --duration seconds (after --warmup seconds that are
+not measured). The requests are drawn with a fixed seed among: lookups of
+--batch words of Lexique383 (in the store), selections of Lexique383 and scores
+of --batch strings; with --distinct N, only N different requests are drawn, to
+measure the cache of the server.
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import os.path as op
+
+sys.path.insert(0, op.dirname(op.abspath(__file__)))
+
+CGRAMS = ['NOM', 'VER', 'ADJ', 'ADV']
+
+
+def make_requests(endpoint, words, batch, n, seed=0):
+    """ 'n' (path, JSON body) requests for 'endpoint' ('lookup', 'select', 'score' or 'mix') """
+    rng = random.Random(seed)
+    res = []
+    for i in range(n):
+        kind = endpoint if endpoint != 'mix' else rng.choice(('lookup', 'select', 'score'))
+        if kind == 'lookup':
+            body = {'words': rng.sample(words, batch), 'datasets': {'Lexique383': ['cgram', 'freqfilms2']}}
+        elif kind == 'select':
+            lo = rng.randint(3, 10)
+            body = {'where': {'nblettres': {'min': lo, 'max': lo + 2}, 'cgram': rng.choice(CGRAMS)},
+                    'columns': ['ortho', 'freqfilms2'], 'sample': batch, 'seed': i}
+        else:
+            body = {'strings': [''.join(rng.sample(w, len(w))) for w in rng.sample(words, batch)]}
+        res.append((f'/{kind}', json.dumps(body).encode('utf-8')))
+    return res
+
+
+async def request(reader, writer, host, path, body):
+    writer.write(f'POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body)
+    await writer.drain()
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    status = int(head[0].split()[1])
+    headers = dict(line.lower().split(': ', 1) for line in head[1:] if ': ' in line)
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:  # chunked
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status
+
+
+async def client(host, port, requests, start, stop, latencies, errors, rng):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < stop:
+            path, body = rng.choice(requests)
+            t0 = time.perf_counter()
+            status = await request(reader, writer, host, path, body)
+            t1 = time.perf_counter()
+            if t0 >= start:
+                if status == 200:
+                    latencies.append(t1 - t0)
+                else:
+                    errors.append(status)
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+async def run(host, port, requests, concurrency=16, duration=10.0, warmup=1.0, seed=0):
+    """ returns the statistics of the requests completed in 'duration' seconds """
+    latencies, errors = [], []
+    start = time.perf_counter() + warmup
+    stop = start + duration
+    await asyncio.gather(*(client(host, port, requests, start, stop, latencies, errors, random.Random(seed + i))
+                           for i in range(concurrency)))
+    lat = sorted(latencies)
+    return {'requests': len(lat), 'errors': len(errors), 'rps': len(lat) / duration,
+            'p50_ms': 1000 * percentile(lat, 0.50), 'p90_ms': 1000 * percentile(lat, 0.90),
+            'p99_ms': 1000 * percentile(lat, 0.99), 'max_ms': 1000 * (lat[-1] if lat else float('nan')),
+            'mean_ms': 1000 * sum(lat) / len(lat) if lat else float('nan')}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="load test of server.py")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8383)
+    parser.add_argument('--endpoint', default='mix', choices=['lookup', 'select', 'score', 'mix'])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds")
+    parser.add_argument('--warmup', type=float, default=1.0, help="seconds")
+    parser.add_argument('--batch', type=int, default=20, help="words per request")
+    parser.add_argument('--distinct', type=int, default=10000, help="number of different requests")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="also write the results in this file")
+    args = parser.parse_args()
+
+    import lexique
+    words = sorted(set(lexique.load(['ortho'])['ortho'].dropna()))
+    requests = make_requests(args.endpoint, words, args.batch, args.distinct, args.seed)
+    res = asyncio.run(run(args.host, args.port, requests, args.concurrency, args.duration, args.warmup, args.seed))
+    res.update(endpoint=args.endpoint, concurrency=args.concurrency, batch=args.batch, distinct=args.distinct)
+    print(f"{res['requests']} requests ({res['errors']} errors) in {args.duration:g} s: {res['rps']:.1f} req/s, "
+          f"p50 {res['p50_ms']:.2f} ms, p99 {res['p99_ms']:.2f} ms, max {res['max_ms']:.2f} ms")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(res, f, indent=1)
@@ -0,0 +1,296 @@
+#! /usr/bin/env python3
+
+""" matched lists of items: for each target item, candidates of a pool that are close on several covariates
+
+    import lexique, matching
+    lex = matching.lexicon(lexique.load())            # one row per form
+    targets = lex[lex.ortho.isin(words)]
+    pool = lex[(lex.cgram == 'NOM') & ~lex.ortho.isin(words)]
+    pairs = matching.match(targets, pool, ['freqfilms2', 'nblettres', 'nbsyll', 'old20'], lists=3, exact=['nbsyll'])
+    matching.balance(targets, pool, pairs, ['freqfilms2', 'nblettres', 'nbsyll', 'old20'])
+
+    python matching.py targets.txt --cgram NOM --lists 3 --exact nbsyll -o matched.tsv
+
+The covariates are standardized by the mean and standard deviation of the pool
+(frequencies after log10(1 + f)) and weighted; the distance of two items is the
+Euclidean distance of these features. The targets are matched by batches: for each
+batch, the nearest free candidates of each target are found by an exact search in
+blocks of the pool, and the batch is assigned to the union of these candidates with
+the Hungarian algorithm, so that the sum of the distances is minimal. With lists=k,
+each target is matched to k distinct candidates at once, which are then dealt to the
+k lists so that their mean distances stay even: the lists are disjoint. With exact
+columns (e.g. nbsyll, cgram), targets are only matched to candidates that have the
+same values.
+
+balance() reports, for each list and covariate, the means and standard deviations
+of the targets and of the matched items (frequencies in log10(1 + f)), the standardized
+mean difference, the ratio of variances and the Kolmogorov-Smirnov distance of the two
+distributions.
+"""
+
+import sys
+import warnings
+import os.path as op
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, op.join(op.dirname(op.abspath(__file__)), '..', 'sublexical-frequencies-python'))
+
+COVARIATES = ['freqfilms2', 'nblettres', 'nbsyll', 'old20', 'bigrams_mean']
+BLOCK = 1 << 22  # distances computed at once in the search of neighbours
+
+
+def lexicon(lex, by='ortho', freq='freqfilms2'):
+    """ one row per form of 'lex': the most frequent one """
+    return lex.sort_values(freq, ascending=False, kind='stable').drop_duplicates(by).sort_index()
+
+
+def add_scores(frame, names, freqfile=None, column='ortho'):
+    """ adds to 'frame' the columns 'names' of dico.score_batch (e.g. bigrams_mean) for its 'column' """
+    import dico
+    d = dico.load_or_build(freqfile or op.join(op.dirname(dico.__file__), 'ortho-freql.txt'))
+    words = [w if isinstance(w, str) else '' for w in frame[column]]
+    recs = np.concatenate([r for _, r in d.score_batch(words)]) if words else np.zeros(0, dtype=dico.SCORE_DTYPE)
+    for name in names:
+        frame[name] = recs[name]
+    return frame
+
+
+def features(frame, covariates, center, scale, weights=None):
+    """ the standardized and weighted covariates of 'frame', as an array """
+    x = np.column_stack([_values(frame, c) for c in covariates])
+    x = (x - center) / scale
+    return x if weights is None else x * np.asarray(weights, dtype=np.float64)
+
+
+def _values(frame, column):
+    v = frame[column].to_numpy(dtype=np.float64)
+    return np.log10(1 + v) if column.startswith('freq') else v
+
+
+def nearest(x, y, k, free=None):
+    """ (indices, distances) of the 'k' rows of 'y' (among the 'free' ones) that are nearest
+    to each row of 'x', in increasing distance """
+    k = min(k, len(y) if free is None else int(free.sum()))
+    idx = np.zeros((len(x), k), dtype=np.int64)
+    dist = np.zeros((len(x), k))
+    yy = (y ** 2).sum(axis=1)
+    step = max(1, BLOCK // max(len(y), 1))
+    for i in range(0, len(x), step):
+        xb = x[i:i + step]
+        d = (xb ** 2).sum(axis=1)[:, None] - 2 * xb @ y.T + yy
+        if free is not None:
+            d[:, ~free] = np.inf
+        part = np.argpartition(d, k - 1, axis=1)[:, :k] if k < len(y) else np.tile(np.arange(len(y)), (len(xb), 1))
+        near = np.take_along_axis(d, part, axis=1)
+        order = np.argsort(near, axis=1)
+        idx[i:i + step] = np.take_along_axis(part, order, axis=1)
+        dist[i:i + step] = np.sqrt(np.maximum(np.take_along_axis(near, order, axis=1), 0))
+    return idx, dist
+
+
+def assignment(cost):
+    """ the column assigned to each row of 'cost' (rows <= columns) that minimizes the sum
+    of their costs (Hungarian algorithm with potentials, vectorized over the columns) """
+    n, m = cost.shape
+    if n > m:
+        raise ValueError(f"{n} rows cannot be assigned to {m} columns")
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)  # row (from 1) assigned to each column (from 1), 0: none
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            better = ~used[1:] & (cur < minv[1:])
+            minv[1:][better] = cur[better]
+            way[1:][better] = j0
+            j1 = int(np.argmin(np.where(used[1:], np.inf, minv[1:]))) + 1
+            delta = minv[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    res = np.zeros(n, dtype=np.int64)
+    res[p[1:][p[1:] > 0] - 1] = np.flatnonzero(p[1:] > 0)
+    return res
+
+
+def _deal(distances, totals):
+    """ the list of each match of a target (by increasing distance): the nearest
+    match goes to the list whose total distance is the largest """
+    order = np.argsort(-totals, kind='stable')
+    totals[order] += distances
+    return order
+
+
+def _match_group(tx, px, lists, neighbours, batch, caliper):
+    """ (target, candidate, list, distance) arrays for targets 'tx' and candidates 'px' """
+    free = np.ones(len(px), dtype=bool)
+    totals = np.zeros(lists)
+    res = []
+    size = max(1, batch // lists)
+    for start in range(0, len(tx), size):
+        xb = tx[start:start + size]
+        left = int(free.sum()) // lists  # targets that can still be matched in every list
+        last = left < len(xb)
+        if last:
+            warnings.warn(f"{int(free.sum())} candidates left for {(len(tx) - start) * lists} matches: "
+                          f"{len(tx) - start - left} targets are not matched")
+            xb = xb[:left]
+            if not len(xb):
+                break
+        rows = len(xb) * lists
+        k = neighbours * lists
+        while True:
+            idx, _ = nearest(xb, px, k, free)
+            cand = np.unique(idx)
+            if len(cand) >= rows or k >= free.sum():
+                break
+            k *= 2
+        cost = np.sqrt(np.maximum(((np.repeat(xb, lists, axis=0)[:, None, :] - px[cand][None, :, :]) ** 2).sum(axis=2), 0))
+        cols = assignment(cost)
+        chosen = cand[cols]
+        free[chosen] = False
+        dist = cost[np.arange(rows), cols].reshape(len(xb), lists)
+        chosen = chosen.reshape(len(xb), lists)
+        for i in range(len(xb)):
+            order = np.argsort(dist[i], kind='stable')
+            lst = _deal(dist[i][order], totals)
+            for j, l in zip(order, lst):
+                res.append((start + i, chosen[i, j], l, dist[i, j]))
+        if last:
+            break
+    res = np.array(res, dtype=np.float64).reshape(-1, 4)
+    if caliper is not None:
+        res = res[res[:, 3] <= caliper]
+    return res
+
+
+def match(targets, pool, covariates=COVARIATES, lists=1, exact=(), weights=None, neighbours=10, batch=200,
+          caliper=None):
+    """ DataFrame of the matches (list, target, candidate, distance), with the index labels of
+    'targets' and 'pool' (which should not contain the targets) """
+    covariates = list(covariates)
+    exact = list(exact)
+    pool = pool.dropna(subset=covariates + exact)
+    missing = targets[covariates + exact].isna().any(axis=1)
+    if missing.any():
+        warnings.warn(f"{int(missing.sum())} targets with missing covariates are not matched")
+        targets = targets[~missing]
+    center = np.array([_values(pool, c).mean() for c in covariates])
+    scale = np.array([_values(pool, c).std() for c in covariates])
+    scale[~(scale > 0)] = 1.0
+    tx = features(targets, covariates, center, scale, weights)
+    px = features(pool, covariates, center, scale, weights)
+    if exact:
+        tkeys = pd.MultiIndex.from_frame(targets[exact])
+        pkeys = pd.MultiIndex.from_frame(pool[exact])
+        codes, uniques = pd.factorize(tkeys.append(pkeys))
+        tcodes, pcodes = codes[:len(targets)], codes[len(targets):]
+        groups = [(np.flatnonzero(tcodes == c), np.flatnonzero(pcodes == c)) for c in np.unique(tcodes)]
+    else:
+        groups = [(np.arange(len(targets)), np.arange(len(pool)))]
+    parts = []
+    for ti, pi in groups:
+        m = _match_group(tx[ti], px[pi], lists, neighbours, batch, caliper)
+        if len(m):
+            parts.append(pd.DataFrame({'list': m[:, 2].astype(int) + 1,
+                                       'target': targets.index[ti[m[:, 0].astype(int)]],
+                                       'candidate': pool.index[pi[m[:, 1].astype(int)]],
+                                       'distance': m[:, 3]}))
+    if not parts:
+        return pd.DataFrame({'list': [], 'target': [], 'candidate': [], 'distance': []})
+    return pd.concat(parts).sort_values(['list', 'target'], kind='stable').reset_index(drop=True)
+
+
+def _ks(a, b):
+    """ Kolmogorov-Smirnov distance of two samples """
+    if len(a) == 0 or len(b) == 0:
+        return np.nan
+    a, b = np.sort(a), np.sort(b)
+    x = np.concatenate([a, b])
+    return float(np.abs(np.searchsorted(a, x, 'right') / len(a) - np.searchsorted(b, x, 'right') / len(b)).max())
+
+
+def balance(targets, pool, matches, covariates=COVARIATES):
+    """ DataFrame of the balance of each list on each covariate (see the module documentation) """
+    res = []
+    for lst, m in matches.groupby('list'):
+        t = targets.loc[m['target']]
+        c = pool.loc[m['candidate']]
+        for name in covariates:
+            a = _values(t, name)
+            b = _values(c, name)
+            sa, sb = a.std(ddof=1), b.std(ddof=1)
+            pooled = np.sqrt((sa ** 2 + sb ** 2) / 2)
+            res.append({'list': lst, 'covariate': name, 'n': len(m),
+                        'target_mean': a.mean(), 'target_sd': sa, 'match_mean': b.mean(), 'match_sd': sb,
+                        'smd': (b.mean() - a.mean()) / pooled if pooled > 0 else 0.0,
+                        'var_ratio': sb ** 2 / sa ** 2 if sa > 0 else np.nan,
+                        'ks': _ks(a, b), 'mean_distance': m['distance'].mean()})
+    return pd.DataFrame(res)
+
+
+if __name__ == '__main__':
+    import time
+    import argparse
+    import lexique
+    parser = argparse.ArgumentParser(description="lists of items of Lexique383 matched to target words")
+    parser.add_argument('targets', help="file of target words, one per line ('-': stdin)")
+    parser.add_argument('--covariates', nargs='+', default=COVARIATES,
+                        help="columns of Lexique383 or statistics of dico.score_batch (default: %(default)s)")
+    parser.add_argument('--weights', nargs='+', type=float, help="weight of each covariate (default: 1)")
+    parser.add_argument('--exact', nargs='+', default=[], help="columns whose values must be equal")
+    parser.add_argument('--lists', type=int, default=1, help="number of disjoint matched lists")
+    parser.add_argument('--cgram', nargs='+', help="grammatical categories of the candidates")
+    parser.add_argument('--exclude', help="file of words that cannot be candidates")
+    parser.add_argument('--caliper', type=float, help="largest distance of a match")
+    parser.add_argument('--neighbours', type=int, default=10, help="candidates per match in the assignment")
+    parser.add_argument('-o', '--output', help="matches (default: stdout)")
+    parser.add_argument('--balance', help="balance table (default: stderr)")
+    args = parser.parse_args()
+
+    with (sys.stdin if args.targets == '-' else open(args.targets, encoding='utf-8')) as f:
+        words = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+    exclude = set(words)
+    if args.exclude:
+        with open(args.exclude, encoding='utf-8') as f:
+            exclude.update(line.strip() for line in f if line.strip())
+    t0 = time.perf_counter()
+    lex = lexique.load()
+    scores = [c for c in args.covariates if c not in lex.columns]
+    lex = lexicon(lex)
+    if scores:
+        lex = add_scores(lex, scores)
+    targets = lex[lex.ortho.isin(words)]
+    unknown = set(words) - set(targets.ortho)
+    if unknown:
+        print(f"not in Lexique383: {' '.join(sorted(unknown))}", file=sys.stderr)
+    pool = lex[~lex.ortho.isin(exclude)]
+    if args.cgram:
+        pool = pool[pool.cgram.isin(args.cgram)]
+    matches = match(targets, pool, args.covariates, args.lists, args.exact, args.weights, args.neighbours,
+                    caliper=args.caliper)
+    print(f"{len(matches)} matches of {len(targets)} targets among {len(pool)} candidates "
+          f"in {time.perf_counter() - t0:.2f} s", file=sys.stderr)
+
+    shown = list(dict.fromkeys(['ortho'] + args.covariates + args.exact))
+    out = pd.concat([matches[['list', 'distance']],
+                     targets.loc[matches['target'], shown].reset_index(drop=True).add_prefix('target_'),
+                     pool.loc[matches['candidate'], shown].reset_index(drop=True)], axis=1)
+    out.to_csv(args.output or sys.stdout, sep='\t', index=False, float_format='%.4g')
+    bal = balance(targets, pool, matches, args.covariates)
+    bal.to_csv(args.balance or sys.stderr, sep='\t', index=False, float_format='%.4g')
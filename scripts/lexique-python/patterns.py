@@ -0,0 +1,367 @@
+#! /usr/bin/env python3
+
+""" regular expression and wildcard search in the ortho and phon columns of Lexique
+
+    import lexique, patterns
+    lex = lexique.load(['ortho', 'phon'])
+    ortho = patterns.patternindex(lex['ortho'], patterns.CLASSES['ortho'])
+    ortho.search('^pr.*tion$')          # sorted row positions, as query.table.select
+    phon = patterns.patternindex(lex['phon'], patterns.CLASSES['phon'])
+    phon.matches('^CVCV$')              # distinct forms
+    phon.matches(patterns.wildcard('*CYV*'))
+
+    python patterns.py '^pr.*tion$'
+    python patterns.py --column phon --wildcard 'p*VL'
+
+Patterns are Python regular expressions (re.search), in which the upper-case
+letters of the classes of the column stand for their characters: for phon, the
+classes V, C, L, Y and X of syllabation.py (alphabet 'lexique'), for ortho V
+(vowels) and C (consonants); the letters can also be used in brackets: [LY].
+
+Each distinct form is indexed by its characters, bigrams and trigrams, with marks
+of its beginning and end, and by those of its skeleton (the class of each character:
+'CVCV'). The literal parts of a pattern give the n-grams that a match must contain
+(a union when a position has a few possible characters, the skeleton n-grams when
+it has many); the forms that contain all of them, and have a possible length, are
+then checked with the regular expression. The forms are numbered by length, so
+that a length is a range of numbers.
+"""
+
+import re
+import sys
+import os.path as op
+import itertools
+import numpy as np
+import pandas as pd
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # python < 3.11
+    import sre_parse
+
+sys.path.insert(0, op.join(op.dirname(op.abspath(__file__)), '..', 'french-syllabation'))
+from syllabation import ALPHABETS
+
+BOS, EOS = '\x01', '\x02'  # marks of the beginning and end of the forms in the n-grams
+BITS = 21  # bits per character in the keys of the n-grams (all of Unicode)
+MAX_ALTERNATIVES = 64  # largest union of n-grams for a position of a pattern
+UNKNOWN = '?'  # class of the characters that are in none
+
+CLASSES = {
+    'ortho': dict(V="[aàâäeéèêëiîïoôöuùûüyÿœæ]", C="[bcçdfghjklmnñpqrstvwxz]"),
+    'phon': {k: v for k, v in ALPHABETS['lexique'].items() if len(k) == 1},
+}
+
+
+def translate(pattern, classes):
+    """ 'pattern' with the class letters replaced by their sets of characters """
+    out = []
+    inset = escape = False
+    for i, c in enumerate(pattern):
+        if escape:
+            escape = False
+        elif c == '\\':
+            escape = True
+        elif c in classes:
+            c = classes[c][1:-1] if inset else classes[c]
+        elif c == '[' and not inset:
+            inset = True
+        elif c == ']' and inset and pattern[i - 1] != '[' and pattern[i - 2:i] != '[^':
+            inset = False
+        out.append(c)
+    return ''.join(out)
+
+
+def wildcard(pattern):
+    """ regular expression of a wildcard pattern of the whole form: '*' any string,
+    '?' any character (the other characters, classes included, match themselves) """
+    parts = ['.*' if c == '*' else '.' if c == '?' else c if c.isupper() else re.escape(c) for c in pattern]
+    return '^' + ''.join(parts) + '$'
+
+
+def _keys(codes, offsets, n):
+    """ keys of the n-grams of the strings of (codes, offsets), and the string of each """
+    lengths = np.diff(offsets)
+    counts = np.maximum(lengths - n + 1, 0)
+    owner = np.repeat(np.arange(len(lengths)), counts)
+    starts = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts) + offsets[:-1][owner]
+    keys = np.zeros(len(starts), dtype=np.int64)
+    for j in range(n):
+        keys = (keys << BITS) | codes[starts + j]
+    return keys, owner
+
+
+def gram_key(gram):
+    key = 0
+    for c in gram:
+        key = (key << BITS) | ord(c)
+    return key
+
+
+class ngramindex:
+    """ the strings that contain each character, bigram and trigram of a list of strings """
+    def __init__(self, strings):
+        self.size = len(strings)
+        text = ''.join(BOS + s + EOS for s in strings)
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+        offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum([len(s) + 2 for s in strings], out=offsets[1:])
+        keys, owners = zip(*(_keys(codes, offsets, n) for n in (1, 2, 3)))
+        keys, owners = np.concatenate(keys), np.concatenate(owners)
+        order = np.lexsort((owners, keys))
+        keys, owners = keys[order], owners[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = (keys[1:] != keys[:-1]) | (owners[1:] != owners[:-1])
+        keys, self.postings = keys[first], owners[first]
+        self.keys, starts = np.unique(keys, return_index=True)
+        self.starts = np.append(starts, len(keys))
+
+    def _found(self, grams):
+        keys = np.array([gram_key(g) for g in grams], dtype=np.int64)
+        pos = np.searchsorted(self.keys, keys)
+        return pos[(pos < len(self.keys)) & (self.keys[np.minimum(pos, len(self.keys) - 1)] == keys)]
+
+    def count(self, grams):
+        """ sum of the numbers of strings that contain each of 'grams' """
+        found = self._found(grams)
+        return int((self.starts[found + 1] - self.starts[found]).sum())
+
+    def rows(self, grams):
+        """ sorted numbers of the strings that contain one of 'grams' """
+        parts = [self.postings[self.starts[i]:self.starts[i + 1]] for i in self._found(grams)]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return parts[0] if len(parts) == 1 else _union(parts, self.size)
+
+
+def _union(parts, size):
+    """ sorted union of arrays of numbers smaller than 'size' """
+    if sum(len(p) for p in parts) < size // 8:
+        return np.unique(np.concatenate(parts))
+    mask = np.zeros(size, dtype=bool)
+    for p in parts:
+        mask[p] = True
+    return np.flatnonzero(mask)
+
+
+def _charset(op, av, alphabet, ignorecase):
+    """ the characters that the item (op, av) of a parsed pattern matches, or None """
+    if op is sre_parse.LITERAL:
+        chars = {chr(av)}
+    elif op is sre_parse.ANY:
+        chars = set(alphabet)
+    elif op is sre_parse.IN:
+        chars = set()
+        for o, a in av:
+            if o is sre_parse.LITERAL:
+                chars.add(chr(a))
+            elif o is sre_parse.RANGE and a[1] - a[0] < 256:
+                chars.update(map(chr, range(a[0], a[1] + 1)))
+            else:  # NEGATE, CATEGORY, large ranges
+                return None
+    else:
+        return None
+    if ignorecase:
+        chars |= {c.upper() for c in chars} | {c.lower() for c in chars}
+    return chars
+
+
+class _planner:
+    """ the n-grams that the matches of a parsed pattern contain: a tree of
+    ('and', [...]), ('or', [...]), ('grams', [n-grams]), ('skeleton', [n-grams]) or None (any) """
+    def __init__(self, alphabet, skeleton, ignorecase):
+        self.alphabet = alphabet
+        self.skeleton = skeleton  # class of each character
+        self.ignorecase = ignorecase
+
+    def plan(self, items):
+        self.run, self.terms = [], []
+        self._walk(items)
+        self._flush()
+        terms = [t for t in self.terms if t is not None]
+        return None if not terms else terms[0] if len(terms) == 1 else ('and', terms)
+
+    def _walk(self, items):
+        for op, av in items:
+            chars = _charset(op, av, self.alphabet, self.ignorecase)
+            if chars is not None:
+                self.run.append(chars)
+            elif op is sre_parse.AT and av in (sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING):
+                self._flush()
+                self.run.append({BOS})
+            elif op is sre_parse.AT and av in (sre_parse.AT_END, sre_parse.AT_END_STRING):
+                self.run.append({EOS})
+                self._flush()
+            elif op is sre_parse.SUBPATTERN:
+                self._walk(av[-1])
+            elif op is sre_parse.BRANCH:
+                self._flush()
+                plans = [_planner(self.alphabet, self.skeleton, self.ignorecase).plan(alt) for alt in av[1]]
+                self.terms.append(None if None in plans else ('or', plans))
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+                self._repeat(*av)
+            else:
+                self._flush()
+
+    def _repeat(self, lo, hi, sub):
+        chars = _charset(*sub[0], self.alphabet, self.ignorecase) if len(sub) == 1 else None
+        if chars is None:
+            self._flush()
+            if lo >= 1:
+                self.terms.append(_planner(self.alphabet, self.skeleton, self.ignorecase).plan(sub))
+        elif lo == hi and lo <= 8:
+            self.run.extend([chars] * lo)
+        else:
+            self.run.extend([chars] * lo)
+            self._flush()
+            self.run.extend([chars] * min(lo, 2))  # what follows is preceded by them
+
+    def _flush(self):
+        run, self.run = self.run, []
+        if not run or run in ([{BOS}], [{EOS}]):
+            return
+        windows = [run] if len(run) <= 2 else [run[i:i + 3] for i in range(len(run) - 2)]
+        for sets in windows:
+            if np.prod([len(s) for s in sets]) <= MAX_ALTERNATIVES:
+                self.terms.append(('grams', [''.join(g) for g in itertools.product(*sets)]))
+                continue
+            classes = [{self.skeleton.get(c, UNKNOWN) for c in s} for s in sets]
+            if np.prod([len(s) for s in classes]) <= MAX_ALTERNATIVES:
+                self.terms.append(('skeleton', [''.join(g) for g in itertools.product(*classes)]))
+
+
+class patternindex:
+    """ search of patterns in a column of strings (see the module documentation) """
+    def __init__(self, values, classes=None):
+        self.classes = classes or {}
+        codes, forms = pd.factorize(pd.Series(values, dtype=object))
+        lengths = np.array([len(s) for s in forms], dtype=np.int64)
+        order = np.lexsort((np.asarray(forms, dtype=object).astype(str), lengths))
+        self.forms = [forms[i] for i in order]  # distinct strings, by length
+        self.lengths = lengths[order]
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        valid = codes >= 0
+        ids = rank[codes[valid]]
+        self.order = np.flatnonzero(valid)[np.argsort(ids, kind='stable')]  # rows, by form
+        self.bounds = np.searchsorted(np.sort(ids), np.arange(len(order) + 1))
+        self.alphabet = sorted(set(''.join(self.forms)))
+        self.skeleton = {BOS: BOS, EOS: EOS}
+        for name, chars in self.classes.items():
+            for c in chars[1:-1]:
+                self.skeleton.setdefault(c, name)
+        table = str.maketrans({c: self.skeleton.get(c, UNKNOWN) for c in self.alphabet})
+        self.ids = np.arange(len(self.forms))
+        self.grams = ngramindex(self.forms)
+        self.skeletons = ngramindex([s.translate(table) for s in self.forms])
+
+    def __len__(self):
+        return len(self.forms)
+
+    def compile(self, pattern):
+        return re.compile(translate(pattern, self.classes))
+
+    def _parse(self, pattern):
+        regex = self.compile(pattern)
+        parsed = sre_parse.parse(regex.pattern, regex.flags)
+        plan = _planner(self.alphabet, self.skeleton, bool(regex.flags & re.IGNORECASE)).plan(list(parsed))
+        return regex, parsed, plan
+
+    def plan(self, pattern):
+        """ the n-grams that the matches of 'pattern' contain (see _planner) """
+        return self._parse(pattern)[2]
+
+    def _estimate(self, plan):
+        """ upper bound of the number of candidates of 'plan' """
+        if plan is None:
+            return len(self.forms)
+        kind, terms = plan
+        if kind == 'grams':
+            return min(self.grams.count(terms), len(self.forms))
+        if kind == 'skeleton':
+            return min(self.skeletons.count(terms), len(self.forms))
+        estimates = [self._estimate(t) for t in terms]
+        return min(sum(estimates), len(self.forms)) if kind == 'or' else min(estimates)
+
+    def _candidates(self, plan):
+        """ sorted numbers of the forms that contain the n-grams of 'plan' (a superset of
+        its matches, possibly all the forms) """
+        if plan is None:
+            return self.ids
+        kind, terms = plan
+        if kind == 'grams':
+            return self.grams.rows(terms)
+        if kind == 'skeleton':
+            return self.skeletons.rows(terms)
+        if kind == 'or':
+            return _union([self._candidates(t) for t in terms], len(self.forms))
+        terms = sorted(terms, key=self._estimate)
+        res = self._candidates(terms[0])
+        mask = np.zeros(len(self.forms), dtype=bool)
+        for t in terms[1:]:
+            # checking the candidates with the regular expression is cheaper than
+            # intersecting them with much larger sets
+            if len(res) == 0 or self._estimate(t) > 8 * len(res):
+                break
+            mask[:] = False
+            mask[self._candidates(t)] = True
+            res = res[mask[res]]
+        return res
+
+    def _lengths(self, parsed):
+        """ range of the numbers of the forms whose length a match can have """
+        lo, hi = parsed.getwidth()
+        items = list(parsed)
+        anchored = (len(items) >= 2 and items[0] == (sre_parse.AT, sre_parse.AT_BEGINNING)
+                    and items[-1] == (sre_parse.AT, sre_parse.AT_END))
+        first = np.searchsorted(self.lengths, lo)
+        last = np.searchsorted(self.lengths, hi, 'right') if anchored else len(self.forms)
+        return first, last
+
+    def find(self, pattern):
+        """ sorted numbers of the distinct forms that match 'pattern' """
+        regex, parsed, plan = self._parse(pattern)
+        first, last = self._lengths(parsed)
+        cand = self._candidates(plan) if self._estimate(plan) < last - first else self.ids
+        cand = cand[np.searchsorted(cand, first):np.searchsorted(cand, last)]
+        search, forms = regex.search, self.forms
+        return np.array([i for i in cand.tolist() if search(forms[i])], dtype=np.int64)
+
+    def matches(self, pattern):
+        """ the distinct forms that match 'pattern', by length """
+        return [self.forms[i] for i in self.find(pattern)]
+
+    def search(self, pattern):
+        """ sorted positions of the rows whose value matches 'pattern' """
+        ids = self.find(pattern)
+        starts, counts = self.bounds[ids], self.bounds[ids + 1] - self.bounds[ids]
+        firsts = np.cumsum(counts) - counts
+        return np.sort(self.order[np.arange(int(counts.sum())) - np.repeat(firsts - starts, counts)])
+
+
+if __name__ == '__main__':
+    import time
+    import argparse
+    import lexique
+    parser = argparse.ArgumentParser(description="forms of Lexique383 that match patterns")
+    parser.add_argument('patterns', nargs='+', help="regular expressions (re.search), with the class letters")
+    parser.add_argument('--column', default='ortho', choices=sorted(CLASSES))
+    parser.add_argument('--wildcard', action='store_true', help="the patterns are wildcards ('*', '?') of whole forms")
+    parser.add_argument('--rows', action='store_true', help="print the rows of Lexique383 instead of the forms")
+    args = parser.parse_args()
+
+    lex = lexique.load(None if args.rows else [args.column])
+    index = patternindex(lex[args.column], CLASSES[args.column])
+    for pattern in args.patterns:
+        if args.wildcard:
+            pattern = wildcard(pattern)
+        t0 = time.perf_counter()
+        if args.rows:
+            res = lex.iloc[index.search(pattern)]
+        else:
+            res = index.matches(pattern)
+        print(f"{pattern}: {len(res)} matches in {1000 * (time.perf_counter() - t0):.2f} ms", file=sys.stderr)
+        if args.rows:
+            res.to_csv(sys.stdout, sep='\t', index=False)
+        else:
+            print('\n'.join(res))
@@ -0,0 +1,181 @@
+#! /usr/bin/env python3
+
+""" indexed selection of items in Lexique-like tables
+
+    import lexique, query
+    lex = query.table(lexique.load())
+    rows = lex.select(nblettres=(5, 8), cgram='NOM', freqlivres=query.between(1, 10, 'neither'))
+    lex.take(rows, ['ortho', 'freqlivres'])
+    lex.sample(20, by='cgram', seed=1, cgram=['NOM', 'VER'], freqlivres=query.between(50, None, 'neither'))
+
+Predicates are combined with 'and'. A predicate is a value (equality), a list or set
+of values (membership), a (low, high) tuple (inclusive range, None for no bound) or
+query.between(low, high, inclusive) with inclusive in 'both', 'neither', 'left', 'right'
+as in pandas.Series.between.
+
+Each indexed column is kept sorted (numbers) or as lists of rows per value
+(categories), so that the number of rows matching a predicate is known in O(log n).
+A selection starts from the rows of the most selective indexed predicate, and checks
+the other predicates on these rows only. Selections return sorted row positions
+(numpy arrays), and no intermediate DataFrame is built.
+"""
+
+import numpy as np
+import pandas as pd
+
+INDEXES = ('nblettres', 'nbsyll', 'cgram', 'freqlemfilms2', 'freqlemlivres', 'freqfilms2', 'freqlivres')
+
+
+class between:
+    """ range predicate: low <= x <= high, with the bounds included as in pandas.Series.between """
+    def __init__(self, low=None, high=None, inclusive='both'):
+        if inclusive not in ('both', 'neither', 'left', 'right'):
+            raise ValueError(f"inclusive must be 'both', 'neither', 'left' or 'right', not {inclusive}")
+        self.low = low
+        self.high = high
+        self.inclusive = inclusive
+
+    def mask(self, values):
+        keep = np.ones(len(values), dtype=bool)
+        if self.low is not None:
+            keep &= values >= self.low if self.inclusive in ('both', 'left') else values > self.low
+        if self.high is not None:
+            keep &= values <= self.high if self.inclusive in ('both', 'right') else values < self.high
+        return keep
+
+    def bounds(self, ordered):
+        """ slice of the sorted array 'ordered' that satisfies the predicate """
+        lo, hi = 0, len(ordered)
+        if self.low is not None:
+            lo = np.searchsorted(ordered, self.low, 'left' if self.inclusive in ('both', 'left') else 'right')
+        if self.high is not None:
+            hi = np.searchsorted(ordered, self.high, 'right' if self.inclusive in ('both', 'right') else 'left')
+        return lo, max(lo, hi)
+
+
+def _predicate(pred):
+    if isinstance(pred, between):
+        return pred
+    if isinstance(pred, tuple):
+        return between(*pred)
+    if isinstance(pred, (list, set, frozenset, np.ndarray, pd.Index)):
+        return list(pred)
+    return [pred]
+
+
+class sortedindex:
+    """ index of a numeric column: the rows sorted by value (NaN last) """
+    def __init__(self, values):
+        self.values = np.asarray(values)
+        self.order = np.argsort(self.values, kind='stable')
+        self.ordered = self.values[self.order]
+
+    def count(self, pred):
+        if isinstance(pred, between):
+            lo, hi = pred.bounds(self.ordered)
+            return hi - lo
+        return sum(self.count(between(v, v)) for v in pred)
+
+    def rows(self, pred):
+        if isinstance(pred, between):
+            lo, hi = pred.bounds(self.ordered)
+            return np.sort(self.order[lo:hi])
+        return np.unique(np.concatenate([self.rows(between(v, v)) for v in pred] or [np.zeros(0, dtype=np.int64)]))
+
+    def mask(self, rows, pred):
+        v = self.values[rows]
+        if isinstance(pred, between):
+            return pred.mask(v)
+        return np.isin(v, pred)
+
+
+class postingindex:
+    """ index of a categorical column: the rows of each value, in order """
+    def __init__(self, values):
+        self.codes, self.categories = pd.factorize(pd.Series(values), use_na_sentinel=True)
+        self.lookup = {c: i for i, c in enumerate(self.categories)}
+        self.order = np.argsort(self.codes, kind='stable')
+        self.bounds = np.searchsorted(self.codes[self.order], np.arange(len(self.categories) + 1))
+
+    def _codes(self, pred):
+        if isinstance(pred, between):
+            return [i for i, c in enumerate(self.categories) if pred.mask(np.array([c]))[0]]
+        return [self.lookup[v] for v in pred if v in self.lookup]
+
+    def count(self, pred):
+        return sum(self.bounds[i + 1] - self.bounds[i] for i in self._codes(pred))
+
+    def rows(self, pred):
+        parts = [self.order[self.bounds[i]:self.bounds[i + 1]] for i in self._codes(pred)]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+    def mask(self, rows, pred):
+        return np.isin(self.codes[rows], self._codes(pred))
+
+
+class table:
+    """ a DataFrame with indexes on some of its columns """
+    def __init__(self, frame, indexes=INDEXES):
+        self.frame = frame
+        self.indexes = {}
+        for col in indexes:
+            if col in frame.columns:
+                self.add_index(col)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def add_index(self, col):
+        values = self.frame[col]
+        if pd.api.types.is_numeric_dtype(values.dtype) and not isinstance(values.dtype, pd.CategoricalDtype):
+            self.indexes[col] = sortedindex(values.to_numpy())
+        else:
+            self.indexes[col] = postingindex(values)
+
+    def _index(self, col):
+        if col not in self.indexes:
+            self.add_index(col)  # built once, at the first query on the column
+        return self.indexes[col]
+
+    def count(self, **predicates):
+        return len(self.select(**predicates))
+
+    def select(self, **predicates):
+        """ returns the sorted positions of the rows that satisfy all the predicates """
+        if not predicates:
+            return np.arange(len(self.frame))
+        preds = {col: _predicate(p) for col, p in predicates.items()}
+        sizes = {col: self._index(col).count(p) for col, p in preds.items()}
+        first = min(sizes, key=sizes.get)
+        rows = self.indexes[first].rows(preds[first])
+        for col in sorted(preds, key=sizes.get):
+            if col != first and len(rows):
+                rows = rows[self.indexes[col].mask(rows, preds[col])]
+        return rows
+
+    def take(self, rows, columns=None):
+        """ the DataFrame of the selected rows (and columns) """
+        frame = self.frame if columns is None else self.frame[list(columns)]
+        return frame.iloc[rows]
+
+    def sample(self, n, by=None, seed=None, replace=False, **predicates):
+        """ draws n rows among the rows that satisfy the predicates; with 'by' (a column
+        or a list of columns), draws n rows in each stratum and returns {stratum: rows}.
+        The draws only depend on 'seed' and on the selected rows. """
+        rng = np.random.default_rng(seed)
+        rows = self.select(**predicates)
+        if by is None:
+            return rng.choice(rows, size=n if replace else min(n, len(rows)), replace=replace)
+        cols = [by] if isinstance(by, str) else list(by)
+        keys = [np.asarray(self.frame[c].to_numpy())[rows] for c in cols]
+        codes, strata = pd.factorize(pd.MultiIndex.from_arrays(keys) if len(cols) > 1 else pd.Series(keys[0]),
+                                     sort=True)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(strata) + 1))
+        res = {}
+        for i, stratum in enumerate(strata):
+            members = rows[order[bounds[i]:bounds[i + 1]]]
+            res[stratum] = rng.choice(members, size=n if replace else min(n, len(members)), replace=replace)
+        return res
@@ -0,0 +1,444 @@
+#! /usr/bin/env python3
+
+""" HTTP service for lookups in the openlexicon tables (asyncio, no dependency)
+
+    python server.py --port 8383 --workers 4
+    curl 'localhost:8383/lookup?words=chat,chien&datasets=Lexique383:cgram,freqfilms2'
+    curl -d '{"where": {"nblettres": {"min": 5, "max": 8}, "cgram": "NOM"}, "columns": ["ortho", "freqfilms2"]}' \\
+         'localhost:8383/select?format=ndjson'
+    curl -d '{"strings": ["bonjour", "blatir"]}' localhost:8383/score
+
+Endpoints (GET with query parameters, or POST with a JSON object):
+  - /lookup: words, datasets ('Lexique383:cgram,freqfilms2 Megalex-visual', or a
+    {dataset: [columns] or null} object), how ('left' or 'inner'): rows of the
+    store (see store.py) for a batch of words
+  - /select: where ({column: value, [values], or {"min", "max", "inclusive"}}),
+    columns, limit, sample and seed: selection in Lexique383 (see query.py)
+  - /score: strings: sublexical statistics of strings (dico.score_batch)
+  - /search: pattern, column ('ortho' or 'phon'), wildcard, columns and limit:
+    rows of Lexique383 whose column matches a pattern (see patterns.py)
+  - /stats: number of requests and state of the cache
+
+Results are JSON ({"rows": [...]}), or NDJSON (one row per line, sent as it is
+produced) with format=ndjson or 'Accept: application/x-ndjson'.
+
+The workers are processes forked after the data are opened memory-mapped (the
+store, the columnar cache of Lexique383 and the dico snapshot) and the pattern
+indexes are built, so that they share the listening socket and the pages of the
+data. Each one keeps its own cache of the encoded results, of bounded size (least
+recently used first out).
+"""
+
+import os
+import os.path as op
+import sys
+import json
+import socket
+import signal
+import asyncio
+import itertools
+import collections
+import multiprocessing
+import urllib.parse
+import numpy as np
+
+sys.path.insert(0, op.join(op.dirname(op.abspath(__file__)), '..', 'sublexical-frequencies-python'))
+
+MAX_BODY = 16 << 20
+STREAM_BATCH = 1000  # rows per write of an NDJSON stream
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+def _is_number(x):
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def _is_numeric(column):
+    return getattr(column.dtype, 'kind', 'O') in 'iuf'  # not categorical
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class lrucache:
+    """ cache of byte strings, holding at most 'maxbytes' bytes: the least recently
+    used entries are evicted first """
+    def __init__(self, maxbytes=64 << 20):
+        self.maxbytes = maxbytes
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if len(value) > self.maxbytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self.entries[key] = value
+        self.size += len(value)
+        while self.size > self.maxbytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.size, 'maxbytes': self.maxbytes,
+                'hits': self.hits, 'misses': self.misses}
+
+
+def _jsonable(v):
+    if isinstance(v, (np.integer,)):
+        return int(v)
+    if isinstance(v, (np.floating, float)):
+        return None if np.isnan(v) else float(v)
+    if isinstance(v, np.bool_):
+        return bool(v)
+    if v is None or isinstance(v, (str, int, bool)):
+        return v
+    if v != v:  # pandas NA
+        return None
+    return str(v)
+
+
+def records(frame):
+    """ the rows of a DataFrame as dicts of JSON values """
+    columns = list(frame.columns)
+    for row in frame.itertuples(index=False, name=None):
+        yield dict(zip(columns, map(_jsonable, row)))
+
+
+class service:
+    """ the data and the handlers of the requests; the data are opened on first use """
+    def __init__(self, storedir=None, freqfile=None, cachebytes=64 << 20):
+        self.storedir = storedir
+        self.freqfile = freqfile
+        self.cache = lrucache(cachebytes)
+        self.requests = 0
+        self._store = self._table = self._dico = None
+        self._patterns = {}
+
+    def store(self):
+        if self._store is None:
+            import store
+            self._store = store.store(self.storedir)
+        return self._store
+
+    def table(self):
+        if self._table is None:
+            import lexique
+            import query
+            self._table = query.table(lexique.load())
+        return self._table
+
+    def dico(self):
+        if self._dico is None:
+            import dico
+            self._dico = dico.load_or_build(self.freqfile or op.join(op.dirname(dico.__file__), 'ortho-freql.txt'))
+        return self._dico
+
+    def patterns(self, column):
+        if column not in self._patterns:
+            import patterns
+            self._patterns[column] = patterns.patternindex(self.table().frame[column], patterns.CLASSES[column])
+        return self._patterns[column]
+
+    def lookup(self, params):
+        import store
+        words = _list(params.get('words'))
+        datasets = params.get('datasets') or {'Lexique383': None}
+        if isinstance(datasets, str):
+            datasets = store.parse_datasets(datasets.split())
+        how = params.get('how', 'left')
+        if how not in ('left', 'inner'):
+            raise HTTPError(400, "how must be 'left' or 'inner'")
+        try:
+            return records(self.store().query(words, datasets, how))
+        except KeyError as e:
+            raise HTTPError(404, str(e.args[0]))
+
+    def select(self, params):
+        import query
+        table = self.table()
+        where = params.get('where') or {}
+        if isinstance(where, str):
+            where = json.loads(where)
+        if not isinstance(where, dict):
+            raise HTTPError(400, "'where' must be an object {column: predicate}")
+        predicates = {}
+        for col, pred in where.items():
+            if col not in table.frame.columns:
+                raise HTTPError(404, f"no column '{col}'")
+            if isinstance(pred, dict):
+                low, high = pred.get('min'), pred.get('max')
+                if _is_numeric(table.frame[col]) and not all(_is_number(b) for b in (low, high) if b is not None):
+                    raise HTTPError(400, f"the bounds of '{col}' must be numbers")
+                pred = query.between(low, high, pred.get('inclusive', 'both'))
+            predicates[col] = pred
+        columns = _list(params.get('columns')) or None
+        if columns and any(c not in table.frame.columns for c in columns):
+            raise HTTPError(404, f"no column among {columns}")
+        if params.get('sample') is not None:
+            seed = params.get('seed')
+            rows = table.sample(int(params['sample']), seed=None if seed is None else int(seed), **predicates)
+        else:
+            rows = table.select(**predicates)
+        if params.get('limit') is not None:
+            rows = rows[:int(params['limit'])]
+        return records(table.take(rows, columns))
+
+    def search(self, params):
+        import re
+        import patterns
+        column = params.get('column', 'ortho')
+        if column not in patterns.CLASSES:
+            raise HTTPError(404, f"no pattern index of column '{column}'")
+        pattern = params.get('pattern') or ''
+        if params.get('wildcard') not in (None, False, '', '0', 'false'):
+            pattern = patterns.wildcard(pattern)
+        columns = _list(params.get('columns')) or None
+        table = self.table()
+        if columns and any(c not in table.frame.columns for c in columns):
+            raise HTTPError(404, f"no column among {columns}")
+        try:
+            rows = self.patterns(column).search(pattern)
+        except re.error as e:
+            raise HTTPError(400, f"bad pattern: {e}")
+        if params.get('limit') is not None:
+            rows = rows[:int(params['limit'])]
+        return records(table.take(rows, columns))
+
+    def score(self, params):
+        strings = [str(s) for s in _list(params.get('strings'))]
+        d = self.dico()
+        for chunk, recs in d.score_batch(strings, chunksize=10000):
+            names = recs.dtype.names
+            for s, rec in zip(chunk, recs.tolist()):
+                yield dict(string=s, **{n: _jsonable(v) for n, v in zip(names, rec)})
+
+    def preload(self):
+        """ opens the data that are there (a missing store or dico is opened on use) """
+        for load in (self.store, self.table, self.dico, lambda: self.patterns('ortho'), lambda: self.patterns('phon')):
+            try:
+                load()
+            except (OSError, ValueError) as e:
+                print(f"server: {e}", file=sys.stderr)
+
+    def stats(self, params):
+        yield {'pid': os.getpid(), 'requests': self.requests, 'cache': self.cache.stats()}
+
+    handlers = {'/lookup': lookup, '/select': select, '/score': score, '/search': search, '/stats': stats}
+
+
+def _list(value):
+    """ a list of strings from a JSON list or a comma-separated string """
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [v for v in value.split(',') if v]
+    return list(value)
+
+
+async def read_request(reader):
+    """ (method, path, query parameters, headers, body), or None at the end of the connection """
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, _ = lines[0].split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, "bad request line")
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            k, v = line.split(':', 1)
+            headers[k.strip().lower()] = v.strip()
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HTTPError(400, "bad Content-Length")
+    if length < 0:
+        raise HTTPError(400, "bad Content-Length")
+    if length > MAX_BODY:
+        raise HTTPError(413, "request too large")
+    body = await reader.readexactly(length) if length else b''
+    url = urllib.parse.urlsplit(target.encode('latin-1').decode('utf-8', 'replace'))
+    params = dict(urllib.parse.parse_qsl(url.query))
+    return method, url.path, params, headers, body
+
+
+def response_head(status, content_type, length=None, keep_alive=True):
+    head = [f'HTTP/1.1 {status} {REASONS.get(status, "")}', f'Content-Type: {content_type}',
+            'Connection: ' + ('keep-alive' if keep_alive else 'close')]
+    head.append(f'Content-Length: {length}' if length is not None else 'Transfer-Encoding: chunked')
+    return ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1')
+
+
+async def send(writer, status, body, content_type='application/json', keep_alive=True):
+    writer.write(response_head(status, content_type, len(body), keep_alive) + body)
+    await writer.drain()
+
+
+async def send_stream(writer, rows, keep_alive=True):
+    """ sends the rows as NDJSON in a chunked response, STREAM_BATCH rows at a time;
+    returns the body, or None if it was too large to be kept in the cache """
+    writer.write(response_head(200, 'application/x-ndjson', None, keep_alive))
+    kept = []
+    size = 0
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(row, ensure_ascii=False))
+        if len(batch) == STREAM_BATCH:
+            size = await _send_chunk(writer, batch, kept, size)
+            batch = []
+    if batch:
+        size = await _send_chunk(writer, batch, kept, size)
+    writer.write(b'0\r\n\r\n')
+    await writer.drain()
+    return None if size > MAX_BODY else b''.join(kept)
+
+
+async def _send_chunk(writer, batch, kept, size):
+    data = ('\n'.join(batch) + '\n').encode('utf-8')
+    writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+    await writer.drain()
+    if size + len(data) <= MAX_BODY:
+        kept.append(data)
+    return size + len(data)
+
+
+async def handle(svc, reader, writer):
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            except asyncio.LimitOverrunError:
+                await send(writer, 400, json.dumps({'error': "request head too large"}).encode(), keep_alive=False)
+                break
+            except HTTPError as e:
+                await send(writer, e.status, json.dumps({'error': str(e)}).encode(), keep_alive=False)
+                break
+            method, path, params, headers, body = request
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            await respond(svc, writer, method, path, params, headers, body, keep_alive)
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def respond(svc, writer, method, path, params, headers, body, keep_alive):
+    svc.requests += 1
+    streaming = False
+    ndjson = params.pop('format', None) == 'ndjson' or 'application/x-ndjson' in headers.get('accept', '')
+    try:
+        if path not in svc.handlers:
+            raise HTTPError(404, f"unknown path {path}")
+        if method == 'POST' and body:
+            try:
+                params.update(json.loads(body))
+            except ValueError:
+                raise HTTPError(400, "the body is not a JSON object")
+        elif method not in ('GET', 'POST'):
+            raise HTTPError(405, f"method {method} not allowed")
+        key = None
+        if path != '/stats':
+            key = (path, ndjson, json.dumps(params, sort_keys=True, ensure_ascii=False))
+            cached = svc.cache.get(key)
+            if cached is not None:
+                await send(writer, 200, cached, 'application/x-ndjson' if ndjson else 'application/json', keep_alive)
+                return
+        rows = iter(svc.handlers[path](svc, params))
+        if ndjson:
+            # the first rows are made before the head is sent, so that most errors
+            # (e.g. in the parameters) still get their status
+            first = list(itertools.islice(rows, STREAM_BATCH))
+            streaming = True
+            body = await send_stream(writer, itertools.chain(first, rows), keep_alive)
+        else:
+            body = json.dumps({'rows': list(rows)}, ensure_ascii=False).encode('utf-8')
+            await send(writer, 200, body, keep_alive=keep_alive)
+        if key is not None and body is not None:
+            svc.cache.put(key, body)
+    except ConnectionError:
+        raise
+    except Exception as e:
+        if streaming:
+            # the 200 head is sent: the stream is left unterminated, so that the
+            # client sees an incomplete response, and the connection is closed
+            print(f"server: {path}: {e!r}", file=sys.stderr)
+            raise ConnectionAbortedError(str(e))
+        if isinstance(e, HTTPError):
+            status = e.status
+        elif isinstance(e, (ValueError, TypeError)):
+            status = 400
+        else:  # e.g. OSError: no store
+            status = 500
+            if not isinstance(e, OSError):
+                print(f"server: {path}: {e!r}", file=sys.stderr)
+        await send(writer, status, json.dumps({'error': str(e)}).encode(), keep_alive=keep_alive)
+
+
+def serve(sock, svc):
+    """ runs a worker of the service 'svc' on the listening socket 'sock' """
+    async def main():
+        server = await asyncio.start_server(lambda r, w: handle(svc, r, w), sock=sock, limit=1 << 16)
+        async with server:
+            await server.serve_forever()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+def run(host='127.0.0.1', port=8383, workers=1, storedir=None, freqfile=None, cachebytes=64 << 20):
+    """ serves with 'workers' processes sharing one socket. The data are opened before
+    the workers are forked, so that they share the same memory maps. """
+    sock = socket.create_server((host, port), backlog=1024)
+    sock.setblocking(False)
+    svc = service(storedir, freqfile, cachebytes)
+    svc.preload()
+    args = (sock, svc)
+    if workers <= 1:
+        serve(*args)
+        return
+    ctx = multiprocessing.get_context('fork')  # the children inherit the socket and the data
+    procs = [ctx.Process(target=serve, args=args, daemon=True) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for p in procs:
+            p.join()
+    except (KeyboardInterrupt, SystemExit):
+        for p in procs:
+            p.terminate()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="HTTP service for lookups in the openlexicon tables")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8383)
+    parser.add_argument('--workers', type=int, default=1, help="number of processes")
+    parser.add_argument('--store', help="directory of the store of store.py (default: lexical-store/ in the data folder)")
+    parser.add_argument('--freqfile', help="frequency file of the dico used by /score (default: ortho-freql.txt)")
+    parser.add_argument('--cache-mb', type=float, default=64, help="size of the cache of results, per worker")
+    args = parser.parse_args()
+    run(args.host, args.port, args.workers, args.store, args.freqfile, int(args.cache_mb * (1 << 20)))
@@ -0,0 +1,298 @@
+#! /usr/bin/env python3
+
+""" word-keyed store of the openlexicon datasets, for cross-database selections
+
+The tables described in datasets-info/_json (those found in the data folder, see
+lexique.data_home; .rds files need the package pyreadr) are read once, and saved
+column by column, their rows sorted by a 64-bit hash of their key. The key of a row is its first column (as the join
+column "Word" of apps/openlexicon), normalized in the same way for every dataset:
+Unicode NFC, case folding and blanks stripped.
+
+    python store.py build                       # or: build --datasets Lexique383 Megalex-visual
+    python store.py query chat chien maison --datasets Lexique383:freqfilms2,nblettres Megalex-visual
+
+A query hashes its words, finds their rows in each dataset by binary search on
+the sorted hashes, and reads only these rows of the requested columns (the files
+are memory-mapped): the rows of several datasets are joined on the words asked
+for, without merging the whole tables.
+
+    import store
+    s = store.store()
+    s.query(['chat', 'chien'], {'Lexique383': ['freqfilms2', 'nblettres'], 'Megalex-visual': None})
+"""
+
+import os
+import os.path as op
+import sys
+import json
+import glob
+import shutil
+import unicodedata
+import numpy as np
+import pandas as pd
+from lexique import data_home, JSON_DIR
+
+STORE_VERSION = 1
+HASH_KEY = '0123456789123456'  # the default key of pandas.util.hash_array, fixed here for stability
+JOIN_COLUMN = 'Word'
+SEPARATORS = {'.tsv': '\t', '.txt': '\t', '.csv': ','}
+
+
+def normalize(word):
+    """ the join key of a word """
+    return unicodedata.normalize('NFC', word).casefold().strip()
+
+
+def normalize_series(words):
+    return words.astype(str).str.normalize('NFC').str.casefold().str.strip()
+
+
+def key_hashes(keys):
+    return pd.util.hash_array(np.asarray(keys, dtype=object), hash_key=HASH_KEY, categorize=False)
+
+
+def tables_of(description, json_name):
+    """ [(dataset name, filenames)] of the tables of a json description, each table with
+    the files that hold it (.tsv, .txt, .csv or .rds, and a .tsv export of an .rds). The
+    dataset is named after the json file, or after the table when there are several. """
+    urls = [u['url'] for u in description.get('urls', [])] + \
+        [description[k] for k in ('url_tsv', 'url_rds') if k in description]
+    tables = {}
+    for u in urls:
+        stem, ext = op.splitext(op.basename(u))
+        if ext in SEPARATORS or ext == '.rds':
+            tables.setdefault(stem, []).append(stem + ext)
+    for stem, files in tables.items():
+        files.sort(key=lambda f: f.endswith('.rds'))  # text files first
+        if stem + '.tsv' not in files:
+            files.append(stem + '.tsv')
+    if len(tables) == 1:
+        return [(json_name, files) for files in tables.values()]
+    return list(tables.items())
+
+
+def read_table(filename):
+    """ DataFrame of a .tsv, .txt, .csv file, or of an .rds file (with the package pyreadr) """
+    ext = op.splitext(filename)[1]
+    if ext == '.rds':
+        import pyreadr  # optional, only for the tables that are only distributed as .rds
+        return pyreadr.read_r(filename)[None]
+    return pd.read_csv(filename, sep=SEPARATORS[ext], keep_default_na=False, na_values=[''],
+                       low_memory=False, encoding_errors='replace')
+
+
+def _save_strings(dirname, name, values):
+    """ a column of strings: utf-8 blob, offsets, and missing values """
+    missing = pd.isna(values)
+    encoded = [b'' if m else str(v).encode('utf-8') for v, m in zip(values, missing)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    np.save(op.join(dirname, f'{name}.text.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    np.save(op.join(dirname, f'{name}.offsets.npy'), offsets)
+    np.save(op.join(dirname, f'{name}.missing.npy'), np.asarray(missing, dtype=bool))
+
+
+def _load_strings(dirname, name, rows):
+    text = np.load(op.join(dirname, f'{name}.text.npy'), mmap_mode='r')
+    offsets = np.load(op.join(dirname, f'{name}.offsets.npy'), mmap_mode='r')
+    missing = np.load(op.join(dirname, f'{name}.missing.npy'), mmap_mode='r')
+    res = np.empty(len(rows), dtype=object)
+    for j, i in enumerate(rows.tolist()):
+        res[j] = None if missing[i] else text[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8')
+    return res
+
+
+def build_dataset(tablefile, dirname, columns=None, descriptions=None):
+    """ saves the table 'tablefile' (its first column and 'columns', default: all) in
+    'dirname'; returns its description for meta.json """
+    a = read_table(tablefile)
+    keycol = a.columns[0]
+    if columns is not None:
+        a = a[[keycol] + [c for c in a.columns[1:] if c in columns]]
+    a = a[a[keycol].notna()]
+    keys = normalize_series(a[keycol]).to_numpy(dtype=object)
+    hashes = key_hashes(keys)
+    order = np.argsort(hashes, kind='stable')
+    tmpdir = f'{dirname}.tmp{os.getpid()}'
+    os.makedirs(tmpdir)
+    np.save(op.join(tmpdir, 'hashes.npy'), hashes[order])
+    _save_strings(tmpdir, 'key', keys[order])
+    cols = []
+    for i, name in enumerate(a.columns):
+        values = a[name].to_numpy()[order]
+        if a[name].dtype.kind in 'biuf':
+            np.save(op.join(tmpdir, f'{i}.npy'), values)
+            kind = 'numeric'
+        else:
+            _save_strings(tmpdir, str(i), values)
+            kind = 'string'
+        cols.append({'name': name, 'kind': kind, 'description': (descriptions or {}).get(name, '')})
+    if op.isdir(dirname):
+        shutil.rmtree(dirname)
+    os.rename(tmpdir, dirname)
+    st = os.stat(tablefile)
+    return {'source': op.abspath(tablefile), 'bytes': st.st_size, 'mtime_ns': st.st_mtime_ns,
+            'nrows': len(a), 'key': keycol, 'columns': cols}
+
+
+def _read_meta(dirname):
+    try:
+        with open(op.join(dirname, 'meta.json')) as f:
+            meta = json.load(f)
+    except OSError:
+        return None
+    if meta['version'] != STORE_VERSION:
+        raise ValueError(f"{dirname}: store version {meta['version']}, expected {STORE_VERSION}")
+    return meta
+
+
+def _write_meta(dirname, meta):
+    tmp = op.join(dirname, f'meta.json.tmp{os.getpid()}')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, op.join(dirname, 'meta.json'))
+
+
+def build(dirname=None, datasets=None, datadir=None, json_dir=JSON_DIR, mandatory_only=False, verbose=False):
+    """ adds to the store in 'dirname' (default: lexical-store/ in the data folder) the
+    tables of 'datasets' (default: all the tables of the json descriptions that are in
+    'datadir'). Tables that did not change since they were stored are not read again.
+    With mandatory_only, only the 'mandatory_columns' of a description are stored. """
+    datadir = datadir or data_home()
+    dirname = dirname or op.join(datadir, 'lexical-store')
+    os.makedirs(dirname, exist_ok=True)
+    meta = _read_meta(dirname) or {'version': STORE_VERSION, 'normalization': 'NFC, casefold, strip',
+                                   'datasets': {}}
+    for jsonfile in sorted(glob.glob(op.join(json_dir, '*.json'))):
+        with open(jsonfile, encoding='utf-8') as f:
+            try:
+                desc = json.load(f)
+            except ValueError:
+                continue
+        for name, files in tables_of(desc, op.splitext(op.basename(jsonfile))[0]):
+            tablefile = next((op.join(datadir, f) for f in files if op.isfile(op.join(datadir, f))), None)
+            if (datasets is not None and name not in datasets) or tablefile is None:
+                continue
+            st = os.stat(tablefile)
+            old = meta['datasets'].get(name)
+            columns = desc.get('mandatory_columns') if mandatory_only else None
+            if old and (old['bytes'], old['mtime_ns'], old.get('mandatory')) == \
+                    (st.st_size, st.st_mtime_ns, columns) and op.isdir(op.join(dirname, name)):
+                continue
+            if verbose:
+                print(f"{name}: {tablefile}", file=sys.stderr)
+            try:
+                meta['datasets'][name] = build_dataset(tablefile, op.join(dirname, name), columns,
+                                                       desc.get('column_names'))
+            except ImportError as e:
+                print(f"{name}: {tablefile} cannot be read ({e})", file=sys.stderr)
+                continue
+            meta['datasets'][name]['mandatory'] = columns
+            _write_meta(dirname, meta)
+    _write_meta(dirname, meta)
+    return dirname
+
+
+class store:
+    """ queries on a store made by build() """
+    def __init__(self, dirname=None):
+        self.dirname = dirname or op.join(data_home(), 'lexical-store')
+        self.meta = _read_meta(self.dirname)
+        if self.meta is None:
+            raise FileNotFoundError(f"no store in {self.dirname} (see store.build)")
+        self.datasets = self.meta['datasets']
+        self._hashes = {}
+
+    def columns(self, dataset):
+        return [c['name'] for c in self.datasets[dataset]['columns'][1:]]
+
+    def hashes(self, dataset):
+        if dataset not in self._hashes:
+            self._hashes[dataset] = np.load(op.join(self.dirname, dataset, 'hashes.npy'), mmap_mode='r')
+        return self._hashes[dataset]
+
+    def rows(self, dataset, keys):
+        """ (query, row) pairs: the rows of 'dataset' whose key is keys[query] """
+        keys = list(keys)
+        h = self.hashes(dataset)
+        q = key_hashes(keys)
+        lo = np.searchsorted(h, q, 'left')
+        hi = np.searchsorted(h, q, 'right')
+        counts = hi - lo
+        query = np.repeat(np.arange(len(keys)), counts)
+        rows = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+        if len(rows):  # discards the collisions of hashes
+            same = _load_strings(op.join(self.dirname, dataset), 'key', rows) == np.array(keys, dtype=object)[query]
+            query, rows = query[same], rows[same]
+        return query, rows
+
+    def column(self, dataset, name, rows):
+        """ the values of column 'name' of 'dataset' at 'rows' """
+        cols = self.datasets[dataset]['columns']
+        i = next((i for i, c in enumerate(cols) if c['name'] == name), None)
+        if i is None:
+            raise KeyError(f"no column '{name}' in {dataset}")
+        dirname = op.join(self.dirname, dataset)
+        if cols[i]['kind'] == 'numeric':
+            return np.load(op.join(dirname, f'{i}.npy'), mmap_mode='r')[rows]
+        return _load_strings(dirname, str(i), rows)
+
+    def query(self, words, datasets, how='left'):
+        """ DataFrame of the 'words' (a list) with the columns of 'datasets': {dataset:
+        columns (None: all)}, or a list of datasets. The words are matched on their
+        normalized keys; with how='left', all the words are kept, with how='inner', only
+        those found in all the datasets. As with merge in R or pandas, a word with
+        several rows in several datasets gets all their combinations. The columns are
+        named 'column' for one dataset, 'dataset.column' for several. """
+        if not isinstance(datasets, dict):
+            datasets = {d: None for d in datasets}
+        for d in datasets:
+            if d not in self.datasets:
+                raise KeyError(f"no dataset '{d}' in the store")
+        words = list(words)
+        keys = [normalize(w) for w in words]
+        res = pd.DataFrame({'_query': np.arange(len(words)), JOIN_COLUMN: words})
+        for d, columns in datasets.items():
+            query, rows = self.rows(d, keys)
+            part = {'_query': query}
+            for c in (self.columns(d) if columns is None else columns):
+                part[c if len(datasets) == 1 else f'{d}.{c}'] = self.column(d, c, rows)
+            res = res.merge(pd.DataFrame(part), on='_query', how=how, sort=False)
+        return res.sort_values('_query', kind='stable').drop(columns='_query').reset_index(drop=True)
+
+
+def parse_datasets(specs):
+    """ ['Lexique383:freqfilms2,nblettres', 'Megalex-visual'] -> {dataset: columns or None} """
+    res = {}
+    for spec in specs:
+        name, _, cols = spec.partition(':')
+        res[name] = cols.split(',') if cols else None
+    return res
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="word-keyed store of the openlexicon datasets")
+    parser.add_argument('--store', help="directory of the store (default: lexical-store/ in the data folder)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('build', help="store the tables (only those that changed)")
+    p.add_argument('--datasets', nargs='+', help="default: all the tables of datasets-info/_json found in --datadir")
+    p.add_argument('--datadir', help="folder of the tables (default: %s)" % data_home())
+    p.add_argument('--mandatory-only', action='store_true', help="only store the mandatory_columns of the json")
+    p = sub.add_parser('list', help="list the datasets and columns of the store")
+    p = sub.add_parser('query', help="print the columns of datasets for words (tab-separated)")
+    p.add_argument('words', nargs='*', help="default: one word per line on stdin")
+    p.add_argument('--datasets', nargs='+', required=True, metavar='DATASET[:COL,COL...]')
+    p.add_argument('--inner', action='store_true', help="only the words found in all the datasets")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build(args.store, args.datasets, args.datadir, mandatory_only=args.mandatory_only, verbose=True)
+    elif args.command == 'list':
+        s = store(args.store)
+        for name, d in s.datasets.items():
+            print(f"{name}\t{d['nrows']}\t{','.join(s.columns(name))}")
+    else:
+        words = args.words or sys.stdin.read().split()
+        res = store(args.store).query(words, parse_datasets(args.datasets), 'inner' if args.inner else 'left')
+        res.to_csv(sys.stdout, sep='\t', index=False)
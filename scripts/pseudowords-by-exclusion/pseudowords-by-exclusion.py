@@ -2,9 +2,13 @@
 
 """ Generate phonetic strings and searches for matches and non matches in [Lexique](www.lexique.org)"""
 
-import pandas as pd
+import sys
+import os.path as op
 
-LEXIQUE = pd.read_csv('/home/cp983411/databases/Lexique382.tsv', sep='\t')
+sys.path.insert(0, op.join(op.dirname(op.abspath(__file__)), '..', 'lexique-python'))
+import lexique
+
+LEXIQUE = lexique.load(['ortho', 'phon'])
 
 voyelles = 'aeiouy2'
 consonants = 'ptkbdgfsSvzZnmlR'
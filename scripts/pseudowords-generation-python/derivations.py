@@ -0,0 +1,464 @@
+#! /usr/bin/env python3
+
+""" pseudowords derived from words by edit operations, in bulk
+
+    python derivations.py --cgram NOM --nblettres 6 6 --legal > pseudos.tsv
+    python derivations.py words.txt --operations transposition mirror --unique > pseudos.tsv
+
+Operations (on the letters of the words; positions from 1):
+  - transposition of two adjacent letters: parler -> palrer
+  - mirror: a letter replaced by its mirror image (b/d, p/q): claque -> clapue
+  - pseudohomophone: another spelling of the pronunciation of the word (phon column
+    of Lexique), built from the spellings of each phoneme in SPELLINGS, with at most
+    'changes' unusual spellings: tasse -> tace; bague -> bag
+  - deletion of a letter: parler -> paler
+  - addition of a letter of ALPHABET: parler -> pariler
+  - substitution of a letter by another one of ALPHABET: parler -> perler
+
+The words are processed by chunks. The candidates of a chunk are built at once as
+arrays of code points (one row per candidate), hashed (see markov.hash_rows) to
+remove the duplicates of each word (or of all the words, with unique=True), and only
+then decoded to strings. Words of the lexicon are dropped (lexset.stringset), and the
+remaining candidates are scored with a dico: 'legal' if all their bigrams occur in it,
+and statistics of their n-gram frequencies (dico.score_batch). Each candidate keeps
+the word it comes from, the operation, its position and the change (e.g. 'q>p').
+"""
+
+import sys
+import os.path as op
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, op.join(op.dirname(op.abspath(__file__)), '..', 'sublexical-frequencies-python'))
+sys.path.insert(0, op.join(op.dirname(op.abspath(__file__)), '..', 'lexique-python'))
+import dico
+import lexset
+from markov import hash_rows
+
+ALPHABET = 'abcdefghijklmnopqrstuvwxyzàâæçèéêëîïôùûüÿœ'
+MIRRORS = {'b': 'd', 'd': 'b', 'p': 'q', 'q': 'p'}
+# a candidate made by several operations of a word is credited to the first one here
+OPERATIONS = ('transposition', 'mirror', 'pseudohomophone', 'deletion', 'addition', 'substitution')
+SCORES = ('bigrams_mean', 'bigrams_min', 'trigrams_mean')
+VOWEL_LETTERS = set('aàâäeéèêëiîïoôöuùûüyÿœæ')
+PLAIN_VOWELS = set('aeiouy')  # two of them in a row are read as one vowel (ai, ou...)
+FRONT_LETTERS = set('eéèêëiîïyÿ')
+
+# spellings of the phonemes of Lexique (and of a few sequences of phonemes), the usual
+# one first, with the context where they are read so: the letter that follows
+# ('front': e, i, y; 'back': another letter or the end; 'vowel'; 'labial': p, b), the
+# letters around ('between' two vowels) or the position ('final')
+SPELLINGS = {
+    'a': [('a', None), ('â', None), ('à', 'final')],
+    'i': [('i', None), ('y', None), ('î', None)],
+    'y': [('u', None), ('û', None)],
+    'u': [('ou', None), ('oû', None)],
+    'e': [('é', None), ('er', 'final'), ('ez', 'final'), ('ée', 'final')],
+    'E': [('è', None), ('ai', None), ('ê', None), ('ei', None), ('et', 'final')],
+    'o': [('o', None), ('au', None), ('eau', None), ('ô', None), ('ot', 'final')],
+    'O': [('o', None), ('au', None)],
+    '2': [('eu', None), ('œu', None)],
+    '9': [('eu', None), ('œu', None)],
+    '°': [('e', None)],
+    '@': [('an', 'notlabial'), ('en', 'notlabial'), ('am', 'labial'), ('em', 'labial'), ('ant', 'final')],
+    '§': [('on', 'notlabial'), ('om', 'labial'), ('ont', 'final')],
+    '5': [('in', 'notlabial'), ('ain', 'notlabial'), ('ein', 'notlabial'), ('im', 'labial')],
+    '1': [('un', 'notlabial'), ('um', 'labial')],
+    'wa': [('oi', None), ('ois', 'final'), ('oit', 'final')],
+    'w5': [('oin', None)],
+    'ks': [('x', None), ('cc', 'front')],
+    'p': [('p', 'noth'), ('pp', 'between')],
+    'b': [('b', None), ('bb', 'between')],
+    't': [('t', 'noth'), ('tt', 'between'), ('th', None)],
+    'd': [('d', None), ('dd', 'between')],
+    'k': [('c', 'back'), ('qu', 'vowel'), ('k', None), ('ck', 'aftervowel')],
+    'g': [('g', 'hard'), ('gu', 'front')],
+    'f': [('f', None), ('ff', 'between'), ('ph', None)],
+    'v': [('v', None)],
+    's': [('s', 'notbetween'), ('ss', 'between'), ('c', 'front'), ('ç', 'back'), ('sc', 'front')],
+    'z': [('z', None), ('s', 'between')],
+    'S': [('ch', None)],
+    'Z': [('j', None), ('g', 'front'), ('ge', 'backvowel')],
+    'm': [('m', 'notnasal'), ('mm', 'between')],
+    'n': [('n', 'notnasal'), ('nn', 'between')],
+    'N': [('gn', None)],
+    'l': [('l', None), ('ll', 'between')],
+    'R': [('r', None), ('rr', 'between')],
+    'G': [('ng', None)],
+    'j': [('i', 'vowel'), ('y', 'between'), ('ill', 'aftervowel'), ('il', 'final')],
+    'w': [('ou', 'vowel')],
+    '8': [('u', 'vowel')],
+    'x': [('j', None), ('kh', None)],
+}
+VOWEL_UNITS = {'a', 'i', 'y', 'u', 'e', 'E', 'o', 'O', '2', '9', '°', '@', '§', '5', '1', 'wa', 'w5'}
+MUTE = 'e'  # optional final letter after a consonant (not a semi-vowel)
+
+
+def _holds(cond, prev, next, last):
+    """ whether a spelling is read as its phoneme between the letters 'prev' and 'next' """
+    if cond is None:
+        return True
+    vnext = next in VOWEL_LETTERS
+    vprev = prev in VOWEL_LETTERS
+    if cond == 'final':
+        return last
+    if cond == 'front':
+        return next in FRONT_LETTERS
+    if cond == 'back':
+        return next not in FRONT_LETTERS and next != 'h'
+    if cond == 'hard':
+        return next not in FRONT_LETTERS and next not in ('h', 'n')
+    if cond == 'backvowel':
+        return vnext and next not in FRONT_LETTERS
+    if cond == 'vowel':
+        return vnext
+    if cond == 'between':
+        return vprev and vnext
+    if cond == 'notbetween':
+        return not (vprev and vnext) and next != 'h'
+    if cond == 'noth':
+        return next != 'h'
+    if cond == 'labial':
+        return next in ('p', 'b')
+    if cond == 'notlabial':
+        return next not in ('p', 'b')
+    if cond == 'notnasal':  # a vowel then m or n, not followed by a vowel, is a nasal vowel
+        return not vprev or vnext
+    if cond == 'aftervowel':
+        return vprev
+    raise ValueError(f"unknown condition {cond}")
+
+
+def _units(phon):
+    """ the phon string cut into the keys of SPELLINGS (longest first), or None """
+    units, i = [], 0
+    while i < len(phon):
+        for n in (2, 1):
+            if phon[i:i + n] in SPELLINGS:
+                units.append(phon[i:i + n])
+                i += n
+                break
+        else:
+            return None
+    return units
+
+
+def respell(phon, changes=2, limit=200):
+    """ spellings of the pronunciation 'phon' (at most 'limit'), with at most 'changes'
+    phonemes spelled otherwise than in the usual way """
+    units = _units(phon) if phon else None
+    if not units:
+        return []
+    alternatives = [SPELLINGS[u] for u in units]
+    mute = [''] if units[-1] in VOWEL_UNITS or units[-1] in ('j', 'w', '8') else ['', MUTE]
+    res = []
+    chosen = []
+
+    def expand(k, budget):
+        if len(res) >= limit:
+            return
+        if k == len(units):
+            prev = chosen[-2][0][-1] if len(chosen) > 1 else None
+            for end in mute:
+                if _holds(chosen[-1][1], prev, end[:1] or None, True):
+                    res.append(''.join(g for g, _ in chosen) + end)
+            return
+        prev = chosen[-1][0][-1] if chosen else None
+        prev2 = chosen[-2][0][-1] if len(chosen) > 1 else None
+        for rank, (g, cond) in enumerate(alternatives[k]):
+            if rank > 0 and budget == 0:
+                break
+            # the spelling before this one is checked now that its next letter is known
+            if chosen and not _holds(chosen[-1][1], prev2, g[0], False):
+                continue
+            if prev in PLAIN_VOWELS and g[0] in PLAIN_VOWELS:
+                continue
+            chosen.append((g, cond))
+            expand(k + 1, budget - (rank > 0))
+            chosen.pop()
+
+    expand(0, changes)
+    return list(dict.fromkeys(res))
+
+
+def encode(words, width=0):
+    """ (codes, lengths): the code points of 'words' as the rows of a matrix (0: padding) """
+    lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    width = max(width, int(lengths.max(initial=0)))
+    codes = np.zeros((len(words), width), dtype=np.uint32)
+    points = np.frombuffer(''.join(words).encode('utf-32-le'), dtype='<u4')
+    rows = np.repeat(np.arange(len(words)), lengths)
+    cols = np.arange(len(points)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    codes[rows, cols] = points
+    return codes, lengths
+
+
+def decode(codes):
+    """ the strings of the rows of 'codes' (see encode) """
+    if codes.shape[1] == 0:
+        return [''] * len(codes)
+    return np.ascontiguousarray(codes, dtype=np.uint32).view(f'U{codes.shape[1]}').ravel().tolist()
+
+
+def _letters(chars):
+    return np.array([ord(c) for c in chars], dtype=np.uint32)
+
+
+class candidates:
+    """ candidates derived from words: codes and lengths, and for each one the word it
+    comes from, the operation, the position and the change (as codes) """
+    def __init__(self, codes, lengths, source, operation, position, change):
+        self.codes = codes
+        self.lengths = lengths
+        self.source = source
+        self.operation = operation
+        self.position = position
+        self.change = change
+
+    def __len__(self):
+        return len(self.lengths)
+
+    @classmethod
+    def concat(cls, parts):
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls(np.zeros((0, 0), dtype=np.uint32), *(np.zeros(0, dtype=np.int64) for _ in range(4)),
+                       np.zeros((0, 0), dtype=np.uint32))
+        width = max(p.codes.shape[1] for p in parts)
+        cwidth = max(p.change.shape[1] for p in parts)
+        pad = lambda a, w: np.pad(a, ((0, 0), (0, w - a.shape[1])))
+        return cls(np.concatenate([pad(p.codes, width) for p in parts]),
+                   *(np.concatenate([getattr(p, f) for p in parts]) for f in ('lengths', 'source', 'operation', 'position')),
+                   np.concatenate([pad(p.change, cwidth) for p in parts]))
+
+    def take(self, keep):
+        return candidates(self.codes[keep], self.lengths[keep], self.source[keep], self.operation[keep],
+                          self.position[keep], self.change[keep])
+
+
+def _positions(lengths, width, offset=0):
+    """ all (row, i) with i + offset < length """
+    rows, pos = np.nonzero(np.arange(width)[None, :] + offset < lengths[:, None])
+    return rows, pos
+
+
+def transpositions(codes, lengths):
+    rows, i = _positions(lengths, codes.shape[1], 1)
+    a, b = codes[rows, i], codes[rows, i + 1]
+    rows, i, a, b = rows[a != b], i[a != b], a[a != b], b[a != b]
+    out = codes[rows]
+    r = np.arange(len(rows))
+    out[r, i], out[r, i + 1] = b, a
+    change = np.column_stack([a, b, np.full(len(a), ord('>'), dtype=np.uint32), b, a])
+    return candidates(out, lengths[rows], rows, np.full(len(rows), OPERATIONS.index('transposition')), i, change)
+
+
+def deletions(codes, lengths):
+    rows, i = _positions(lengths, codes.shape[1])
+    keep = lengths[rows] > 1
+    rows, i = rows[keep], i[keep]
+    width = codes.shape[1]
+    cols = np.arange(max(width - 1, 0))[None, :]
+    out = codes[rows[:, None], cols + (cols >= i[:, None])] if width > 1 else np.zeros((len(rows), 0), dtype=np.uint32)
+    change = np.column_stack([np.full(len(rows), ord('-'), dtype=np.uint32), codes[rows, i]])
+    return candidates(out, lengths[rows] - 1, rows, np.full(len(rows), OPERATIONS.index('deletion')), i, change)
+
+
+def additions(codes, lengths, alphabet=ALPHABET):
+    letters = _letters(alphabet)
+    rows, i = _positions(lengths, codes.shape[1] + 1, -1)
+    rows, i = np.repeat(rows, len(letters)), np.repeat(i, len(letters))
+    added = np.tile(letters, len(rows) // max(len(letters), 1))
+    ext = np.pad(codes, ((0, 0), (0, 1)))
+    cols = np.arange(ext.shape[1])[None, :]
+    out = ext[rows[:, None], cols - (cols > i[:, None])]
+    out[np.arange(len(rows)), i] = added
+    change = np.column_stack([np.full(len(rows), ord('+'), dtype=np.uint32), added])
+    return candidates(out, lengths[rows] + 1, rows, np.full(len(rows), OPERATIONS.index('addition')), i, change)
+
+
+def _substitute(codes, lengths, rows, i, new, operation):
+    out = codes[rows]
+    old = out[np.arange(len(rows)), i]
+    out[np.arange(len(rows)), i] = new
+    change = np.column_stack([old, np.full(len(rows), ord('>'), dtype=np.uint32), new])
+    return candidates(out, lengths[rows], rows, np.full(len(rows), OPERATIONS.index(operation)), i, change)
+
+
+def substitutions(codes, lengths, alphabet=ALPHABET):
+    letters = _letters(alphabet)
+    rows, i = _positions(lengths, codes.shape[1])
+    rows, i = np.repeat(rows, len(letters)), np.repeat(i, len(letters))
+    new = np.tile(letters, len(rows) // max(len(letters), 1))
+    keep = codes[rows, i] != new
+    return _substitute(codes, lengths, rows[keep], i[keep], new[keep], 'substitution')
+
+
+def mirrors(codes, lengths, mirror=MIRRORS):
+    lut = np.zeros(max(map(ord, mirror)) + 1, dtype=np.uint32)
+    for a, b in mirror.items():
+        lut[ord(a)] = ord(b)
+    rows, i = _positions(lengths, codes.shape[1])
+    old = codes[rows, i]
+    new = lut[np.minimum(old, len(lut) - 1)] * (old < len(lut))
+    keep = new > 0
+    return _substitute(codes, lengths, rows[keep], i[keep], new[keep], 'mirror')
+
+
+def pseudohomophones(phons, changes=2, limit=200):
+    """ candidates respelled from the pronunciations 'phons' (see respell) """
+    spellings, rows, change = [], [], []
+    for row, phon in enumerate(phons):
+        for s in respell(phon if isinstance(phon, str) else '', changes, limit):
+            spellings.append(s)
+            rows.append(row)
+            change.append(f'/{phon}/')
+    out, lengths = encode(spellings)
+    rows = np.array(rows, dtype=np.int64)
+    return candidates(out, lengths, rows, np.full(len(rows), OPERATIONS.index('pseudohomophone')),
+                      np.full(len(rows), -1), encode(change)[0])
+
+
+class deriver:
+    """ derivation of pseudowords from words, checked against a lexicon and scored with a dico """
+    def __init__(self, lexicon, dic=None, operations=OPERATIONS, alphabet=ALPHABET, changes=2,
+                 unique=False, legal_only=False, scores=SCORES):
+        self.lexicon = lexicon  # lexset.stringset of the words of the lexicon
+        self.dico = dic
+        self.operations = [op for op in OPERATIONS if op in operations]
+        self.alphabet = alphabet
+        self.changes = changes
+        self.unique = unique
+        self.legal_only = legal_only
+        self.scores = scores
+        self.seen = np.zeros(0, dtype=np.uint64)  # hashes of the candidates already output (unique)
+
+    def candidates(self, words, phons=None):
+        """ all the candidates of 'words', without duplicates, as a candidates object """
+        codes, lengths = encode(words)
+        parts = []
+        for op in self.operations:
+            if op == 'transposition':
+                parts.append(transpositions(codes, lengths))
+            elif op == 'deletion':
+                parts.append(deletions(codes, lengths))
+            elif op == 'addition':
+                parts.append(additions(codes, lengths, self.alphabet))
+            elif op == 'substitution':
+                parts.append(substitutions(codes, lengths, self.alphabet))
+            elif op == 'mirror':
+                parts.append(mirrors(codes, lengths))
+            elif op == 'pseudohomophone' and phons is not None:
+                parts.append(pseudohomophones(phons, self.changes))
+        cands = candidates.concat(parts)
+        h = hash_rows(cands.codes, cands.lengths)
+        keep = h != hash_rows(codes, lengths)[cands.source]  # not the word itself
+        if self.unique:
+            key = h
+        else:
+            with np.errstate(over='ignore'):
+                key = h ^ (cands.source.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+        _, first = np.unique(np.where(keep, key, 0), return_index=True)
+        mask = np.zeros(len(cands), dtype=bool)
+        mask[first] = True
+        keep &= mask
+        if self.unique:
+            keep &= ~np.isin(h, self.seen)
+            self.seen = np.union1d(self.seen, h[keep])
+        return cands.take(keep)
+
+    def derive(self, words, phons=None):
+        """ DataFrame of the pseudowords derived from 'words' (and their pronunciations 'phons'):
+        pseudoword, source, operation, position, change, legal and the scores """
+        words = list(words)
+        cands = self.candidates(words, phons)
+        strings = decode(cands.codes)
+        keep = ~self.lexicon.contains(strings)
+        idx = np.flatnonzero(keep)
+        res = pd.DataFrame({'pseudoword': [strings[i] for i in idx],
+                            'source': [words[s] for s in cands.source[idx]],
+                            'operation': np.array(OPERATIONS, dtype=object)[cands.operation[idx]],
+                            'position': cands.position[idx] + 1,
+                            'change': decode(cands.change[idx])})
+        if self.dico is not None:
+            scored = res['pseudoword'].tolist()
+            if not self.dico.unicode:
+                from unidecode import unidecode
+                scored = [unidecode(s) for s in scored]
+            recs = np.concatenate([r for _, r in self.dico.score_batch(scored, chunksize=max(len(scored), 1))]) \
+                if scored else np.zeros(0, dtype=dico.SCORE_DTYPE)
+            res['legal'] = recs['bigrams_min'] > 0
+            for name in self.scores:
+                res[name] = recs[name]
+            if self.legal_only:
+                res = res[res['legal']]
+        return res.reset_index(drop=True)
+
+    def derive_many(self, words, phons=None, chunksize=1000, processes=1):
+        """ yields the DataFrames of derive() for successive chunks of 'words', computed by
+        'processes' processes (one, with unique=True) """
+        words = list(words)
+        chunks = [(words[i:i + chunksize], None if phons is None else list(phons[i:i + chunksize]))
+                  for i in range(0, len(words), chunksize)]
+        if processes > 1 and not self.unique:
+            global _current
+            _current = self
+            with multiprocessing.get_context('fork').Pool(processes) as pool:
+                yield from pool.imap(_derive_chunk, chunks)
+        else:
+            for w, p in chunks:
+                yield self.derive(w, p)
+
+
+_current = None  # deriver of the worker processes (inherited from the parent)
+
+
+def _derive_chunk(chunk):
+    return _current.derive(*chunk)
+
+
+def load_lexicon(words):
+    """ the set of 'words' (e.g. all the forms of Lexique) """
+    return lexset.stringset.build(w for w in words if isinstance(w, str))
+
+
+if __name__ == '__main__':
+    import argparse
+    import lexique
+    parser = argparse.ArgumentParser(description="pseudowords derived from words of Lexique383 by edit operations")
+    parser.add_argument('words', nargs='?', help="file of words, one per line ('-': stdin; "
+                        "default: the words of Lexique383 selected by --cgram and --nblettres)")
+    parser.add_argument('--operations', nargs='+', default=OPERATIONS, choices=OPERATIONS)
+    parser.add_argument('--cgram', nargs='+', help="grammatical categories of the words")
+    parser.add_argument('--nblettres', type=int, nargs=2, metavar=('MIN', 'MAX'), help="lengths of the words")
+    parser.add_argument('--alphabet', default=ALPHABET, help="letters that are added or substituted")
+    parser.add_argument('--changes', type=int, default=2, help="unusual spellings in a pseudohomophone")
+    parser.add_argument('--legal', action='store_true', help="only the pseudowords whose bigrams all occur in the dico")
+    parser.add_argument('--unique', action='store_true', help="each pseudoword once, from the first word it comes from")
+    parser.add_argument('--freqfile', default=op.join(op.dirname(dico.__file__), 'ortho-freql.txt'),
+                        help="words and frequencies of the dico (default: %(default)s)")
+    parser.add_argument('--chunksize', type=int, default=1000, help="words processed at once")
+    parser.add_argument('--processes', type=int, default=1)
+    args = parser.parse_args()
+
+    lex = lexique.load(['ortho', 'phon', 'cgram', 'nblettres'])
+    if args.words:
+        with (sys.stdin if args.words == '-' else open(args.words, encoding='utf-8')) as f:
+            words = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+        phon = lex.drop_duplicates('ortho').set_index('ortho')['phon']
+        phons = [phon.get(w) for w in words]
+    else:
+        subset = lex
+        if args.cgram:
+            subset = subset[subset.cgram.isin(args.cgram)]
+        if args.nblettres:
+            subset = subset[subset.nblettres.between(*args.nblettres)]
+        subset = subset.dropna(subset=['ortho']).drop_duplicates('ortho')
+        words, phons = subset['ortho'].tolist(), subset['phon'].tolist()
+    d = deriver(load_lexicon(lex['ortho']), dico.load_or_build(args.freqfile), args.operations, args.alphabet,
+                args.changes, args.unique, args.legal)
+    header = True
+    for table in d.derive_many(words, phons, args.chunksize, args.processes):
+        table.to_csv(sys.stdout, sep='\t', index=False, header=header, float_format='%g')
+        header = False
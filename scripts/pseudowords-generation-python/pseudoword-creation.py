@@ -1,17 +1,18 @@
 #! /usr/bin/env python3
 # Time-stamp: <2020-02-07 12:35:39 christophe@pallier.org>
 
-import os
+import sys
 import os.path as op
 import numpy as np
 import pandas as pd
 import random
 
-# location of Lexique383.tsv file:
-LEXIQUE = op.join(os.getenv('HOME'), 'openlexicon_datasets/Lexique383.tsv')
+sys.path.insert(0, op.join(op.dirname(op.abspath(__file__)), '..', 'lexique-python'))
+import lexique as lexique_loader
+import derivations
 
-
-lexique = pd.read_csv(LEXIQUE, sep='\t')
+# Lexique383.tsv is read from $OPENLEXICON_DATASETS (default: ~/openlexicon_datasets)
+lexique = lexique_loader.load(['ortho', 'phon', 'nblettres', 'cgram'])
 
 all_words = set(lexique.ortho)
 
@@ -47,10 +48,15 @@ for w in names6.ortho:
 
 
 # Inversion en miroir :  claque à clapue
-
-
-
 # Pseudohomophones (erreurs de régularisation) : tasse à tase; bague à bage
+# (toutes les opérations, par blocs de mots : voir derivations.py)
+
+deriver = derivations.deriver(derivations.load_lexicon(all_words),
+                              operations=['mirror', 'pseudohomophone'])
+names6 = names6.drop_duplicates('ortho')
+pseudos = deriver.derive(names6.ortho, names6.phon.tolist())
+for w, group in pseudos.groupby('source', sort=False):
+    print(w, ':', dict(zip(group.pseudoword, group.operation)))
 
 
 # 12 de chaque sorte (avec 2x6 longueurs entre 3 et 8)
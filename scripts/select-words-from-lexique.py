@@ -3,15 +3,15 @@
 
 """ Exemple de sélection d'items dans la base Lexique382 """
 
-import os
+import sys
 import os.path as op
-import pandas as pd
 
+sys.path.insert(0, op.join(op.dirname(op.abspath(__file__)), 'lexique-python'))
+import lexique
 
-# location of Lexique383.tsv file (adapt to your case!)
-LEXIQUE = op.join(os.getenv('HOME'), 'openlexicon_datasets/Lexique383.tsv')
-
-lex = pd.read_csv(LEXIQUE, sep='\t')
+# reads Lexique383.tsv from $OPENLEXICON_DATASETS (default: ~/openlexicon_datasets),
+# through a cache of its columns (see lexique-python/lexique.py)
+lex = lexique.load(['ortho', 'nblettres', 'cgram', 'freqlivres'])
 
 lex.head()
 
@@ -34,5 +34,13 @@ N = 20
 noms_hi.sample(N).ortho.to_csv('nomhi.txt', index=False)
 noms_low.sample(N).ortho.to_csv('nomlo.txt', index=False)
 verbs_hi.sample(N).ortho.to_csv('verhi.txt', index=False)
-verbs_hi.sample(N).ortho.to_csv('verlo.txt', index=False)
+verlo = verbs_low.sample(N)
+verlo.ortho.to_csv('verlo.txt', index=False)
+
+# apparie à chaque verbe de basse fréquence un nom de même longueur et de fréquence
+# proche (voir lexique-python/matching.py)
+import matching
+paires = matching.match(verlo, noms, ['freqlivres', 'nblettres'], exact=['nblettres'])
+noms.loc[paires.candidate].ortho.to_csv('nomlo_apparies.txt', index=False)
+print(matching.balance(verlo, noms, paires, ['freqlivres', 'nblettres']))
 
@@ -0,0 +1,49 @@
+#! /usr/bin/env python3
+
+""" compares the 'dict' and 'numpy' backends of dico on the Lexique383 frequency file
+
+Usage: python bench_backends.py [ortho-freql.txt]
+"""
+
+import sys
+import time
+import pandas as pd
+from unidecode import unidecode
+import dico
+
+DISTRIBUTIONS = ['letter', 'bigram', 'openbigram', 'allbigram', 'trigram', 'quadrigram']
+
+
+def timeit(f):
+    t0 = time.perf_counter()
+    res = f()
+    return time.perf_counter() - t0, res
+
+
+def build(backend, words, weights):
+    d = dico.dico(backend)
+    d.add_many(words, weights)
+    d.normalize_weights()
+    return d
+
+
+if __name__ == '__main__':
+    freqfile = sys.argv[1] if len(sys.argv) > 1 else 'ortho-freql.txt'
+
+    a = pd.read_csv(freqfile, sep='\t', header=1).dropna()
+    words = [unidecode(w) for w in a.iloc[:, 0]]
+    weights = a.iloc[:, 1].to_numpy()
+    print(f"{freqfile}: {len(words)} words")
+
+    results = {}
+    for backend in ('dict', 'numpy'):
+        t_count, results[backend] = timeit(lambda: build(backend, words, weights))
+        print(f"{backend:>6}: n-gram counting {t_count:7.3f} s")
+    t_nb, _ = timeit(results['numpy'].neighbourhood)
+    print(f"neighbourhood index {t_nb:7.3f} s")
+
+    for name in DISTRIBUTIONS:
+        ref = getattr(results['dict'], name + '_distribution')()
+        new = getattr(results['numpy'], name + '_distribution')()
+        status = 'identical' if list(ref.items()) == list(new.items()) else 'DIFFERENT'
+        print(f"{name + '_distribution':>24}: {len(ref):6d} items, {status}")
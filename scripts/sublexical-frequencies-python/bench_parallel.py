@@ -0,0 +1,41 @@
+#! /usr/bin/env python3
+
+""" times dico.import_textfile with 1 to N processes, and checks that the parallel
+builds give exactly the same distributions as the serial one
+
+Usage: python bench_parallel.py [textfile] [N]
+"""
+
+import os
+import sys
+import time
+import dico
+
+TEXTFILE = '../../datasets-info/Liste-de-mots-francais-Gutenberg/liste.de.mots.francais.frgut.txt'
+
+
+def build(textfile, processes):
+    d = dico.dico()
+    t0 = time.perf_counter()
+    d.import_textfile(textfile, processes=processes)
+    return time.perf_counter() - t0, d
+
+
+def same(d1, d2):
+    if list(d1.word_distribution().items()) != list(d2.word_distribution().items()):
+        return False
+    return all(list(getattr(d1, name + '_distribution')().items()) == list(getattr(d2, name + '_distribution')().items())
+               for name in dico.DISTRIBUTIONS)
+
+
+if __name__ == '__main__':
+    textfile = sys.argv[1] if len(sys.argv) > 1 else TEXTFILE
+    nmax = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    print(f"{textfile}: {os.path.getsize(textfile) / 1e6:.1f} MB, {os.cpu_count()} cores")
+
+    t_serial, ref = build(textfile, 1)
+    print(f"{1:3d} process   {t_serial:7.3f} s")
+    for processes in range(2, nmax + 1):
+        t, d = build(textfile, processes)
+        status = 'identical' if same(ref, d) else 'DIFFERENT'
+        print(f"{processes:3d} processes {t:7.3f} s   speedup {t_serial / t:5.2f}   {status}")
@@ -0,0 +1,217 @@
+#! /usr/bin/env python3
+
+""" uniqueness points, cohort sizes and cohort entropies, with a prefix trie
+
+The words of a lexicon (orthographic or phonological forms) are stored in a trie
+whose nodes (the prefixes of the words) are numbered level by level, the children
+of a node in the order of their letters. The node of prefix p + c is found by a
+binary search of parent(p) * size + code(c) in one sorted array, so that a whole
+list of strings is walked down the trie at once, one letter at a time. Each node
+stores the number of words that start with its prefix (the cohort) and the sums
+of their frequencies f and f log2(f), which give the entropy of the cohort:
+
+    H = log2(sum f) - sum(f log2 f) / sum f
+
+The uniqueness point of a string is the position of the first letter at which no
+other word of the lexicon starts like it (the number of letters + 1 if there is
+none, as the puorth/puphon columns of Lexique): for a word, the letter where it
+becomes the only member of its cohort; for a pseudoword, the letter where it
+leaves the lexicon.
+
+    python cohorts.py Lexique383.tsv --column phon > puphon.tsv
+    python cohorts.py words.txt pseudos.txt
+"""
+
+import os
+import os.path as op
+import json
+import shutil
+import numpy as np
+import pandas as pd
+import ngrams
+import tables
+from dico import md5sum, data_home
+
+SNAPSHOT_VERSION = 1
+
+
+def _wlogw(w):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(w > 0, w * np.log2(w), 0.0)
+
+
+class trie:
+    """ prefix trie of a list of (weighted) strings, stored in arrays """
+    fields = ('keys', 'counts', 'weights', 'wlogw', 'terminal')
+
+    def __init__(self, alphabet, keys, counts, weights, wlogw, terminal):
+        self.alphabet = alphabet
+        self.size = len(alphabet)
+        self.keys = keys  # int64: node v > 0 has parent p and letter c where keys[v - 1] == p * size + c
+        self.counts = counts  # int64: number of words that start with the prefix of each node
+        self.weights = weights  # float64: sum of their frequencies
+        self.wlogw = wlogw  # float64: sum of f log2(f)
+        self.terminal = terminal  # bool: the prefix is a word
+
+    @classmethod
+    def build(cls, words, weights=None):
+        """ the trie of 'words' (empty strings are ignored); the weights of repeated words are added """
+        words = pd.Series(list(words), dtype=object)
+        w = np.ones(len(words)) if weights is None else np.nan_to_num(np.asarray(weights, dtype=np.float64))
+        keep = (words.str.len() > 0).to_numpy()
+        codes_, uniq = pd.factorize(words[keep])
+        w = np.bincount(codes_, weights=w[keep], minlength=len(uniq))
+        words = list(uniq)
+        alpha = ngrams.alphabet()
+        codes, offsets = alpha.encode(words)
+        size = len(alpha)
+        lengths = np.diff(offsets)
+        wl = _wlogw(w)
+
+        keys = [np.zeros(0, dtype=np.int64)]
+        counts = [np.array([len(words)])]
+        sums = [np.array([w.sum()])]
+        sumslog = [np.array([wl.sum()])]
+        terminal = [np.zeros(1, dtype=bool)]
+        node = np.zeros(len(words), dtype=np.int64)
+        nnodes = 1
+        for d in range(int(lengths.max(initial=0))):
+            idx = np.nonzero(lengths > d)[0]
+            k = node[idx] * size + codes[offsets[idx] + d]
+            level, inverse = np.unique(k, return_inverse=True)
+            node[idx] = nnodes + inverse
+            nnodes += len(level)
+            keys.append(level)
+            counts.append(np.bincount(inverse, minlength=len(level)))
+            sums.append(np.bincount(inverse, weights=w[idx], minlength=len(level)))
+            sumslog.append(np.bincount(inverse, weights=wl[idx], minlength=len(level)))
+            terminal.append(np.bincount(inverse[lengths[idx] == d + 1], minlength=len(level)) > 0)
+        return cls(alpha, np.concatenate(keys), np.concatenate(counts), np.concatenate(sums),
+                   np.concatenate(sumslog), np.concatenate(terminal))
+
+    def __len__(self):
+        return int(self.counts[0])
+
+    def save(self, dirname, md5=None):
+        """ saves the trie in directory 'dirname' as .npy arrays, which load() memory-maps """
+        tmpdir = f'{dirname}.tmp{os.getpid()}'
+        os.makedirs(tmpdir)
+        tables.save_arrays(tmpdir, 'trie', {f: getattr(self, f) for f in self.fields})
+        with open(op.join(tmpdir, 'meta.json'), 'w') as f:
+            json.dump({'version': SNAPSHOT_VERSION, 'md5': md5, 'alphabet': ''.join(self.alphabet.chars)}, f)
+        if op.isdir(dirname):
+            shutil.rmtree(dirname)
+        os.rename(tmpdir, dirname)
+
+    @classmethod
+    def load(cls, dirname, mmap=True):
+        with open(op.join(dirname, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != SNAPSHOT_VERSION:
+            raise ValueError(f"{dirname}: snapshot version {meta['version']}, expected {SNAPSHOT_VERSION}")
+        return cls(ngrams.alphabet(meta['alphabet']), **tables.load_arrays(dirname, 'trie', cls.fields, mmap))
+
+    def walk(self, strings):
+        """ returns (nodes, lengths): nodes[i, d] is the node of the first d + 1 letters
+        of strings[i], -1 when no word starts with them or past the end of the string """
+        strings = list(strings)
+        codes, offsets = self.alphabet.encode(strings, grow=False)
+        lengths = np.diff(offsets)
+        nodes = np.full((len(strings), max(int(lengths.max(initial=0)), 1)), -1, dtype=np.int64)
+        node = np.zeros(len(strings), dtype=np.int64)
+        idx = np.arange(len(strings))
+        for d in range(nodes.shape[1]):
+            idx = idx[lengths[idx] > d]
+            c = codes[offsets[idx] + d]
+            idx, c = idx[c < self.size], c[c < self.size]  # unknown letters end the walk
+            k = node[idx] * self.size + c
+            pos = np.minimum(np.searchsorted(self.keys, k), max(len(self.keys) - 1, 0))
+            found = self.keys[pos] == k if len(self.keys) else np.zeros(len(idx), dtype=bool)
+            idx = idx[found]
+            node[idx] = pos[found] + 1
+            nodes[idx, d] = node[idx]
+        return nodes, lengths
+
+    def analyse(self, strings):
+        """ for each string: 'isword', 'pu' (uniqueness point), 'sizes' (sizes[i, d]: number
+        of words that start with its first d + 1 letters) and 'entropy' (entropy of the
+        frequencies of these words, in bits; NaN past the end of the string) """
+        nodes, lengths = self.walk(strings)
+        inside = np.arange(nodes.shape[1]) < lengths[:, None]
+        found = nodes >= 0
+        sizes = np.where(found, self.counts[np.maximum(nodes, 0)], 0)
+        w = np.where(found, self.weights[np.maximum(nodes, 0)], 0.0)
+        wl = np.where(found, self.wlogw[np.maximum(nodes, 0)], 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            entropy = np.where(w > 0, np.maximum(np.log2(w) - wl / w, 0.0), 0.0)
+        entropy[~inside] = np.nan
+        last = nodes[np.arange(len(lengths)), np.maximum(lengths - 1, 0)]
+        isword = (lengths > 0) & (last >= 0) & self.terminal[np.maximum(last, 0)]
+        unique = inside & (sizes - isword[:, None] <= 0)
+        pu = np.where(unique.any(axis=1), np.argmax(unique, axis=1) + 1, lengths + 1)
+        return {'isword': isword, 'pu': pu, 'sizes': sizes, 'entropy': entropy, 'lengths': lengths}
+
+    def uniqueness_points(self, strings):
+        return self.analyse(strings)['pu']
+
+
+def read_lexicon(filename, column='ortho', freq=None):
+    """ (words, weights) of a Lexique-like .tsv file, or of a list of words (one per line) """
+    if filename.endswith('.tsv'):
+        a = pd.read_csv(filename, sep='\t', usecols=[column] + ([freq] if freq else []),
+                        keep_default_na=False, na_values=[''])
+        a = a[a[column].notna()]
+        return a[column].tolist(), (a[freq].to_numpy() if freq else None)
+    with open(filename, encoding='utf-8') as f:
+        return f.read().split(), None
+
+
+def load_or_build(filename, column='ortho', freq=None, cachedir=None):
+    """ returns the trie of a lexicon, saved in a snapshot named after the md5 of the
+    file (see lexset.load_or_build) """
+    if cachedir is None:
+        cachedir = op.join(data_home(), 'cohort-snapshots')
+    md5 = md5sum(filename)
+    prefix = f'{op.basename(filename)}-{column}-{freq}-'
+    snapdir = op.join(cachedir, prefix + md5)
+    try:
+        return trie.load(snapdir)
+    except (OSError, ValueError):
+        pass
+
+    t = trie.build(*read_lexicon(filename, column, freq))
+    os.makedirs(cachedir, exist_ok=True)
+    for old in os.listdir(cachedir):
+        if old.startswith(prefix) and old != prefix + md5 and len(old) == len(prefix) + 32:
+            shutil.rmtree(op.join(cachedir, old), ignore_errors=True)
+    t.save(snapdir, md5)
+    return t
+
+
+if __name__ == '__main__':
+    import sys
+    import argparse
+    parser = argparse.ArgumentParser(description="uniqueness points and cohorts of words or pseudowords")
+    parser.add_argument('lexicon', help="Lexique-like .tsv file, or list of words (one per line)")
+    parser.add_argument('strings', nargs='?', help="strings to analyse, one per line ('-': stdin; "
+                        "default: the distinct forms of the lexicon)")
+    parser.add_argument('--column', default='ortho', help="column of the .tsv file (default: %(default)s)")
+    parser.add_argument('--freq', help="column of frequencies of the .tsv file, for the entropies")
+    parser.add_argument('--cohorts', action='store_true', help="print the sizes and entropies of the cohorts "
+                        "after each letter (comma-separated)")
+    args = parser.parse_args()
+
+    t = load_or_build(args.lexicon, args.column, args.freq)
+    if args.strings is None:
+        strings = list(dict.fromkeys(read_lexicon(args.lexicon, args.column)[0]))
+    else:
+        with (sys.stdin if args.strings == '-' else open(args.strings, encoding='utf-8')) as f:
+            strings = f.read().split()
+    res = t.analyse(strings)
+    for i, s in enumerate(strings):
+        fields = [s, str(res['pu'][i])]
+        if args.cohorts:
+            n = res['lengths'][i]
+            fields.append(','.join(map(str, res['sizes'][i, :n])))
+            fields.append(','.join(f'{h:.3f}' for h in res['entropy'][i, :n]))
+        print('\t'.join(fields))
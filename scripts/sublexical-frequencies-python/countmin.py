@@ -0,0 +1,66 @@
+#! /usr/bin/env python3
+
+""" count-min sketch (Cormode & Muthukrishnan, 2005) of word counts, in bounded memory
+
+The sketch is a depth x width array of counters; a word is counted in one counter
+of each row, chosen by a hash of the word, and its count is estimated by the
+minimum of these counters. The estimates never underestimate, and with a total
+count N:
+
+    true count <= estimate <= true count + e * N / width
+
+for each word with probability at least 1 - exp(-depth). With the defaults
+(width 2**20, depth 5: 40 MB), the error is at most 2.6e-6 * N, i.e. 2.6
+occurrences per million tokens, for 99.3% of the words.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class countmin:
+    def __init__(self, width=1 << 20, depth=5, seed=0):
+        if width < 2 or width & (width - 1):
+            raise ValueError("the width of the sketch must be a power of 2 (>= 2)")
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        # multiply-shift hashing, one odd multiplier per row
+        self.multipliers = rng.integers(0, 1 << 63, size=depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.counts = np.zeros((depth, width), dtype=np.float64)
+        self.total = 0.0
+
+    def epsilon(self):
+        """ bound of the overestimation of the counts, relative to the total count """
+        return np.e / self.width
+
+    def delta(self):
+        """ probability that the error on the count of a word exceeds the bound """
+        return np.exp(-self.depth)
+
+    def _columns(self, words):
+        h = pd.util.hash_array(np.asarray(words, dtype=object))
+        shift = np.uint64(64 - self.width.bit_length() + 1)
+        return [((h * m) >> shift).astype(np.int64) for m in self.multipliers]
+
+    def add(self, words, weights=None):
+        weights = np.ones(len(words)) if weights is None else np.asarray(weights, dtype=np.float64)
+        if len(words) == 0:
+            return
+        for row, cols in zip(self.counts, self._columns(words)):
+            row += np.bincount(cols, weights=weights, minlength=self.width)
+        self.total += float(weights.sum())
+
+    def query(self, words):
+        """ returns the estimated counts of 'words' """
+        if len(words) == 0:
+            return np.zeros(0)
+        return np.min([row[cols] for row, cols in zip(self.counts, self._columns(words))], axis=0)
+
+    def merge(self, other):
+        """ adds the counts of a sketch with the same shape and seed """
+        if (self.width, self.depth, self.seed) != (other.width, other.depth, other.seed):
+            raise ValueError("sketches of different shapes or seeds cannot be merged")
+        self.counts += other.counts
+        self.total += other.total
@@ -1,9 +1,22 @@
 #! /usr/bin/env python3
 # Time-stamp: <2007-05-09 08:22:32 pallier>
 
+import os
+import os.path as op
+import json
+import gzip
+import hashlib
+import itertools
+import shutil
+import multiprocessing
 import numpy as np
 import pandas as pd
 from unidecode import unidecode
+import ngrams
+import tables
+import neighbours
+import countmin
+import phonotactics
 
 """ provides 'dico' objects track the frequency of letters, bigrams, trigrams and words from list of words """
 
@@ -78,9 +91,39 @@ def normalize_dictio(dictio):
         dictio[i] = w / s
 
 
+def md5sum(filename):
+    hash_md5 = hashlib.md5()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+
+def data_home():
+    """ local folder for openlexicon datasets (same rules as get_data.home() in fetch_datasets.R) """
+    home = os.getenv('OPENLEXICON_DATASETS')
+    if not home:
+        home = op.join(os.getenv('XDG_DATA_HOME') or op.expanduser('~'), 'openlexicon_datasets')
+    return home
+
+
+SNAPSHOT_VERSION = 2
+DISTRIBUTIONS = ['letter', 'bigram', 'openbigram', 'allbigram', 'trigram', 'quadrigram']
+
+# fields of the records returned by dico.score_batch(): for each kind of n-gram (named
+# as in compute_stats), the sum, mean and minimum of the frequencies of the n-grams of
+# a string, and the mean of their log10(1 + freq) as in meanlogs()
+SCORES = ['letters', 'bigrams', 'openbigrams', 'allbigrams', 'trigrams', 'quadrigrams']
+SCORE_DTYPE = np.dtype([('length', np.int32)] +
+                       [(f'{kind}_{stat}', np.float64) for kind in SCORES
+                        for stat in ('sum', 'mean', 'min', 'meanlog')])
+NGRAMS = {'letters': letters, 'bigrams': bigrams, 'openbigrams': openbigrams,
+          'allbigrams': allbigrams, 'trigrams': trigrams, 'quadrigrams': quadrigrams}
+
+
 def meanlogs(liste, offset=1):
     if np.sum(np.array(liste)) == 0.0:
-        return np.NaN
+        return np.nan
 
     sum = 0
     for i in liste:
@@ -89,40 +132,83 @@ def meanlogs(liste, offset=1):
 
 
 class dico:
-    def __init__(self):
+    """ backend='numpy' counts the n-grams of batches of words in arrays (see ngrams.py),
+    backend='dict' updates plain dicts word by word; both yield the same distributions.
+
+    words='exact' keeps the count of every distinct word in hashd; on large corpora,
+    words='sketch' counts them in a count-min sketch of bounded size (see countmin.py,
+    and word_frequencies()), and words='none' only counts the n-grams.
+
+    The words read by import_csv() and import_textfile() are transliterated to ASCII
+    (unidecode), unless unicode=True: the words are then kept as they are, with their
+    accents, or in the phonetic alphabet of Lexique (import_csv(columns=('phon', ...))).
+    See positional() for position-specific counts. """
+    def __init__(self, backend='numpy', words='exact', sketch_width=1 << 20, sketch_depth=5, unicode=False):
+        if words not in ('exact', 'sketch', 'none'):
+            raise ValueError(f"unknown mode of word counting: {words}")
+        if words != 'exact' and backend != 'numpy':
+            raise ValueError(f"words='{words}' needs the numpy backend")
+        self.backend = backend
+        self.words = words
+        self.unicode = unicode
         self.hashd = {}  # transformation of the original list into a dictionary for faster access
-        self.dico_sub = {}  # dictionnary of substitutions
-        self.dico_del = {}  # dictionnary of deletions
-        self.letter_distrib = {}
-        self.bigram_distrib = {}
-        self.openbigram_distrib = {}
-        self.allbigram_distrib = {}
-        self.trigram_distrib = {}
-        self.quadrigram_distrib = {}
+        self.sketch = countmin.countmin(sketch_width, sketch_depth) if words == 'sketch' else None
+        self.nb = None  # neighbourhood index of the words, built on demand
+        self.positionals = {}  # positional n-gram counts, built on demand (see positional())
+        if backend == 'numpy':
+            self.alphabet = ngrams.alphabet()
+            self.letter_distrib = ngrams.ngramtable(1, self.alphabet)
+            self.bigram_distrib = ngrams.ngramtable(2, self.alphabet)
+            self.openbigram_distrib = ngrams.ngramtable(2, self.alphabet)
+            self.allbigram_distrib = ngrams.ngramtable(2, self.alphabet)
+            self.trigram_distrib = ngrams.ngramtable(3, self.alphabet)
+            self.quadrigram_distrib = ngrams.ngramtable(4, self.alphabet)
+        elif backend == 'dict':
+            self.letter_distrib = {}
+            self.bigram_distrib = {}
+            self.openbigram_distrib = {}
+            self.allbigram_distrib = {}
+            self.trigram_distrib = {}
+            self.quadrigram_distrib = {}
+        else:
+            raise ValueError(f"unknown backend: {backend}")
+        self.pending = []  # (word, weight) added one by one, not yet counted by the numpy backend
+        self.md5 = None  # md5 of the source file, for dicos loaded from a snapshot
 
     def letter_distribution(self):
+        self.flush()
         return self.letter_distrib
 
     def bigram_distribution(self):
+        self.flush()
         return self.bigram_distrib
 
     def openbigram_distribution(self):
+        self.flush()
         return self.openbigram_distrib
 
     def allbigram_distribution(self):
+        self.flush()
         return self.allbigram_distrib
 
     def trigram_distribution(self):
+        self.flush()
         return self.trigram_distrib
 
     def quadrigram_distribution(self):
+        self.flush()
         return self.quadrigram_distrib
 
     def word_distribution(self):
+        self.flush()
         return self.hashd
 
     def add(self, word, weight=1):
         # if (DEBUG): print(f"adding {word} {weight}")
+        if self.backend == 'numpy':
+            self.pending.append((word, weight))
+            return
+
         addtodict(self.hashd, [word], weight)
 
         # add to letter, bigram and trigram counts
@@ -132,165 +218,409 @@ class dico:
         addtodict(self.allbigram_distrib, allbigrams(word), weight)
         addtodict(self.trigram_distrib, trigrams(word), weight)
         addtodict(self.quadrigram_distrib, quadrigrams(word), weight)
-
-        # create substitution patterns (bonjour -> .onjour, b.njour, bo.jour, ...)
-        for i in range(len(word)):
-            k = list(word)  # get the list of letters
-            k[i:i+1] = '.'  # insert a '.' at position 'i'
-            kk = "".join(k)
-            if kk in self.dico_sub:
-                if not word in self.dico_sub[kk]:
-                    self.dico_sub[kk].append(word)
-            else:
-                self.dico_sub[kk] = [word]
-
-        # create deletion dictionary (bonjour -> bnjour, ...)
-        for i in range(len(word)):
-            k = list(word)
-            del k[i]
-            kk = "".join(k)
-            if kk in self.dico_del:
-                self.dico_del[kk].append(word)
+        self.nb = None
+        self.positionals = {}
+
+    def add_many(self, words, weights=None):
+        """ adds a batch of words (weights default to 1); with the numpy backend,
+        all the n-grams of the batch are counted in one pass """
+        words = list(words)
+        if weights is None:
+            weights = [1] * len(words)
+        if self.backend == 'dict':
+            for wd, we in zip(words, weights):
+                self.add(wd, we)
+            return
+
+        self.flush()
+        if not isinstance(self.hashd, dict):
+            raise RuntimeError("this dico was loaded from a snapshot and is read-only")
+        weights = np.asarray(weights, dtype=np.float64)
+        if self.words == 'exact':
+            codes, uniques = pd.factorize(pd.Series(words, dtype=object))
+            for wd, we in zip(uniques, np.bincount(codes, weights=weights, minlength=len(uniques)).tolist()):
+                self.hashd[wd] = self.hashd.get(wd, 0) + we
+        elif self.words == 'sketch':
+            self.sketch.add(words, weights)
+
+        codes, offsets = self.alphabet.encode(words)
+        bigr = ngrams.ngram_keys(codes, offsets, 2)
+        openbigr = ngrams.ngram_keys(codes, offsets, 2, gap=1)
+        for table, (keys, wordidx) in ((self.letter_distrib, ngrams.ngram_keys(codes, offsets, 1)),
+                                       (self.bigram_distrib, bigr),
+                                       (self.openbigram_distrib, openbigr),
+                                       (self.allbigram_distrib, ngrams.interleave(bigr, openbigr)),
+                                       (self.trigram_distrib, ngrams.ngram_keys(codes, offsets, 3)),
+                                       (self.quadrigram_distrib, ngrams.ngram_keys(codes, offsets, 4))):
+            table.add(keys, weights[wordidx])
+        self.nb = None
+        self.positionals = {}
+
+    def flush(self):
+        """ counts the words added one by one with add() (numpy backend) """
+        if self.pending:
+            words, weights = zip(*self.pending)
+            self.pending = []
+            self.add_many(words, weights)
+
+    def neighbourhood(self):
+        """ returns the neighbourhood index of the words (see neighbours.py) """
+        self.flush()
+        if self.nb is None:
+            items = list(self.hashd.items())
+            self.nb = neighbours.neighbourhood([w for w, _ in items], [f for _, f in items])
+        return self.nb
+
+    def positional(self, n=1, by_length=False):
+        """ returns the type and token counts of the n-grams of the words at each position
+        (and for each length of word if by_length), see phonotactics.py """
+        if self.words != 'exact':
+            raise ValueError("positional counts need a dico with exact word counts")
+        self.flush()
+        if (n, by_length) not in self.positionals:
+            words = self.hashd
+            if isinstance(words, dict):
+                words, weights = list(words.keys()), list(words.values())
             else:
-                self.dico_del[kk] = [word]
-
-    def import_csv(self, filename, sep='\t', header=1):
-        a = pd.read_csv(filename, sep=sep, header=header).dropna()
-        words = a.iloc[:, 0]
-        weights = a.iloc[:, 1]
-        for wd, we in zip(words, weights):
-            self.add(unidecode(wd), we)
+                words, weights = words.strings.tolist(), words.weights
+            self.positionals[n, by_length] = phonotactics.positional.build(words, weights, n, by_length)
+        return self.positionals[n, by_length]
+
+    def phonotactic_probability(self, strings, n=1, kind='token', by_length=False):
+        """ sums and means of the positional probabilities of the n-grams of 'strings'
+        (type: proportion of the words, token: of their frequencies) """
+        return self.positional(n, by_length).score(strings, kind)
+
+    def save(self, dirname, md5=None):
+        """ saves the dico in directory 'dirname' as .npy arrays, which load() memory-maps.
+        'md5' is the checksum of the file the dico was built from (see load_or_build) """
+        if self.backend != 'numpy' or self.words != 'exact':
+            raise ValueError("only dicos with the numpy backend and exact word counts can be saved")
+        self.flush()
+        tmpdir = f'{dirname}.tmp{os.getpid()}'
+        os.makedirs(tmpdir)
+        words = self.hashd
+        if isinstance(words, dict):
+            words = tables.wordtable.build(words)
+        words.save(tmpdir, 'words')
+        tables.save_arrays(tmpdir, 'nb', self.neighbourhood().arrays())
+        for name in DISTRIBUTIONS:
+            distrib = getattr(self, name + '_distrib')
+            tables.save_arrays(tmpdir, name, {'grams': distrib.grams, 'weights': distrib.weights})
+        with open(op.join(tmpdir, 'meta.json'), 'w') as f:
+            json.dump({'version': SNAPSHOT_VERSION, 'md5': md5, 'unicode': self.unicode,
+                       'alphabet': ''.join(self.alphabet.chars)}, f)
+        if op.isdir(dirname):
+            shutil.rmtree(dirname)
+        os.rename(tmpdir, dirname)
+
+    @classmethod
+    def load(cls, dirname, mmap=True):
+        """ opens a dico saved with save(); the arrays are memory-mapped (read-only) unless mmap=False """
+        with open(op.join(dirname, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != SNAPSHOT_VERSION:
+            raise ValueError(f"{dirname}: snapshot version {meta['version']}, expected {SNAPSHOT_VERSION}")
+        d = cls('numpy', unicode=meta.get('unicode', False))
+        d.md5 = meta['md5']
+        d.alphabet = ngrams.alphabet(meta['alphabet'])
+        for name, n in zip(DISTRIBUTIONS, [1, 2, 2, 2, 3, 4]):
+            arrays = tables.load_arrays(dirname, name, ['grams', 'weights'], mmap)
+            setattr(d, name + '_distrib', ngrams.ngramtable(n, d.alphabet, arrays['grams'], arrays['weights']))
+        d.hashd = tables.wordtable.load(dirname, 'words', mmap)
+        d.nb = neighbours.neighbourhood.from_arrays(
+            d.hashd.strings, tables.load_arrays(dirname, 'nb', neighbours.neighbourhood.fields, mmap))
+        return d
+
+    def import_csv(self, filename, sep='\t', header=None, columns=None):
+        """ adds the words of a table, weighted by their frequencies: the first two
+        columns, or columns=(words, frequencies), e.g. ('phon', 'freqfilms2') with
+        unicode=True for the phonological forms of Lexique383.tsv. 'header' is the
+        line of the column names (default: 0 with 'columns', else 1) """
+        if header is None:
+            header = 1 if columns is None else 0
+        if columns is None:
+            a = pd.read_csv(filename, sep=sep, header=header).dropna()
+        else:
+            a = pd.read_csv(filename, sep=sep, header=header, usecols=columns,
+                            keep_default_na=False, na_values=[''])[list(columns)].dropna()
+        words = a.iloc[:, 0].astype(str)
+        if not self.unicode:
+            words = [unidecode(wd) for wd in words]
+        self.add_many(words, a.iloc[:, 1].to_numpy())
         self.normalize_weights()
 
-    def import_textfile(self, filename):
-        with open(filename, 'r') as f:
-            for line in f:
-                for word in line.split():
-                    self.add(unidecode(word))
+    def import_textfile(self, filename, chunksize=100000, processes=1, encoding='utf-8'):
+        """ counts the words of a text file (gzip-compressed if its name ends with .gz),
+        reading 'chunksize' words at a time.
+
+        With processes > 1, the chunks are counted by a pool of processes (for an
+        uncompressed file, each process reads its own byte range of the file), and
+        the partial counts are merged in the order of the file (see merge()): as
+        words are counted with integer weights, the result is the same, bit for bit,
+        as with one process. """
+        if processes > 1:
+            if self.backend != 'numpy':
+                raise ValueError("the parallel build needs the numpy backend")
+            params = {'words': self.words, 'unicode': self.unicode}  # to build the partial dicos like self
+            if self.sketch is not None:
+                params.update(sketch_width=self.sketch.width, sketch_depth=self.sketch.depth)
+            if filename.endswith('.gz'):
+                with open_text(filename, encoding) as f:
+                    jobs = (('words', chunk, params) for chunk in read_chunks(f, chunksize, self.unicode))
+                    with multiprocessing.Pool(processes) as pool:
+                        # a few chunks at a time, so that the reading does not outpace the counting
+                        while True:
+                            batch = list(itertools.islice(jobs, 2 * processes))
+                            if not batch:
+                                break
+                            for part in pool.imap(_count_shard, batch):
+                                self.merge(part)
+            else:
+                jobs = [('range', (filename, start, end, chunksize, encoding), params)
+                        for start, end in textfile_shards(filename, 4 * processes)]
+                with multiprocessing.Pool(processes) as pool:
+                    for part in pool.imap(_count_shard, jobs):
+                        self.merge(part)
+        else:
+            with open_text(filename, encoding) as f:
+                for chunk in read_chunks(f, chunksize, self.unicode):
+                    self.add_many(chunk)
         self.normalize_weights()
 
+    def merge(self, other):
+        """ adds the (unnormalized) counts of another dico, e.g. built on another part
+        of a corpus. Words and n-grams new to self are appended in the order of other. """
+        self.flush()
+        other.flush()
+        if self.backend != 'numpy' or other.backend != 'numpy':
+            raise ValueError("only dicos with the numpy backend can be merged")
+        if not isinstance(self.hashd, dict):
+            raise RuntimeError("this dico was loaded from a snapshot and is read-only")
+        if self.words != other.words:
+            raise ValueError("dicos counting words in different modes cannot be merged")
+        for wd, we in other.hashd.items():
+            self.hashd[wd] = self.hashd.get(wd, 0) + we
+        if self.sketch is not None:
+            self.sketch.merge(other.sketch)
+        for name in DISTRIBUTIONS:
+            getattr(self, name + '_distrib').merge(getattr(other, name + '_distrib'))
+        self.nb = None
+        self.positionals = {}
+
     def normalize_weights(self):
+        self.flush()
         normalize_dictio(self.hashd)
-        normalize_dictio(self.letter_distrib)
-        normalize_dictio(self.bigram_distrib)
-        normalize_dictio(self.openbigram_distrib)
-        normalize_dictio(self.allbigram_distrib)
-        normalize_dictio(self.trigram_distrib)
-        normalize_dictio(self.quadrigram_distrib)
+        for distrib in (self.letter_distrib, self.bigram_distrib, self.openbigram_distrib,
+                        self.allbigram_distrib, self.trigram_distrib, self.quadrigram_distrib):
+            if self.backend == 'numpy':
+                distrib.normalize()
+            else:
+                normalize_dictio(distrib)
+
+    def word_frequencies(self, words):
+        """ relative frequencies of 'words' (estimated from the sketch with words='sketch') """
+        self.flush()
+        if self.sketch is not None:
+            return self.sketch.query(list(words)) / max(self.sketch.total, 1.0)
+        return np.array([self.hashd.get(w, 0.0) for w in words], dtype=np.float64)
 
     def neighboors_substitution(self, word):
-        n = []
-        for i in range(len(word)):
-            k = list(word)
-            k[i:i+1] = '.'
-            kk = "".join(k)
-            if kk in self.dico_sub:
-                n.extend([x for x in self.dico_sub[kk] if not x == word if not x in n])
-        return n
+        return self.neighbourhood().substitution(word)
 
     def neighboors_deletion(self, word):
-        n = []
-        for i in range(len(word)):
-            k = list(word)
-            del k[i]
-            kk = "".join(k)
-            if kk in self.hashd:
-                n.append(kk)
-        return n
-
-    def neighboors_addition(self, word): # BUG: FIXME does not work
-        if word in self.dico_del:
-            return self.dico_del[word]
-        else:
-            return []
+        return self.neighbourhood().deletion(word)
+
+    def neighboors_addition(self, word):
+        return self.neighbourhood().addition(word)
 
     def neighboors_transposition(self, word):
-        n = []
-        for i in range(len(word)-1):
-            k = list(word)
-            k[i], k[i+1] = k[i+1], k[i] # swap letters
-            kk = "".join(k)
-            if kk !=word and kk in self.hashd:
-                n.append(kk)
-        return n
+        return self.neighbourhood().transposition(word)
+
+    def get_stats(self, astring, kinds=SCORES):
+        """ the frequencies of the n-grams of 'astring', in reading order, for each of 'kinds'
+        (see compute_stats) """
+        self.flush()
+        res = {}
+        for kind in kinds:
+            distrib = getattr(self, kind[:-1] + '_distrib')
+            if self.backend == 'numpy':
+                distrib = distrib.asdict()
+            res[kind] = [distrib.get(c, 0.0) for c in NGRAMS[kind](astring)]
+        return res
 
     def get_stats_letters(self, astring):
-        values = []
-        for c in letters(astring):
-            if c in self.letter_distrib:
-                values.append(self.letter_distrib[c])
-            else:
-                values.append(0.0)
-        return values
+        return self.get_stats(astring, ['letters'])['letters']
 
     def get_stats_bigrams(self, astring):
-        values = []
-        for c in bigrams(astring):
-            if c in self.bigram_distrib:
-                values.append(self.bigram_distrib[c])
-            else:
-                values.append(0.0)
-        return values
+        return self.get_stats(astring, ['bigrams'])['bigrams']
 
     def get_stats_allbigrams(self, astring):
-        values = []
-        for c in allbigrams(astring):
-            if c in self.allbigram_distrib:
-                values.append(self.allbigram_distrib[c])
-            else:
-                values.append(0.0)
-        return values
+        return self.get_stats(astring, ['allbigrams'])['allbigrams']
 
     def get_stats_openbigrams(self, astring):
-        values = []
-        for c in openbigrams(astring):
-            if c in self.openbigram_distrib:
-                values.append(self.openbigram_distrib[c])
-            else:
-                values.append(0.0)
-        return values
+        return self.get_stats(astring, ['openbigrams'])['openbigrams']
 
     def get_stats_trigrams(self, astring):
-        values = []
-        for c in trigrams(astring):
-            if c in self.trigram_distrib:
-                values.append(self.trigram_distrib[c])
-            else:
-                values.append(0.0)
-        return values
+        return self.get_stats(astring, ['trigrams'])['trigrams']
 
     def get_stats_quadrigrams(self, astring):
-        values = []
-        for c in quadrigrams(astring):
-            if c in self.quadrigram_distrib:
-                values.append(self.quadrigram_distrib[c])
-            else:
-                values.append(0.0)
-        return values
-
+        return self.get_stats(astring, ['quadrigrams'])['quadrigrams']
+
+    def score_batch(self, strings, chunksize=100000):
+        """ computes the statistics of compute_stats(), aggregated, for many strings.
+
+        'strings' is any iterable of strings (e.g. an open file, one string per line).
+        Yields (strings, records) for successive chunks of 'chunksize' strings, where
+        'records' is an array of dtype SCORE_DTYPE. Strings with no n-gram of a given
+        kind get 0 for the sum and NaN for the other statistics. """
+        if self.backend != 'numpy':
+            raise ValueError("score_batch requires the numpy backend")
+        self.flush()
+        chunk = []
+        for s in strings:
+            chunk.append(s.rstrip('\n'))
+            if len(chunk) == chunksize:
+                yield chunk, self._score_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield chunk, self._score_chunk(chunk)
+
+    def _score_chunk(self, strings):
+        nw = len(strings)
+        rec = np.zeros(nw, dtype=SCORE_DTYPE)
+        codes, offsets = self.alphabet.encode(strings, grow=False)
+        rec['length'] = np.diff(offsets)
+        bigr = ngrams.ngram_keys(codes, offsets, 2)
+        openbigr = ngrams.ngram_keys(codes, offsets, 2, gap=1)
+        allbigr = (np.concatenate((bigr[0], openbigr[0])), np.concatenate((bigr[1], openbigr[1])))
+        for kind, distrib, (keys, wordidx) in (
+                ('letters', self.letter_distrib, ngrams.ngram_keys(codes, offsets, 1)),
+                ('bigrams', self.bigram_distrib, bigr),
+                ('openbigrams', self.openbigram_distrib, openbigr),
+                ('allbigrams', self.allbigram_distrib, allbigr),
+                ('trigrams', self.trigram_distrib, ngrams.ngram_keys(codes, offsets, 3)),
+                ('quadrigrams', self.quadrigram_distrib, ngrams.ngram_keys(codes, offsets, 4))):
+            freqs = distrib.lookup(keys)
+            counts = np.bincount(wordidx, minlength=nw)
+            sums = np.bincount(wordidx, weights=freqs, minlength=nw)
+            logsums = np.bincount(wordidx, weights=np.log10(freqs + 1), minlength=nw)
+            mins = np.full(nw, np.nan)
+            np.fmin.at(mins, wordidx, freqs)  # fmin(nan, x) is x
+            with np.errstate(invalid='ignore', divide='ignore'):
+                rec[kind + '_sum'] = sums
+                rec[kind + '_mean'] = sums / counts
+                rec[kind + '_min'] = mins
+                rec[kind + '_meanlog'] = np.where(sums > 0, logsums / counts, np.nan)
+        return rec
 
 
 def compute_stats(word, dico):
     """ extracts stats from 'dico' for the subcomponents of 'word' """
-    letterfreq = dico.get_stats_letters(word)
-    bigramfreq = dico.get_stats_bigrams(word)
-    openbigramfreq = dico.get_stats_openbigrams(word)
-    allbigramfreq = dico.get_stats_allbigrams(word)
-    trigramfreq = dico.get_stats_trigrams(word)
-    quadrigramfreq = dico.get_stats_quadrigrams(word)
-    return {'letters': letterfreq,
-            'bigrams': bigramfreq,
-            'openbigrams': openbigramfreq,
-            'allbigrams': allbigramfreq,
-            'trigrams': trigramfreq,
-            'quadrigrams': quadrigramfreq}
-
+    return dico.get_stats(word)
+
+
+def textfile_shards(filename, n):
+    """ cuts a file in (at most) n byte ranges (start, end) that begin at the start of a line """
+    size = op.getsize(filename)
+    cuts = [0]
+    with open(filename, 'rb') as f:
+        for i in range(1, n):
+            pos = max(size * i // n, cuts[-1], 1)
+            if pos >= size:
+                break
+            f.seek(pos - 1)
+            f.readline()  # moves to the start of the next line
+            cuts.append(f.tell())
+    cuts.append(size)
+    return [(start, end) for start, end in zip(cuts[:-1], cuts[1:]) if end > start]
+
+
+def open_text(filename, encoding='utf-8'):
+    """ opens a text file for reading, decompressing it if its name ends with .gz """
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rt', encoding=encoding)
+    return open(filename, 'r', encoding=encoding)
+
+
+def read_chunks(lines, chunksize, unicode=False):
+    """ yields the words of an iterable of lines, by lists of about 'chunksize' words
+    (transliterated to ASCII unless unicode=True) """
+    words = []
+    for line in lines:
+        words.extend(line.split() if unicode else (unidecode(word) for word in line.split()))
+        if len(words) >= chunksize:
+            yield words
+            words = []
+    yield words
+
+
+def _byte_range_lines(filename, start, end, encoding):
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        pos = start
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            yield line.decode(encoding)
+
+
+def _count_shard(job):
+    """ counts a part of a text file (see import_textfile): either a list of words,
+    or the lines in the byte range [start, end) of the file """
+    kind, arg, params = job
+    d = dico(**params)
+    if kind == 'words':
+        d.add_many(arg)
+    else:
+        filename, start, end, chunksize, encoding = arg
+        for chunk in read_chunks(_byte_range_lines(filename, start, end, encoding), chunksize, d.unicode):
+            d.add_many(chunk)
+    return d
+
+
+def load_or_build(filename, cachedir=None, sep='\t', header=None, columns=None, unicode=False):
+    """ returns a dico built from 'filename' by import_csv() (see dico for 'unicode', and
+    import_csv for 'sep', 'header' and 'columns').
+
+    The dico is saved in a snapshot in 'cachedir' (default: dico-snapshots/ in data_home()),
+    named after the md5 of 'filename' and the options that are not the defaults. Later
+    calls memory-map this snapshot instead of rebuilding the dico, until the content
+    of 'filename' changes. """
+    if cachedir is None:
+        cachedir = op.join(data_home(), 'dico-snapshots')
+    if header is None:
+        header = 1 if columns is None else 0
+    md5 = md5sum(filename)
+    options = list(columns or [])
+    if sep != '\t':
+        options.append('sep' + sep.encode('utf-8').hex())
+    if header != (1 if columns is None else 0):
+        options.append(f'header{header}')
+    if unicode:
+        options.append('unicode')
+    prefix = op.basename(filename) + '-' + ''.join(o + '-' for o in options)
+    snapdir = op.join(cachedir, prefix + md5)
+    try:
+        return dico.load(snapdir)
+    except (OSError, ValueError):
+        pass
+
+    d = dico(unicode=unicode)
+    d.import_csv(filename, sep=sep, header=header, columns=columns)
+    os.makedirs(cachedir, exist_ok=True)
+    for old in os.listdir(cachedir):  # snapshots of former versions of the file
+        if old.startswith(prefix) and old != prefix + md5 and len(old) == len(prefix) + 32:
+            shutil.rmtree(op.join(cachedir, old), ignore_errors=True)
+    d.save(snapdir, md5)
+    return d
 
 
 if __name__ == '__main__':
     import pprint as pp
-    mydic = dico()
-    mydic.import_csv('ortho-freql.txt')
+    mydic = load_or_build('ortho-freql.txt')
 
     # two examples:
     print("bonjour : ")
@@ -1,21 +1,24 @@
 #! /usr/bin/env python3
 # Time-stamp: <2018-11-07 11:39:39 cp983411>
 
+import sys
 import dico
 import pandas as pd
 import os.path as op
 import pprint as pp
 
-LEXIQUE = 'Lexique382/Lexique382.txt'
+sys.path.insert(0, op.join(op.dirname(op.abspath(__file__)), '..', 'lexique-python'))
+import lexique
+
+LEXIQUE = None  # Lexique383.tsv in $OPENLEXICON_DATASETS (see lexique.load)
 FREQFILE = 'ortho-freql.txt'
 
 
 def create_freq_file(lexique_path, outputfile):
     """ extract columns 'ortho' and 'freqlivres' from Lexique """
-    a = pd.read_csv(lexique_path, sep='\t')
+    a = lexique.load(['ortho', 'freqlivres'], tsvfile=lexique_path)
 
-    b = a[['1_ortho', '10_freqlivres']].rename(columns={'1_ortho': 'ortho',
-                                                        '10_freqlivres': 'freql'})
+    b = a.rename(columns={'freqlivres': 'freql'})
     # put a threshold on freq (?)
     # b = b[b.freql > .2]
     b.to_csv(outputfile, sep='\t', index=False)
@@ -30,8 +33,7 @@ if __name__ == '__main__':
     if not op.isfile(FREQFILE):
         create_freq_file(LEXIQUE, FREQFILE)
 
-    mydic = dico.dico()
-    mydic.import_csv(FREQFILE)
+    mydic = dico.load_or_build(FREQFILE)
 
     letters = mydic.letter_distribution()
     # pp.pprint(letters)
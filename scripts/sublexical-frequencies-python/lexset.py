@@ -0,0 +1,240 @@
+#! /usr/bin/env python3
+
+""" lexicon membership and constraints, to filter large batches of candidate pseudowords
+
+- stringset: a set of strings stored in arrays (sorted 64-bit hashes, see neighbours.py,
+  and the strings themselves, see tables.stringtable), queried for many strings at once
+- lexicon: the orthographic and phonological forms of a lexicon (e.g. Lexique383), with
+  its bigrams and trigrams, saved as .npy arrays that load() memory-maps
+
+    lex = lexset.load_or_build('Lexique383.tsv')
+    keep = lex.filter(candidates, phons, not_word=True, not_homophone=True,
+                      length=(5, 8), nbsyll=(2, 2), legal=(2, 3))
+"""
+
+import os
+import os.path as op
+import json
+import shutil
+import numpy as np
+import pandas as pd
+import ngrams
+import tables
+from neighbours import hashedwords
+from dico import md5sum, data_home
+
+SNAPSHOT_VERSION = 1
+VOWELS = 'aeiouyEO29°5@§1'  # vowels of the phonological code of Lexique
+
+
+class stringset:
+    """ immutable set of strings, with bulk membership queries """
+    fields = ('hashes', 'ids')
+
+    def __init__(self, strings, hashes, ids):
+        self.strings = strings  # tables.stringtable
+        self.hashes = hashes  # uint64: sorted hashes of the strings
+        self.ids = ids  # int64: the string whose hash is hashes[j] is strings[ids[j]]
+
+    @classmethod
+    def build(cls, strings):
+        strings = list(dict.fromkeys(strings))
+        h, ids = hashedwords(strings).words()
+        order = np.argsort(h, kind='stable')
+        return cls(tables.stringtable.build(strings), h[order], ids[order])
+
+    def save(self, dirname, name):
+        tables.save_arrays(dirname, name + '.strings', self.strings.arrays())
+        tables.save_arrays(dirname, name, {f: getattr(self, f) for f in self.fields})
+
+    @classmethod
+    def load(cls, dirname, name, mmap=True):
+        strings = tables.stringtable(**tables.load_arrays(dirname, name + '.strings', tables.stringtable.fields, mmap))
+        return cls(strings, **tables.load_arrays(dirname, name, cls.fields, mmap))
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def find(self, strings):
+        """ returns the positions of 'strings' in the set (-1 when absent). The hashes are
+        compared first, then the strings whose hash is in the set. """
+        strings = list(strings)
+        res = np.full(len(strings), -1, dtype=np.int64)
+        if not strings or not len(self.hashes):
+            return res
+        h, _ = hashedwords(strings).words()
+        pos = np.minimum(np.searchsorted(self.hashes, h), len(self.hashes) - 1)
+        for i in np.nonzero(self.hashes[pos] == h)[0]:
+            j = int(self.ids[pos[i]])
+            if self.strings[j] == strings[i]:
+                res[i] = j
+        return res
+
+    def contains(self, strings):
+        return self.find(strings) >= 0
+
+    def __contains__(self, s):
+        return self.find([s])[0] >= 0
+
+
+def count_vowels(phons, vowels=VOWELS):
+    """ number of syllables of phonological forms, i.e. their number of vowels """
+    alpha = ngrams.alphabet(vowels)
+    codes, offsets = alpha.encode(list(phons), grow=False)
+    isvowel = (codes < len(vowels)).astype(np.int64)
+    sums = np.concatenate(([0], np.cumsum(isvowel)))
+    return sums[offsets[1:]] - sums[offsets[:-1]]
+
+
+class lexicon:
+    """ orthographic and phonological forms of a lexicon, and its n-grams """
+    NGRAMS = (2, 3)
+
+    def __init__(self, ortho, phon, alphabet, grams):
+        self.ortho = ortho  # stringset of the words
+        self.phon = phon  # stringset of their pronunciations
+        self.alphabet = alphabet
+        self.grams = grams  # {n: ngrams.ngramtable of the n-grams of the words (type counts)}
+        self.md5 = None
+
+    @classmethod
+    def build(cls, orthos, phons=()):
+        orthos = [w for w in orthos if isinstance(w, str)]
+        phons = [p for p in phons if isinstance(p, str)]
+        alpha = ngrams.alphabet()
+        words = list(dict.fromkeys(orthos))
+        codes, offsets = alpha.encode(words)
+        grams = {}
+        for n in cls.NGRAMS:
+            keys, _ = ngrams.ngram_keys(codes, offsets, n)
+            grams[n] = ngrams.ngramtable(n, alpha)
+            grams[n].add(keys, np.ones(len(keys)))
+        return cls(stringset.build(words), stringset.build(phons), alpha, grams)
+
+    @classmethod
+    def from_tsv(cls, filename, ortho='ortho', phon='phon'):
+        a = pd.read_csv(filename, sep='\t', usecols=[ortho, phon], keep_default_na=False, na_values=[''])
+        return cls.build(a[ortho], a[phon])
+
+    def save(self, dirname, md5=None):
+        """ saves the lexicon in directory 'dirname' as .npy arrays, which load() memory-maps """
+        tmpdir = f'{dirname}.tmp{os.getpid()}'
+        os.makedirs(tmpdir)
+        self.ortho.save(tmpdir, 'ortho')
+        self.phon.save(tmpdir, 'phon')
+        for n, table in self.grams.items():
+            tables.save_arrays(tmpdir, f'grams{n}', {'grams': table.grams, 'weights': table.weights})
+        with open(op.join(tmpdir, 'meta.json'), 'w') as f:
+            json.dump({'version': SNAPSHOT_VERSION, 'md5': md5,
+                       'alphabet': ''.join(self.alphabet.chars), 'ngrams': list(self.grams)}, f)
+        if op.isdir(dirname):
+            shutil.rmtree(dirname)
+        os.rename(tmpdir, dirname)
+
+    @classmethod
+    def load(cls, dirname, mmap=True):
+        with open(op.join(dirname, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != SNAPSHOT_VERSION:
+            raise ValueError(f"{dirname}: snapshot version {meta['version']}, expected {SNAPSHOT_VERSION}")
+        alpha = ngrams.alphabet(meta['alphabet'])
+        grams = {}
+        for n in meta['ngrams']:
+            arrays = tables.load_arrays(dirname, f'grams{n}', ['grams', 'weights'], mmap)
+            grams[n] = ngrams.ngramtable(n, alpha, arrays['grams'], arrays['weights'])
+        lex = cls(stringset.load(dirname, 'ortho', mmap), stringset.load(dirname, 'phon', mmap), alpha, grams)
+        lex.md5 = meta['md5']
+        return lex
+
+    def is_word(self, strings):
+        return self.ortho.contains(strings)
+
+    def is_homophone(self, phons):
+        """ True for the pronunciations of words of the lexicon """
+        return self.phon.contains(phons)
+
+    def legal(self, strings, n):
+        """ True for the strings whose n-grams all occur in words of the lexicon """
+        strings = list(strings)
+        codes, offsets = self.alphabet.encode(strings, grow=False)
+        keys, wordidx = ngrams.ngram_keys(codes, offsets, n)
+        unknown = self.grams[n].lookup(keys) == 0
+        return np.bincount(wordidx[unknown], minlength=len(strings)) == 0
+
+    def filter(self, strings, phons=None, not_word=True, not_homophone=False,
+               length=None, nbsyll=None, legal=()):
+        """ returns a boolean mask of the candidates 'strings' that satisfy all the constraints:
+
+        not_word: not a word of the lexicon
+        not_homophone: their pronunciation 'phons' is not the one of a word
+        length: (min, max) number of letters
+        nbsyll: (min, max) number of syllables (vowels of 'phons')
+        legal: sizes n of the n-grams (2 and/or 3) that must all occur in the lexicon """
+        strings = list(strings)
+        keep = np.ones(len(strings), dtype=bool)
+        if length is not None:
+            n = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+            keep &= (n >= length[0]) & (n <= length[1])
+        if (not_homophone or nbsyll is not None) and phons is None:
+            raise ValueError("the pronunciations of the candidates are needed")
+        if nbsyll is not None:
+            n = count_vowels(phons)
+            keep &= (n >= nbsyll[0]) & (n <= nbsyll[1])
+        for n in legal:
+            keep &= self.legal(strings, n)
+        # membership last, on the remaining candidates only
+        idx = np.nonzero(keep)[0]
+        if not_word:
+            keep[idx[self.is_word([strings[i] for i in idx])]] = False
+            idx = np.nonzero(keep)[0]
+        if not_homophone:
+            phons = list(phons)
+            keep[idx[self.is_homophone([phons[i] for i in idx])]] = False
+        return keep
+
+
+def load_or_build(filename, cachedir=None):
+    """ returns the lexicon of a Lexique-like .tsv file (columns 'ortho' and 'phon'),
+    saved in a snapshot named after the md5 of the file (see dico.load_or_build) """
+    if cachedir is None:
+        cachedir = op.join(data_home(), 'lexset-snapshots')
+    md5 = md5sum(filename)
+    prefix = op.basename(filename) + '-'
+    snapdir = op.join(cachedir, prefix + md5)
+    try:
+        return lexicon.load(snapdir)
+    except (OSError, ValueError):
+        pass
+
+    lex = lexicon.from_tsv(filename)
+    os.makedirs(cachedir, exist_ok=True)
+    for old in os.listdir(cachedir):
+        if old.startswith(prefix) and old != prefix + md5 and len(old) == len(prefix) + 32:
+            shutil.rmtree(op.join(cachedir, old), ignore_errors=True)
+    lex.save(snapdir, md5)
+    lex.md5 = md5
+    return lex
+
+
+if __name__ == '__main__':
+    import sys
+    import argparse
+    parser = argparse.ArgumentParser(description="keeps the candidates (first column of a tab-separated file, "
+                                     "optional second column: pronunciation) that satisfy constraints w.r.t. a lexicon")
+    parser.add_argument('lexique', help="Lexique-like .tsv file, with columns 'ortho' and 'phon'")
+    parser.add_argument('candidates', nargs='?', default='-', help="candidates file ('-': stdin)")
+    parser.add_argument('--words-allowed', action='store_true', help="keep the words of the lexicon")
+    parser.add_argument('--not-homophone', action='store_true', help="reject the pronunciations of words")
+    parser.add_argument('--length', type=int, nargs=2, metavar=('MIN', 'MAX'), help="number of letters")
+    parser.add_argument('--nbsyll', type=int, nargs=2, metavar=('MIN', 'MAX'), help="number of syllables")
+    parser.add_argument('--legal', type=int, nargs='*', default=[], help="n-gram sizes that must occur in the lexicon")
+    args = parser.parse_args()
+
+    lex = load_or_build(args.lexique)
+    cands = pd.read_csv(sys.stdin if args.candidates == '-' else args.candidates, sep='\t', header=None,
+                        dtype=str, keep_default_na=False)
+    phons = cands[1].tolist() if cands.shape[1] > 1 else None
+    keep = lex.filter(cands[0].tolist(), phons, not_word=not args.words_allowed,
+                      not_homophone=args.not_homophone, length=args.length, nbsyll=args.nbsyll,
+                      legal=args.legal)
+    cands[keep].to_csv(sys.stdout, sep='\t', header=False, index=False)
@@ -0,0 +1,184 @@
+#! /usr/bin/env python3
+
+""" generates pseudowords by chaining the trigrams of a list of model words
+
+This is the algorithm of scripts/pseudoword-generation-by-markov-on-trigrams: the
+first letters of a pseudoword are drawn from the beginnings of the model words, and
+each next letter is drawn among the letters that follow the last two letters, at
+the same position, in the model words (position-specific trigram Markov chain).
+
+For each position, the transitions 'last two letters -> next letter' are stored as
+alias tables (Walker, 1977), so that a letter is drawn in constant time, for a whole
+batch of pseudowords at once. Model words, words to exclude and the pseudowords
+already generated are rejected by comparing 64-bit hashes (see neighbours.py).
+
+Example: python markov.py -n 10 -l 7 --min-model-length 6 liste.de.mots.francais.frgut.txt
+"""
+
+import argparse
+import numpy as np
+import ngrams
+from neighbours import P, fmix
+
+BOUNDARY = ' '  # padding before the first letter and after the last letter of words
+
+
+def alias_table(p):
+    """ Vose's alias method: returns (prob, alias) for the probabilities 'p' """
+    k = len(p)
+    scaled = np.asarray(p, dtype=np.float64) * (k / np.sum(p))
+    prob = np.ones(k)
+    alias = np.arange(k)
+    small = [i for i in range(k) if scaled[i] < 1.0]
+    large = [i for i in range(k) if scaled[i] >= 1.0]
+    while small and large:
+        s, g = small.pop(), large.pop()
+        prob[s] = scaled[s]
+        alias[s] = g
+        scaled[g] -= 1.0 - scaled[s]
+        (small if scaled[g] < 1.0 else large).append(g)
+    return prob, alias
+
+
+def hash_rows(codes, lengths):
+    """ 64-bit hashes of words given as rows of codes (the first 'lengths' codes of each row) """
+    h = np.zeros(len(codes), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for j in range(codes.shape[1]):
+            h = np.where(j < lengths, h * P + codes[:, j].astype(np.uint64) + np.uint64(1), h)
+    return fmix(h, lengths)
+
+
+class markov:
+    """ position-specific trigram model of a list of words (optionally weighted) """
+    def __init__(self, words, weights=None, exclude=()):
+        self.alphabet = ngrams.alphabet(BOUNDARY)
+        words = list(words)
+        codes, offsets = self.alphabet.encode(words)
+        self.size = len(self.alphabet)
+        self.lengths = np.diff(offsets)
+        # padded[i, j + 2] is the j-th letter of word i; BOUNDARY (code 0) elsewhere
+        self.padded = np.zeros((len(words), int(self.lengths.max(initial=0)) + 3), dtype=np.int64)
+        rows = np.repeat(np.arange(len(words)), self.lengths)
+        self.padded[rows, np.arange(len(codes)) - offsets[rows] + 2] = codes
+        self.weights = np.ones(len(words)) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.chars = np.array([ord(c) for c in self.alphabet.chars], dtype=np.uint32)
+        self.rejected = np.unique(np.concatenate((hash_rows(self.padded[:, 2:], self.lengths),
+                                                  self._hashes(list(exclude)))))
+        self._tables = {}
+        self._finals = {}
+
+    def _hashes(self, words):
+        if not words:
+            return np.zeros(0, dtype=np.uint64)
+        codes, offsets = self.alphabet.encode(words, grow=False)
+        lengths = np.diff(offsets)
+        mat = np.zeros((len(words), int(lengths.max(initial=0))), dtype=np.int64)
+        rows = np.repeat(np.arange(len(words)), lengths)
+        mat[rows, np.arange(len(codes)) - offsets[rows]] = codes
+        return hash_rows(mat, lengths)
+
+    def table(self, pos):
+        """ alias tables of the transitions to the letter at position 'pos' (from 0):
+        for the state s = (code of letter pos-2) * size + (code of letter pos-1),
+        the candidates are next[start[s]:start[s+1]] """
+        if pos not in self._tables:
+            size = self.size
+            keep = self.lengths > pos  # words that have a letter at this position
+            state = self.padded[keep, pos] * size + self.padded[keep, pos + 1]
+            keys = state * size + self.padded[keep, pos + 2]
+            uniq, inverse = np.unique(keys, return_inverse=True)
+            counts = np.bincount(inverse, weights=self.weights[keep])
+            states, nexts = uniq // size, uniq % size
+            start = np.searchsorted(states, np.arange(size * size + 1))
+            prob = np.ones(len(uniq))
+            alias = np.arange(len(uniq))
+            for s in np.unique(states):
+                lo, hi = start[s], start[s + 1]
+                p, a = alias_table(counts[lo:hi])
+                prob[lo:hi] = p
+                alias[lo:hi] = a + lo
+            self._tables[pos] = (start, nexts, prob, alias)
+        return self._tables[pos]
+
+    def finals(self, length):
+        """ sorted states (last two letters) that end model words of 'length' letters """
+        if length not in self._finals:
+            keep = self.lengths == length
+            self._finals[length] = np.unique(self.padded[keep, length] * self.size + self.padded[keep, length + 1])
+        return self._finals[length]
+
+    def sample(self, n, length, rng):
+        """ draws n chains of 'length' letters; returns (codes, ok) where ok is False for
+        the chains that reached a state from which no model word continues """
+        size = self.size
+        codes = np.zeros((n, length + 2), dtype=np.int64)
+        ok = np.ones(n, dtype=bool)
+        for pos in range(length):
+            start, nexts, prob, alias = self.table(pos)
+            state = codes[:, pos] * size + codes[:, pos + 1]
+            k = start[state + 1] - start[state]
+            ok &= k > 0
+            j = start[state] + (rng.random(n) * k).astype(np.int64)
+            j = np.minimum(j, len(nexts) - 1)
+            j = np.where(rng.random(n) < prob[j], j, alias[j])
+            codes[:, pos + 2] = nexts[j]
+        return codes[:, 2:], ok
+
+    def generate(self, n, length, final=False, seed=None, batchsize=None):
+        """ returns n distinct pseudowords of 'length' letters, that are neither model
+        words nor excluded words. With final=True, their last two letters also end
+        a model word of the same length. """
+        rng = np.random.default_rng(seed)
+        batchsize = batchsize or max(2 * n, 1024)
+        lengths = np.full(batchsize, length)
+        seen = np.zeros(0, dtype=np.uint64)
+        found = []
+        total = 0
+        attempts = 0
+        while total < n:
+            codes, ok = self.sample(batchsize, length, rng)
+            if final and length >= 2:
+                fin = self.finals(length)
+                state = codes[:, -2] * self.size + codes[:, -1]
+                pos = np.minimum(np.searchsorted(fin, state), max(len(fin) - 1, 0))
+                ok &= (fin[pos] == state) if len(fin) else False
+            h = hash_rows(codes, lengths)
+            _, first = np.unique(h, return_index=True)
+            keep = np.zeros(batchsize, dtype=bool)
+            keep[first] = True
+            keep &= ok & ~np.isin(h, self.rejected) & ~np.isin(h, seen)
+            keep = np.nonzero(keep)[0][:n - total]
+            if len(keep) == 0:
+                attempts += 1
+                if attempts >= 100:
+                    raise RuntimeError(f"cannot generate more than {total} pseudowords of length {length}")
+                continue
+            attempts = 0
+            seen = np.concatenate((seen, h[keep]))
+            found.append(self.chars[codes[keep]])
+            total += len(keep)
+        letters = np.ascontiguousarray(np.concatenate(found))
+        return letters.view(f'<U{length}').ravel().tolist()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('models', help="file with one model word per line")
+    parser.add_argument('-n', type=int, default=10, help="number of pseudowords (default: %(default)s)")
+    parser.add_argument('-l', '--length', type=int, default=7, help="number of letters (default: %(default)s)")
+    parser.add_argument('--min-model-length', type=int, default=1, help="ignore shorter model words")
+    parser.add_argument('--exclude', help="file with words to exclude (one per line)")
+    parser.add_argument('--final', action='store_true', help="end the pseudowords like model words")
+    parser.add_argument('--seed', type=int, help="seed of the random generator")
+    args = parser.parse_args()
+
+    with open(args.models, encoding='utf-8') as f:
+        models = [w for w in f.read().split() if len(w) >= args.min_model_length]
+    exclude = []
+    if args.exclude:
+        with open(args.exclude, encoding='utf-8') as f:
+            exclude = f.read().split()
+    gen = markov(models, exclude=exclude)
+    for w in gen.generate(args.n, args.length, final=args.final, seed=args.seed):
+        print(w)
@@ -0,0 +1,339 @@
+#! /usr/bin/env python3
+
+""" orthographic neighbourhood of the words of a lexicon
+
+Neighbours of a word (Coltheart et al., 1977; Davis, 2005):
+  - substitution: same length, one letter differs (bonjour -> bonsour); their number is Coltheart's N
+  - deletion: one letter removed (plier -> pier)
+  - addition: one letter inserted (pier -> plier)
+  - transposition: two adjacent letters swapped (tarce -> trace)
+OLD20 (Yarkoni, Balota & Yap, 2008) is the mean Levenshtein distance of a word to
+its 20 closest words in the lexicon.
+
+Each string is summarized by a 64-bit hash, computed from the prefix sums of a
+polynomial over its code points, so that the hashes of all its variants (one
+letter replaced by a wildcard, one letter deleted, two letters swapped...) are
+obtained in O(1) each, for all words at once. Neighbours are then found by
+sorting and joining arrays of hashes (the 'posting arrays'). Two different
+strings get the same hash with probability ~ 2**-64, which is not checked.
+"""
+
+import numpy as np
+
+P = np.uint64(0x9E3779B97F4A7C15)  # odd, hence invertible modulo 2**64
+PINV = np.uint64(pow(int(P), -1, 1 << 64))
+PINV2 = np.uint64(pow(int(P), -2, 1 << 64))
+WILD = np.uint64(1)  # code of the wildcard; letters are coded by their code point + 2
+LENGTH_SALT = np.uint64(0xD6E8FEB86659FD93)
+
+KINDS = ['substitution', 'addition', 'deletion', 'transposition']
+
+
+def fmix(h, lengths):
+    """ mixes the polynomial hash 'h' of strings with their lengths (murmur3 finalizer) """
+    x = h ^ (lengths.astype(np.uint64) * LENGTH_SALT)
+    x ^= x >> np.uint64(33)
+    x *= np.uint64(0xFF51AFD7ED558CCD)
+    x ^= x >> np.uint64(33)
+    x *= np.uint64(0xC4CEB9FE1A85EC53)
+    x ^= x >> np.uint64(33)
+    return x
+
+
+class hashedwords:
+    """ codes and polynomial prefix sums of a list of words, from which the hashes of
+    the words and of their variants are computed """
+    def __init__(self, words):
+        self.lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+        self.lmax = int(self.lengths.max()) if len(words) else 0
+        points = np.frombuffer(''.join(words).encode('utf-32-le'), dtype=np.uint32)
+        self.codes = np.zeros((len(words), self.lmax), dtype=np.uint64)  # 0 = padding
+        rows = np.repeat(np.arange(len(words)), self.lengths)
+        cols = np.arange(len(points)) - np.repeat(np.cumsum(self.lengths) - self.lengths, self.lengths)
+        self.codes[rows, cols] = points.astype(np.uint64) + np.uint64(2)
+        self.powers = np.array([pow(int(P), k, 1 << 64) for k in range(self.lmax + 1)], dtype=np.uint64)
+        self.sums = np.zeros((len(words), self.lmax + 1), dtype=np.uint64)  # sums[:, k]: prefix of length k
+        np.cumsum(self.codes * self.powers[:self.lmax], axis=1, out=self.sums[:, 1:])
+        self.total = self.sums[:, -1]
+
+    def words(self):
+        """ returns (hashes, ids) of the words themselves """
+        return fmix(self.total, self.lengths), np.arange(len(self.lengths))
+
+    def _positions(self, minlength=1, offset=0):
+        """ all (word id, position i) with i + offset < length """
+        ids, pos = np.nonzero(np.arange(self.lmax)[None, :] + offset < self.lengths[:, None])
+        keep = self.lengths[ids] >= minlength
+        return ids[keep], pos[keep]
+
+    def substitutions(self):
+        """ hashes of the words with one letter replaced by a wildcard (bonjour -> b?njour) """
+        ids, i = self._positions()
+        h = self.total[ids] + (WILD - self.codes[ids, i]) * self.powers[i]
+        return fmix(h, self.lengths[ids]), ids
+
+    def deletions(self):
+        """ hashes of the words with one letter deleted (bonjour -> bnjour) """
+        ids, i = self._positions()
+        h = self.sums[ids, i] + PINV * (self.total[ids] - self.sums[ids, i + 1])
+        return fmix(h, self.lengths[ids] - 1), ids
+
+    def transpositions(self):
+        """ hashes of the words with two (different) adjacent letters swapped """
+        ids, i = self._positions(offset=1)
+        a, b = self.codes[ids, i], self.codes[ids, i + 1]
+        keep = a != b
+        ids, i, a, b = ids[keep], i[keep], a[keep], b[keep]
+        h = self.total[ids] + (b - a) * self.powers[i] + (a - b) * self.powers[i + 1]
+        return fmix(h, self.lengths[ids]), ids
+
+
+def _postings(hashes, ids):
+    """ sorts (hashes, ids) by hash, so that the ids sharing a hash are contiguous """
+    order = np.argsort(hashes, kind='stable')
+    return hashes[order], ids[order]
+
+
+def _join(hashes, ids, sortedhashes, sortedids):
+    """ returns the pairs (ids[i], sortedids[j]) such that hashes[i] == sortedhashes[j] """
+    lo = np.searchsorted(sortedhashes, hashes, 'left')
+    counts = np.searchsorted(sortedhashes, hashes, 'right') - lo
+    a = np.repeat(ids, counts)
+    first = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+    return a, sortedids[first + np.arange(len(a))]
+
+
+def _unique_pairs(a, b, n):
+    """ removes the pairs (x, x) and the duplicated pairs """
+    keep = a != b
+    pairs = np.unique(a[keep].astype(np.int64) * n + b[keep])
+    return pairs // n, pairs % n
+
+
+def levenshtein(queries, qidx, candidates):
+    """ Levenshtein distances between queries[qidx[i]] and candidates[i], for all i.
+
+    'queries' (Q x L, L <= 64) and 'candidates' (C x M) are arrays of small integer
+    codes. Myers' bit-parallel algorithm is run on all the pairs at once. """
+    nq, lq = queries.shape
+    nc, lc = candidates.shape
+    assert lq <= 64
+    ncodes = int(max(queries.max(initial=0), candidates.max(initial=0))) + 1
+    peq = np.zeros((nq, ncodes), dtype=np.uint64)  # peq[q, c]: positions of code c in query q
+    for k in range(lq):
+        peq[np.arange(nq), queries[:, k]] |= np.uint64(1 << k)
+    pv = np.full(nc, (1 << lq) - 1, dtype=np.uint64)
+    mv = np.zeros(nc, dtype=np.uint64)
+    score = np.full(nc, lq, dtype=np.int64)
+    high = np.uint64(1 << max(lq - 1, 0))
+    one = np.uint64(1)
+    for j in range(lc):
+        eq = peq[qidx, candidates[:, j]]
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        score += (ph & high) != 0
+        score -= (mh & high) != 0
+        ph = (ph << one) | one
+        mh = mh << one
+        pv = mh | ~(xv | ph)
+        mv = ph & xv
+    if lq == 0:
+        score[:] = lc
+    return score
+
+
+def letter_features(codes, lengths):
+    """ binary features (c, k) = 'the word has at least k letters c', so that the dot
+    product of the features of two words is the size of their common multiset of letters """
+    n = len(lengths)
+    ncodes = int(codes.max(initial=0)) + 1
+    seen = np.zeros((n, ncodes), dtype=np.int64)
+    cols = []
+    for j in range(codes.shape[1]):
+        rows = np.nonzero(lengths > j)[0]
+        c = codes[rows, j]
+        cols.append((rows, c, seen[rows, c]))
+        seen[rows, c] += 1
+    nk = int(seen.max(initial=0))
+    feat = np.zeros((n, ncodes * nk), dtype=np.float32)
+    for rows, c, k in cols:
+        feat[rows, c * nk + k] = 1.0
+    return feat[:, feat.any(axis=0)]
+
+
+class neighbourhood:
+    """ neighbourhood index of a list of (distinct) words, with optional frequencies """
+    def __init__(self, words, freqs=None):
+        self.wordlist = list(words)
+        self.freqs = np.ones(len(self.wordlist)) if freqs is None else np.asarray(freqs, dtype=np.float64)
+        hw = hashedwords(self.wordlist)
+        self.wordhash, self.wordids = _postings(*hw.words())
+        self.subhash, self.subids = _postings(*hw.substitutions())
+        self.delhash, self.delids = _postings(*hw.deletions())
+        self._hw = hw
+        self._pairs = {}
+
+    def __len__(self):
+        return len(self.wordlist)
+
+    fields = ('freqs', 'wordhash', 'wordids', 'subhash', 'subids', 'delhash', 'delids')
+
+    def arrays(self):
+        return {f: getattr(self, f) for f in self.fields}
+
+    @classmethod
+    def from_arrays(cls, words, arrays):
+        """ rebuilds an index from the output of arrays() (e.g. memory-mapped) """
+        nb = cls.__new__(cls)
+        nb.wordlist = words
+        for name, arr in arrays.items():
+            setattr(nb, name, arr)
+        nb._hw = None
+        nb._pairs = {}
+        return nb
+
+    def _hashed(self):
+        if self._hw is None:
+            self._hw = hashedwords(list(self.wordlist))
+        return self._hw
+
+    # --- neighbours of any string
+
+    def _lookup(self, hashes, sortedhashes, sortedids, exclude=None):
+        res = []
+        for h in hashes:
+            lo = np.searchsorted(sortedhashes, h, 'left')
+            hi = np.searchsorted(sortedhashes, h, 'right')
+            for i in sortedids[lo:hi]:
+                w = self.wordlist[i]
+                if w != exclude and w not in res:
+                    res.append(w)
+        return res
+
+    def substitution(self, word):
+        h, _ = hashedwords([word]).substitutions()
+        return self._lookup(h, self.subhash, self.subids, exclude=word)
+
+    def deletion(self, word):
+        h, _ = hashedwords([word]).deletions()
+        return self._lookup(h, self.wordhash, self.wordids)
+
+    def addition(self, word):
+        h, _ = hashedwords([word]).words()
+        return self._lookup(h, self.delhash, self.delids)
+
+    def transposition(self, word):
+        h, _ = hashedwords([word]).transpositions()
+        return self._lookup(h, self.wordhash, self.wordids)
+
+    # --- whole lexicon
+
+    def pairs(self, kind):
+        """ returns arrays (a, b) of word ids such that word b is a neighbour of word a """
+        if kind not in self._pairs:
+            n = len(self)
+            if kind == 'substitution':
+                a, b = _join(self.subhash, self.subids, self.subhash, self.subids)
+            elif kind == 'deletion':
+                a, b = _join(*self._hashed().deletions(), self.wordhash, self.wordids)
+            elif kind == 'addition':
+                b, a = self.pairs('deletion')
+            elif kind == 'transposition':
+                a, b = _join(*self._hashed().transpositions(), self.wordhash, self.wordids)
+            else:
+                raise ValueError(f"unknown kind of neighbours: {kind}")
+            self._pairs[kind] = _unique_pairs(a, b, n) if kind != 'addition' else (a, b)
+        return self._pairs[kind]
+
+    def counts(self, kind):
+        """ number of neighbours of each word """
+        a, _ = self.pairs(kind)
+        return np.bincount(a, minlength=len(self))
+
+    def frequency_sums(self, kind):
+        """ summed frequency of the neighbours of each word """
+        a, b = self.pairs(kind)
+        return np.bincount(a, weights=self.freqs[b], minlength=len(self))
+
+    def neighbours(self, kind):
+        """ list of the neighbours of each word """
+        a, b = self.pairs(kind)
+        order = np.lexsort((b, a))
+        a, b = a[order], b[order]
+        bounds = np.searchsorted(a, np.arange(len(self) + 1))
+        words = self.wordlist
+        return [[words[j] for j in b[bounds[i]:bounds[i + 1]]] for i in range(len(self))]
+
+    def old(self, k=20, chunk=1 << 20):
+        """ OLDk: mean Levenshtein distance of each word to its k closest words.
+
+        The search is pruned with a lower bound of the distance between two words:
+        max(length1, length2) - (number of letters in common), computed for many pairs
+        at once as a product of matrices (see letter_features). For increasing
+        thresholds t, the exact distance (levenshtein) is computed only for the pairs
+        whose bound is t, until k words are known to be at distance <= t. """
+        n = len(self)
+        k = min(k, n - 1)
+        res = np.full(n, np.nan)
+        if k <= 0:
+            return res
+        hw = self._hashed()
+        _, dense = np.unique(hw.codes, return_inverse=True)  # small codes for levenshtein()
+        dense = dense.reshape(hw.codes.shape)
+        order = np.argsort(hw.lengths, kind='stable')  # words of similar lengths are contiguous
+        lengths = hw.lengths[order]
+        dense = dense[order]
+        feat = letter_features(dense, lengths)
+        starts = np.searchsorted(lengths, np.arange(hw.lmax + 2))
+        for length in np.unique(lengths):
+            if length > 64:
+                continue
+            for s in range(starts[length], starts[length + 1], 256):
+                queries = np.arange(s, min(s + 256, starts[length + 1]))
+                res[order[queries]] = self._old_queries(queries, k, dense, lengths, feat, starts, chunk)
+        return res
+
+    def _old_queries(self, queries, k, dense, lengths, feat, starts, chunk):
+        """ OLDk of words that all have the same length (words sorted by length) """
+        length = lengths[queries[0]]
+        qcodes = dense[queries, :length]
+        qfeat = feat[queries]
+        found_q, found_d = [], []  # (query position, distance) of the pairs computed so far
+        todo = np.ones(len(queries), dtype=bool)
+        window = 0  # bound[i, c - lo] is known for the queries rows[i] and the candidates c in lo:hi
+        t = 0
+        while todo.any():
+            t += 1
+            if t > window:
+                # the bound is >= the difference of lengths: the pairs whose bound
+                # is <= window are among the words of lengths length +/- window
+                window = t + 1
+                rows = np.nonzero(todo)[0]
+                lo = starts[max(length - window, 0)]
+                hi = starts[min(length + window + 1, len(starts) - 1)]
+                common = np.rint(qfeat[rows] @ feat[lo:hi].T).astype(np.int16)
+                bound = np.maximum(lengths[lo:hi], length).astype(np.int16)[None, :] - common
+                self_ = queries[rows] - lo
+                inside = (self_ >= 0) & (self_ < hi - lo)
+                bound[np.nonzero(inside)[0], self_[inside]] = -1  # never a neighbour of itself
+                bound[bound == 0] = 1  # anagrams: their distance is at least 2 anyway
+            qi, ci = np.divmod(np.flatnonzero(bound == t), hi - lo)
+            qi, ci = rows[qi], ci + lo
+            keep = todo[qi]
+            qi, ci = qi[keep], ci[keep]
+            for m in np.unique(lengths[ci]):
+                sel = np.nonzero(lengths[ci] == m)[0]
+                for s in range(0, len(sel), chunk):
+                    part = sel[s:s + chunk]
+                    found_q.append(qi[part])
+                    found_d.append(levenshtein(qcodes, qi[part], dense[ci[part], :m]))
+            if not found_q:
+                continue
+            fq, fd = np.concatenate(found_q), np.concatenate(found_d)
+            todo &= np.bincount(fq[fd <= t], minlength=len(queries)) < k
+        order = np.lexsort((fd, fq))
+        fq, fd = fq[order], fd[order]
+        firsts = np.searchsorted(fq, np.arange(len(queries)))
+        return np.array([fd[f:f + k].mean() for f in firsts])
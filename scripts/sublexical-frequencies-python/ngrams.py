@@ -0,0 +1,201 @@
+#! /usr/bin/env python3
+
+""" array-backed counting of letters, bigrams, open bigrams, trigrams and quadrigrams
+
+Words are encoded as arrays of small integer codes (one per character). All the
+n-grams of a batch of words are then packed into int64 keys and summed with a
+weighted bincount, visiting them in the same order as dico.add() does, so that
+the resulting sums are the same, bit for bit, as those of the dict backend.
+"""
+
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+
+BITS = 15  # bits per character in a key (4 x 15 bits fit in an int64 for quadrigrams)
+MASK = (1 << BITS) - 1
+UNKNOWN = MASK  # code of the characters absent from an alphabet that is not extended
+DENSE_MAX = 1 << 22  # largest table (len(alphabet)+1)**n that lookup() makes dense
+
+
+class alphabet:
+    """ assigns consecutive integer codes to characters """
+    def __init__(self, chars=''):
+        self.chars = []
+        self.index = {}
+        for c in chars:
+            self.code(c)
+
+    def __len__(self):
+        return len(self.chars)
+
+    def code(self, char):
+        """ returns the code of 'char', registering it if needed """
+        if char not in self.index:
+            if len(self.chars) >= UNKNOWN:
+                raise ValueError(f"more than {UNKNOWN} distinct characters")
+            self.index[char] = len(self.chars)
+            self.chars.append(char)
+        return self.index[char]
+
+    def encode(self, words, grow=True):
+        """ returns (codes, offsets): the codes of the concatenated 'words', and the
+        position of each word in 'codes' (word i is codes[offsets[i]:offsets[i+1]]).
+        With grow=False, new characters are not registered but coded as UNKNOWN. """
+        lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+        offsets = np.zeros(len(words) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        points = np.frombuffer(''.join(words).encode('utf-32-le'), dtype=np.uint32)
+        uniq, inverse = np.unique(points, return_inverse=True)
+        if grow:
+            lut = [self.code(chr(p)) for p in uniq]
+        else:
+            lut = [self.index.get(chr(p), UNKNOWN) for p in uniq]
+        lut = np.array(lut, dtype=np.int64)
+        return lut[inverse], offsets
+
+
+def ngram_keys(codes, offsets, n, gap=0):
+    """ returns (keys, wordidx) for all the n-grams of the encoded words, in reading order.
+
+    'gap' is the number of letters skipped between consecutive elements of the
+    n-gram: ngram_keys(codes, offsets, 2, gap=1) returns the open bigrams. """
+    step = gap + 1
+    span = (n - 1) * step + 1
+    lengths = np.diff(offsets)
+    counts = np.maximum(lengths - span + 1, 0)
+    wordidx = np.repeat(np.arange(len(counts)), counts)
+    firsts = np.cumsum(counts) - counts
+    starts = offsets[:-1][wordidx] + np.arange(len(wordidx)) - firsts[wordidx]
+    keys = np.zeros(len(starts), dtype=np.int64)
+    for j in range(n):
+        keys = (keys << BITS) | codes[starts + j * step]
+    return keys, wordidx
+
+
+def interleave(*streams):
+    """ merges several (keys, wordidx) streams so that the n-grams of each word stay
+    grouped, in the order of the streams (e.g. bigrams then open bigrams) """
+    keys = np.concatenate([k for k, _ in streams])
+    wordidx = np.concatenate([w for _, w in streams])
+    order = np.argsort(wordidx, kind='stable')
+    return keys[order], wordidx[order]
+
+
+class ngramtable(Mapping):
+    """ mapping from n-grams (strings of length n) to weights, stored in two arrays.
+
+    The n-grams are kept in order of first appearance, like the keys of the dicts
+    filled by dico.add(). """
+    def __init__(self, n, alphabet, grams=None, weights=None):
+        self.n = n
+        self.alphabet = alphabet
+        self.grams = np.zeros(0, dtype=np.int64) if grams is None else grams
+        self.weights = np.zeros(0, dtype=np.float64) if weights is None else weights
+        self._sorter = None
+        self._dense = None
+        self._dict = None
+
+    def add(self, keys, weights):
+        """ accumulates the weights of (possibly repeated) n-gram keys """
+        codes, uniques = pd.factorize(np.concatenate((self.grams, keys)))
+        self.weights = np.bincount(codes,
+                                   weights=np.concatenate((self.weights, weights)),
+                                   minlength=len(uniques))
+        self.grams = np.asarray(uniques, dtype=np.int64)
+        self._sorter = None
+        self._dense = None
+        self._dict = None
+
+    def merge(self, other):
+        """ adds the weights of another table, whose keys may use another alphabet """
+        lut = np.array([self.alphabet.code(c) for c in other.alphabet.chars] + [UNKNOWN], dtype=np.int64)
+        keys = np.zeros(len(other.grams), dtype=np.int64)
+        for j in range(self.n):
+            digit = (other.grams >> (BITS * (self.n - 1 - j))) & MASK
+            keys = (keys << BITS) | lut[np.minimum(digit, len(lut) - 1)]
+        self.add(keys, other.weights)
+
+    def normalize(self):
+        """ divides the weights by their sum (summed in order, as normalize_dictio does) """
+        if len(self.weights):
+            self.weights = self.weights / np.cumsum(self.weights)[-1]
+        self._dense = None
+        self._dict = None
+
+    def key(self, gram):
+        """ returns the int64 key of 'gram', or None if it cannot be in the table """
+        if len(gram) != self.n:
+            return None
+        k = 0
+        for c in gram:
+            if c not in self.alphabet.index:
+                return None
+            k = (k << BITS) | self.alphabet.index[c]
+        return k
+
+    def decode(self, key):
+        chars = self.alphabet.chars
+        return ''.join(chars[(int(key) >> (BITS * (self.n - 1 - j))) & MASK] for j in range(self.n))
+
+    def _find(self, keys):
+        """ returns the positions of 'keys' in self.grams (-1 when absent) """
+        if self._sorter is None:
+            order = np.argsort(self.grams, kind='stable')
+            self._sorter = (order, self.grams[order])
+        order, ordered = self._sorter
+        keys = np.asarray(keys, dtype=np.int64)
+        if len(ordered) == 0:
+            return np.full(keys.shape, -1)
+        pos = np.minimum(np.searchsorted(ordered, keys), len(ordered) - 1)
+        return np.where(ordered[pos] == keys, order[pos], -1)
+
+    def _denseindex(self, keys, size):
+        """ converts keys to positions in an array of size**n (unknown characters -> size-1) """
+        idx = np.zeros(len(keys), dtype=np.int64)
+        for j in range(self.n):
+            digit = np.minimum((keys >> (BITS * (self.n - 1 - j))) & MASK, size - 1)
+            idx = idx * size + digit
+        return idx
+
+    def lookup(self, keys):
+        """ returns the weights of an array of keys (0.0 for unknown keys).
+
+        When the alphabet is small enough, the weights are spread in a dense array
+        indexed by n-gram, so that a lookup is an array index rather than a search. """
+        keys = np.asarray(keys, dtype=np.int64)
+        size = len(self.alphabet) + 1
+        if size ** self.n <= DENSE_MAX:
+            if self._dense is None or self._dense[0] != size:
+                dense = np.zeros(size ** self.n)
+                dense[self._denseindex(self.grams, size)] = self.weights
+                self._dense = (size, dense)
+            return self._dense[1][self._denseindex(keys, size)]
+        idx = self._find(keys)
+        if len(self.weights) == 0:
+            return np.zeros(idx.shape)
+        return np.where(idx >= 0, self.weights[idx], 0.0)
+
+    def asdict(self):
+        """ the table as a dict {n-gram: weight}, built once, to look up the n-grams of a
+        single string faster than with arrays (see dico.get_stats) """
+        if self._dict is None:
+            self._dict = dict(self.items())
+        return self._dict
+
+    def __getitem__(self, gram):
+        k = self.key(gram)
+        if k is not None:
+            i = self._find([k])[0]
+            if i >= 0:
+                return float(self.weights[i])
+        raise KeyError(gram)
+
+    def __iter__(self):
+        return (self.decode(k) for k in self.grams)
+
+    def __len__(self):
+        return len(self.grams)
+
+    def items(self):
+        return zip(self, self.weights.tolist())
@@ -0,0 +1,179 @@
+#! /usr/bin/env python3
+
+""" position-specific (and length-specific) n-gram frequencies, and phonotactic probability
+
+The n-grams of a lexicon (phonemes, biphones, triphones of the phon column of
+Lexique, or letters of the words with their accents) are counted at each position
+of the words, as in the phonotactic probability calculator of Vitevitch & Luce
+(2004): for each position, the number of words with a given n-gram at this
+position (type count) and the sum of their frequencies (token count). With
+by_length=True, they are also counted separately for each length of word.
+
+The counts are stored in dense arrays indexed by [length, position, n-gram], the
+n-grams being numbered in the order of their keys (see ngrams.py): the n-grams
+of a batch of strings are converted to these numbers at once, so that their
+positional probabilities are obtained by indexing arrays. So that a few long
+tokens of a corpus do not blow up these arrays, the words longer than 'maxlength'
+letters are counted with the length 'maxlength', and their n-grams past the last
+position of such a word at this last position.
+
+    python phonotactics.py Lexique383.tsv --column phon --freq freqfilms2 strings.txt
+"""
+
+import numpy as np
+import pandas as pd
+import ngrams
+
+KINDS = ('type', 'token')
+MAXLENGTH = 32
+
+
+def positions(offsets, n):
+    """ the position in its word of each n-gram returned by ngrams.ngram_keys(codes, offsets, n) """
+    counts = np.maximum(np.diff(offsets) - n + 1, 0)
+    firsts = np.cumsum(counts) - counts
+    return np.arange(int(counts.sum())) - np.repeat(firsts, counts)
+
+
+class positional:
+    """ type and token counts of the n-grams of a lexicon, by position (and length) """
+    def __init__(self, n, alphabet, grams, types, tokens, by_length=False, maxlength=MAXLENGTH):
+        self.n = n
+        self.alphabet = alphabet
+        self.grams = grams  # int64: the sorted keys of the n-grams; n-gram i has key grams[i]
+        self.types = types  # int64: types[l, p, i] is the number of words with n-gram i at position p
+        self.tokens = tokens  # float64: the sum of their weights
+        self.by_length = by_length  # if False, l is always 0, else it is the length of the words
+        self.maxlength = maxlength  # longer words are counted as words of this length
+        self._lut = None
+        self._probs = {}
+
+    @classmethod
+    def build(cls, words, weights=None, n=1, by_length=False, alphabet=None, maxlength=MAXLENGTH):
+        """ the counts of the n-grams of 'words' (the weights of repeated words are added,
+        and such words are counted once in the types) """
+        words = pd.Series(list(words), dtype=object)
+        w = np.ones(len(words)) if weights is None else np.nan_to_num(np.asarray(weights, dtype=np.float64))
+        codes_, uniq = pd.factorize(words)
+        w = np.bincount(codes_, weights=w, minlength=len(uniq))
+        alphabet = alphabet or ngrams.alphabet()
+        codes, offsets = alphabet.encode(list(uniq))
+        lengths = np.minimum(np.diff(offsets), maxlength)
+        keys, wordidx = ngrams.ngram_keys(codes, offsets, n)
+        grams, ids = np.unique(keys, return_inverse=True)
+        npos = max(int(lengths.max(initial=0)) - n + 1, 1)
+        pos = np.minimum(positions(offsets, n), npos - 1)
+        maxlength = min(maxlength, int(lengths.max(initial=0)))
+        nlen = maxlength + 1 if by_length else 1
+        lenidx = lengths[wordidx] if by_length else np.zeros(len(wordidx), dtype=np.int64)
+        flat = (lenidx * npos + pos) * len(grams) + ids
+        shape = (nlen, npos, len(grams))
+        size = nlen * npos * len(grams)
+        types = np.bincount(flat, minlength=size).reshape(shape)
+        tokens = np.bincount(flat, weights=w[wordidx], minlength=size).reshape(shape)
+        return cls(n, alphabet, grams, types, tokens, by_length, maxlength)
+
+    def index(self, keys):
+        """ the numbers of the n-grams of 'keys' (-1 for those absent from the lexicon) """
+        keys = np.asarray(keys, dtype=np.int64)
+        size = len(self.alphabet) + 1
+        if size ** self.n > ngrams.DENSE_MAX:
+            if len(self.grams) == 0:
+                return np.full(keys.shape, -1)
+            pos = np.minimum(np.searchsorted(self.grams, keys), len(self.grams) - 1)
+            return np.where(self.grams[pos] == keys, pos, -1)
+        if self._lut is None:
+            self._lut = np.full(size ** self.n, -1, dtype=np.int64)
+            self._lut[self._dense(self.grams, size)] = np.arange(len(self.grams))
+        return self._lut[self._dense(keys, size)]
+
+    def _dense(self, keys, size):
+        idx = np.zeros(len(keys), dtype=np.int64)
+        for j in range(self.n):
+            digit = np.minimum((keys >> (ngrams.BITS * (self.n - 1 - j))) & ngrams.MASK, size - 1)
+            idx = idx * size + digit
+        return idx
+
+    def probabilities(self, kind='token'):
+        """ counts divided by the total of their position (and length): probs[l, p, i] is
+        the probability of n-gram i at position p of a word (of length l) """
+        if kind not in self._probs:
+            counts = self.types if kind == 'type' else self.tokens
+            totals = counts.sum(axis=2, keepdims=True)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self._probs[kind] = np.where(totals > 0, counts / totals, 0.0)
+        return self._probs[kind]
+
+    def lookup(self, strings, kind='token'):
+        """ returns (probs, wordidx): the positional probability of each n-gram of 'strings',
+        in reading order, and the string it belongs to """
+        probs = self.probabilities(kind)
+        codes, offsets = self.alphabet.encode(list(strings), grow=False)
+        keys, wordidx = ngrams.ngram_keys(codes, offsets, self.n)
+        pos = np.minimum(positions(offsets, self.n), probs.shape[1] - 1)
+        ids = self.index(keys)
+        lengths = np.minimum(np.diff(offsets), self.maxlength)
+        lenidx = lengths[wordidx] if self.by_length else np.zeros(len(ids), dtype=np.int64)
+        valid = (ids >= 0) & (pos < probs.shape[1]) & (lenidx < probs.shape[0])
+        p = np.zeros(len(ids))
+        p[valid] = probs[lenidx[valid], pos[valid], ids[valid]]
+        return p, wordidx
+
+    def score(self, strings, kind='token'):
+        """ phonotactic probability of 'strings': for each one, the sum and the mean of the
+        positional probabilities of its n-grams (NaN mean if it has none) """
+        strings = list(strings)
+        p, wordidx = self.lookup(strings, kind)
+        sums = np.bincount(wordidx, weights=p, minlength=len(strings))
+        counts = np.bincount(wordidx, minlength=len(strings))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums, sums / counts
+
+    def table(self, kind='token'):
+        """ DataFrame of the non-zero counts: length (if by_length), position, n-gram, count """
+        counts = self.types if kind == 'type' else self.tokens
+        lens, pos, ids = np.nonzero(counts)
+        df = pd.DataFrame({'length': lens, 'position': pos + 1,
+                           'ngram': [self.decode(k) for k in self.grams[ids]],
+                           kind: counts[lens, pos, ids]})
+        return df if self.by_length else df.drop(columns='length')
+
+    def decode(self, key):
+        chars = self.alphabet.chars
+        return ''.join(chars[(int(key) >> (ngrams.BITS * (self.n - 1 - j))) & ngrams.MASK] for j in range(self.n))
+
+
+if __name__ == '__main__':
+    import sys
+    import argparse
+    from cohorts import read_lexicon
+    parser = argparse.ArgumentParser(description="positional phonotactic probabilities of strings")
+    parser.add_argument('lexicon', help="Lexique-like .tsv file, or list of words (one per line)")
+    parser.add_argument('strings', nargs='?', help="strings to score, one per line ('-': stdin; "
+                        "default: the distinct forms of the lexicon)")
+    parser.add_argument('--column', default='phon', help="column of the .tsv file (default: %(default)s)")
+    parser.add_argument('--freq', help="column of frequencies of the .tsv file (default: all words count 1)")
+    parser.add_argument('--log', action='store_true', help="weight the words by log10(1 + freq), "
+                        "as Vitevitch & Luce (2004)")
+    parser.add_argument('--by-length', action='store_true', help="count the n-grams for each length of word")
+    parser.add_argument('-n', nargs='+', type=int, default=[1, 2], help="sizes of the n-grams (default: 1 2)")
+    args = parser.parse_args()
+
+    words, weights = read_lexicon(args.lexicon, args.column, args.freq)
+    if weights is not None and args.log:
+        weights = np.log10(1 + np.nan_to_num(weights))
+    if args.strings is None:
+        strings = list(dict.fromkeys(words))
+    else:
+        with (sys.stdin if args.strings == '-' else open(args.strings, encoding='utf-8')) as f:
+            strings = f.read().split()
+    columns = {}
+    for n in args.n:
+        table = positional.build(words, weights, n, args.by_length)
+        for kind in KINDS:
+            sums, means = table.score(strings, kind)
+            columns[f'p{n}_{kind}_sum'] = sums
+            columns[f'p{n}_{kind}_mean'] = means
+    print('\t'.join(['string'] + list(columns)))
+    for i, s in enumerate(strings):
+        print('\t'.join([s] + [f'{c[i]:.6g}' for c in columns.values()]))
@@ -0,0 +1,36 @@
+#! /usr/bin/env python3
+
+""" computes the sublexical statistics of a list of strings (e.g. candidate pseudowords)
+
+Input: a file with one string per line (default: standard input)
+
+Output: a tab-separated table on the standard output with, for each string and each
+kind of n-gram (letters, bigrams, ...), the sum, mean and minimum of the n-gram
+frequencies and the mean of their log10(1 + freq) (see dico.score_batch)
+
+Example: python score.py --chunksize 50000 pseudos.txt > pseudos-stats.tsv
+"""
+
+import sys
+import argparse
+import pandas as pd
+import dico
+
+FREQFILE = 'ortho-freql.txt'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('strings', nargs='?', default='-', help="file with one string per line ('-': stdin)")
+    parser.add_argument('--freqfile', default=FREQFILE, help="words and frequencies (default: %(default)s)")
+    parser.add_argument('--chunksize', type=int, default=100000, help="strings scored at once (default: %(default)s)")
+    args = parser.parse_args()
+
+    mydic = dico.load_or_build(args.freqfile)
+    infile = sys.stdin if args.strings == '-' else open(args.strings, 'r')
+    header = True
+    for strings, records in mydic.score_batch(infile, chunksize=args.chunksize):
+        table = pd.DataFrame(records)
+        table.insert(0, 'string', strings)
+        table.to_csv(sys.stdout, sep='\t', index=False, header=header, float_format='%g')
+        header = False
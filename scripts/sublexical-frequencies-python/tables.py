@@ -0,0 +1,112 @@
+#! /usr/bin/env python3
+
+""" read-only tables of strings stored in numpy arrays, that can be saved in
+.npy files and memory-mapped back (see dico.save and dico.load)
+
+- stringtable: a list of strings (one utf-8 buffer + offsets) with a crc32 hash index
+- wordtable: a mapping from strings to weights
+"""
+
+import os.path as op
+import zlib
+from collections.abc import Mapping, Sequence
+import numpy as np
+
+
+def save_arrays(dirname, name, arrays):
+    for field, arr in arrays.items():
+        np.save(op.join(dirname, f'{name}.{field}.npy'), arr)
+
+
+def load_arrays(dirname, name, fields, mmap=True):
+    return {field: np.load(op.join(dirname, f'{name}.{field}.npy'), mmap_mode='r' if mmap else None)
+            for field in fields}
+
+
+class stringtable(Sequence):
+    """ immutable list of strings, with a hash index to find the position of a string """
+    fields = ('blob', 'offsets', 'hashes', 'sorter')
+
+    def __init__(self, blob, offsets, hashes, sorter):
+        self.blob = blob  # uint8: the utf-8 encoded strings, concatenated
+        self.offsets = offsets  # int64: string i is blob[offsets[i]:offsets[i+1]]
+        self.hashes = hashes  # uint32: sorted crc32 of the strings
+        self.sorter = sorter  # int64: the string whose hash is hashes[j] is sorter[j]
+
+    @classmethod
+    def build(cls, strings):
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        hashes = np.fromiter(map(zlib.crc32, encoded), dtype=np.uint32, count=len(encoded))
+        sorter = np.argsort(hashes, kind='stable')
+        return cls(blob, offsets, hashes[sorter], sorter)
+
+    def arrays(self):
+        return {f: getattr(self, f) for f in self.fields}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    def tolist(self):
+        buf = self.blob.tobytes()
+        o = self.offsets.tolist()
+        return [buf[o[i]:o[i + 1]].decode('utf-8') for i in range(len(o) - 1)]
+
+    def find(self, s):
+        """ returns the position of 's' in the table, or -1 """
+        b = s.encode('utf-8')
+        h = zlib.crc32(b)
+        lo = np.searchsorted(self.hashes, h, 'left')
+        hi = np.searchsorted(self.hashes, h, 'right')
+        for j in range(lo, hi):
+            i = self.sorter[j]
+            if self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes() == b:
+                return int(i)
+        return -1
+
+    def __contains__(self, s):
+        return self.find(s) >= 0
+
+
+class wordtable(Mapping):
+    """ mapping from strings to weights """
+    def __init__(self, strings, weights):
+        self.strings = strings
+        self.weights = weights
+
+    @classmethod
+    def build(cls, dictio):
+        return cls(stringtable.build(list(dictio)), np.array(list(dictio.values()), dtype=np.float64))
+
+    def save(self, dirname, name):
+        save_arrays(dirname, name, self.strings.arrays())
+        save_arrays(dirname, name, {'weights': self.weights})
+
+    @classmethod
+    def load(cls, dirname, name, mmap=True):
+        strings = stringtable(**load_arrays(dirname, name, stringtable.fields, mmap))
+        return cls(strings, load_arrays(dirname, name, ['weights'], mmap)['weights'])
+
+    def __getitem__(self, s):
+        i = self.strings.find(s)
+        if i < 0:
+            raise KeyError(s)
+        return float(self.weights[i])
+
+    def __contains__(self, s):
+        return self.strings.find(s) >= 0
+
+    def __iter__(self):
+        return iter(self.strings.tolist())
+
+    def __len__(self):
+        return len(self.strings)
+
+    def items(self):
+        return zip(self.strings.tolist(), self.weights.tolist())
+
@@ -0,0 +1,56 @@
+#! /usr/bin/env python3
+
+""" computes the table of orthographic neighbours of the Voisins database
+
+Input: a tab-separated file whose two first columns are words and their frequencies
+(with a header line), e.g. ortho-freql.txt or `cut -f1,8 Lexique383.tsv`
+
+Output: a tab-separated table on the standard output, with the columns of Voisins
+(Graph, NbVoisOrth, VoisOrth, FreqVoisOrth, FreqCum), the numbers of neighbours by
+addition, deletion and transposition, and optionally OLD20.
+
+This replaces the chain voisins1.pl | voisins2.pl | voisinsfreq.pl of datasets-info/Voisins/scripts
+
+Example: python voisins.py --old20 ortho-freql.txt > voisins.tsv
+"""
+
+import sys
+import argparse
+import time
+import pandas as pd
+import neighbours
+
+
+def join(items):
+    # same format as voisins2.pl: "a, b, c, "
+    return ''.join(f'{x}, ' for x in items)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('freqfile', help="words and frequencies (tab-separated, with a header)")
+    parser.add_argument('--old20', action='store_true', help="also compute OLD20 (about 8 minutes on one core for 140k words)")
+    args = parser.parse_args()
+
+    t0 = time.time()
+    a = pd.read_csv(args.freqfile, sep='\t', usecols=[0, 1], keep_default_na=False, na_values=[''])
+    a = a.dropna().groupby(a.columns[0], sort=False)[a.columns[1]].sum()
+    words, freqs = list(a.index), a.to_numpy()
+    freq = dict(zip(words, freqs.tolist()))
+    nb = neighbours.neighbourhood(words, freqs)
+
+    table = pd.DataFrame({'Graph': words})
+    table['NbVoisOrth'] = nb.counts('substitution')
+    subst = nb.neighbours('substitution')
+    table['VoisOrth'] = [join(n) for n in subst]
+    table['FreqVoisOrth'] = [join(f'{freq[w]:g}' for w in n) for n in subst]
+    table['FreqCum'] = nb.frequency_sums('substitution')
+    table['NbVoisAdd'] = nb.counts('addition')
+    table['NbVoisDel'] = nb.counts('deletion')
+    table['NbVoisTransp'] = nb.counts('transposition')
+    print(f"{len(words)} words, neighbours in {time.time() - t0:.1f} s", file=sys.stderr)
+    if args.old20:
+        table['OLD20'] = nb.old(20)
+        print(f"OLD20 in {time.time() - t0:.1f} s", file=sys.stderr)
+
+    table.to_csv(sys.stdout, sep='\t', index=False, float_format='%g')